@@ -0,0 +1,206 @@
+"""Compare throughput and latency of the WSGI and ASGI deployments at high client concurrency
+
+Seeds a catalogue into a temporary SQLite database, then starts each deployment in its own server process with
+POS_CONFIG=production: the threaded Werkzeug WSGI server, and uvicorn serving pos.asgi. An asyncio load generator
+keeps --concurrency client connections open and sends a mix of GET api/v1/items/<id> and POST api/v1/orders over
+keep-alive connections. Requires `pip install -r requirements-async.txt`.
+
+Usage:
+    python -m benchmarks.bench_asgi --concurrency 1000 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import temporary_database, seed_catalogue, item_price
+from benchmarks.suite import summarize
+
+SERVER_START_TIMEOUT = 30
+
+
+def serve(mode, database_uri, port):
+    """Run one deployment until the process is terminated. Runs in the server subprocess"""
+
+    from pos import app
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+
+    if mode == 'wsgi':
+        from werkzeug.serving import make_server
+        from benchmarks.suite import QuietRequestHandler
+
+        make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietRequestHandler).serve_forever()
+    else:
+        import uvicorn
+        from pos.asgi import application
+
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server process exited during startup")
+
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+def build_requests(args, rng):
+    requests = []
+
+    for _ in range(args.requests):
+        if rng.random() < args.write_ratio:
+            item_ids = rng.sample(range(1, args.items + 1), rng.randint(1, 3))
+            body = json.dumps({
+                'order_items': [{'item_id': item_id, 'order_quantity': 1} for item_id in item_ids],
+                'payment_amount': sum(item_price(item_id) for item_id in item_ids),
+                'order_note': "Benchmark order",
+            }).encode()
+            requests.append(('POST', '/api/v1/orders', body))
+        else:
+            requests.append(('GET', f"/api/v1/items/{rng.randint(1, args.items)}", b''))
+
+    return requests
+
+
+async def send_request(connection, port, method, path, body):
+    """Send one request on a keep-alive connection, reconnecting when the server closed it.
+    Returns the connection and the status code
+    """
+
+    if connection is not None:
+        try:
+            return await exchange(connection, method, path, body)
+        except (OSError, asyncio.IncompleteReadError):
+            # The server closed the idle connection
+            connection[1].close()
+
+    return await exchange(await asyncio.open_connection('127.0.0.1', port), method, path, body)
+
+
+async def exchange(connection, method, path, body):
+    reader, writer = connection
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(':') for line in lines[1:] if line)}
+    await reader.readexactly(int(headers.get('content-length', 0)))
+
+    keep_alive = lines[0].startswith('HTTP/1.1') or headers.get('connection', '').lower() == 'keep-alive'
+
+    if not keep_alive or headers.get('connection', '').lower() == 'close':
+        writer.close()
+        connection = None
+
+    return connection, int(lines[0].split()[1])
+
+
+async def drive(requests, concurrency, port):
+    """Send requests over concurrency connections. Returns latencies, error count and elapsed seconds"""
+
+    queue = iter(requests)
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        connection = None
+
+        for method, path, body in queue:
+            started = time.perf_counter()
+
+            try:
+                connection, status = await send_request(connection, port, method, path, body)
+            except (OSError, asyncio.IncompleteReadError):
+                connection, status = None, 599
+
+            latencies.append(time.perf_counter() - started)
+            errors += status >= 400
+
+        if connection is not None:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    return latencies, errors, time.perf_counter() - started
+
+
+def measure(mode, args, database_uri, requests):
+    port = free_port()
+    environment = dict(os.environ, POS_CONFIG='production')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', mode, '--database-uri', database_uri,
+         '--port', str(port)],
+        env=environment,
+    )
+
+    try:
+        wait_for_port(port, process)
+        latencies, errors, elapsed = asyncio.run(drive(requests, args.concurrency, port))
+    finally:
+        process.terminate()
+        process.wait()
+
+    result = summarize(latencies, elapsed, errors)
+    print(f"{mode:<5} {json.dumps(result)}")
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=1000, help="Open client connections")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of requests that place an order")
+    parser.add_argument("--random-seed", type=int, default=1234)
+    parser.add_argument("--serve", choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument("--database-uri", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, args.database_uri, args.port)
+        return
+
+    with temporary_database() as directory:
+        seed_catalogue(args.items)
+        database_uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        # Both deployments get the same requests
+        requests = build_requests(args, random.Random(args.random_seed))
+        results = {mode: measure(mode, args, database_uri, requests) for mode in ('wsgi', 'asgi')}
+
+    print(f"asgi/wsgi throughput: {results['asgi']['throughput_rps'] / results['wsgi']['throughput_rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare item load throughput of POST api/v1/items against POST api/v1/items/bulk
+
+Usage:
+    python -m benchmarks.bench_bulk_items --rows 5000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import temporary_database
+from pos import app, db
+
+
+def run_single_item_route(client, rows):
+    for row in rows:
+        client.post("/api/v1/items", data=json.dumps(row), content_type="application/json")
+
+
+def run_bulk_route(client, rows, chunk_size):
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        client.post("/api/v1/items/bulk", data=json.dumps(chunk), content_type="application/json")
+
+
+def measure(name, rows, load):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        started = time.perf_counter()
+        load(app.test_client(), rows)
+        elapsed = time.perf_counter() - started
+
+        db.session.remove()
+
+    print(f"{name:<12} {len(rows):>8} rows {elapsed:>8.2f}s {len(rows) / elapsed:>10.0f} rows/sec")
+    return len(rows) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = [{"description": f"Item {index}", "price": 1 + index % 50, "quantity": 100} for index in range(args.rows)]
+
+    with temporary_database():
+        single_rate = measure("single", rows, run_single_item_route)
+        bulk_rate = measure("bulk", rows, lambda client, rows: run_bulk_route(client, rows, args.chunk_size))
+
+    print(f"bulk speedup: {bulk_rate / single_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
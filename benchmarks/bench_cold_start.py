@@ -0,0 +1,90 @@
+"""Measure the cold start of a worker: importing pos, creating the app and its first requests
+
+Seeds a catalogue and an order history into a temporary SQLite database, then starts a fresh Python process per
+run that times, in order:
+    import: import pos
+    create app: create_app(), including the warm-up when it is enabled
+    first request: GET api/v1/items?limit=100 and GET api/v1/items/<id>
+    second request: the same two requests again
+with WARM_UP off and on. Prints the median milliseconds over --runs processes, and writes them as JSON to --output.
+
+Usage:
+    python -m benchmarks.bench_cold_start --items 10000 --runs 10 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import temporary_database, seed_catalogue, seed_orders
+
+# Runs in a fresh interpreter, so nothing of pos is imported before the clock starts
+CHILD_SCRIPT = """
+import json, sys, time
+
+started = time.perf_counter()
+import pos
+imported = time.perf_counter()
+app = pos.create_app(SQLALCHEMY_DATABASE_URI=sys.argv[1], WARM_UP=sys.argv[2] == 'on')
+created = time.perf_counter()
+client = app.test_client()
+timings = {'import': imported - started, 'create app': created - imported}
+
+for name in ('first request', 'second request'):
+    request_started = time.perf_counter()
+    for path in ('/api/v1/items?limit=100', '/api/v1/items/%s' % sys.argv[3]):
+        assert client.get(path).status_code == 200
+    timings[name] = time.perf_counter() - request_started
+
+print(json.dumps({name: seconds * 1000 for name, seconds in timings.items()}))
+"""
+
+
+def measure_start(database_uri, warm_up, item_id):
+    """Return {phase: milliseconds} of one fresh worker process"""
+
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, database_uri, warm_up, str(item_id)],
+        check=True, capture_output=True, text=True, env={**os.environ, 'POS_CONFIG': 'development'},
+    ).stdout
+
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {}
+
+    with temporary_database() as directory:
+        seed_catalogue(args.items)
+        seed_orders(args.orders, args.items, 3, rng)
+        database_uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        for warm_up in ('off', 'on'):
+            runs = [measure_start(database_uri, warm_up, rng.randint(1, args.items)) for _ in range(args.runs)]
+            results[f"warm-up {warm_up}"] = {phase: statistics.median(run[phase] for run in runs) for phase in runs[0]}
+
+    print(f"{args.items} items, {args.orders} orders, median ms over {args.runs} processes")
+    print(f"{'case':<14} " + ' '.join(f"{phase:>15}" for phase in next(iter(results.values()))))
+
+    for case, phases in results.items():
+        print(f"{case:<14} " + ' '.join(f"{milliseconds:>15.1f}" for milliseconds in phases.values()))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare order throughput of a commit per request against the group commit order writer
+
+Seeds a catalogue into a temporary SQLite database and serves the app over a local threaded WSGI server. Concurrent
+clients place orders of --basket-size random items, first with one commit per request and then with
+ORDER_GROUP_COMMIT. Each mode runs with SQLite synchronous=NORMAL, where a WAL commit does not wait for fsync, and
+synchronous=FULL, where every commit does. Prints orders per second, p50/p95/p99 latency and the mean number of
+orders per group commit.
+
+Usage:
+    python -m benchmarks.bench_group_commit --concurrency 32 --requests 5000
+"""
+import argparse
+import random
+import threading
+
+from werkzeug.serving import make_server
+
+from benchmarks.common import temporary_database, seed_catalogue
+from benchmarks.suite import QuietRequestHandler, place_order_request, run_over_wsgi
+from pos import app, db
+
+
+def reset_engines():
+    """Drop the pooled connections, so the next connections are opened with the current SQLITE_PRAGMAS"""
+
+    with app.app_context():
+        db.session.remove()
+        db.get_engine().dispose()
+
+
+def run_mode(args, rng, group_commit, synchronous):
+    app.config['ORDER_GROUP_COMMIT'] = group_commit
+    app.config['SQLITE_PRAGMAS'] = {**app.config['SQLITE_PRAGMAS'], 'synchronous': synchronous}
+    reset_engines()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        result = run_over_wsgi(place_order_request(args.basket_size), args, rng, server.server_port)
+    finally:
+        server.shutdown()
+
+    writer = app.extensions.pop('order_writer', {}).get(None)
+
+    if writer is not None:
+        writer.close()
+        result['orders_per_commit'] = round(writer.order_count / max(writer.batch_count, 1), 1)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--basket-size", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pragmas = app.config['SQLITE_PRAGMAS']
+    results = {}
+
+    with temporary_database():
+        seed_catalogue(args.items)
+
+        try:
+            for synchronous in ('NORMAL', 'FULL'):
+                for group_commit in (False, True):
+                    name = f"{'group commit' if group_commit else 'per request'}, {synchronous}"
+                    results[name] = run_mode(args, rng, group_commit, synchronous)
+        finally:
+            app.config['ORDER_GROUP_COMMIT'] = False
+            app.config['SQLITE_PRAGMAS'] = pragmas
+            reset_engines()
+
+    print(f"{args.requests} orders of {args.basket_size} items, {args.concurrency} concurrent clients")
+    print(f"{'mode':<22} {'orders/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'per commit':>11}")
+
+    for name, result in results.items():
+        print(f"{name:<22} {result['throughput_rps']:>10.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['errors']:>7} {result.get('orders_per_commit', 1):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare basket checks against the item table with checks against the inventory ledger
+
+Seeds a catalogue into a temporary SQLite database, then prints:
+    memory: bytes per item of the ledger arrays against ORM Item objects loaded into a session (tracemalloc,
+        measured on --sample items and scaled)
+    load: seconds to load the ledger from the item table
+    validation: p50/p95 microseconds of payment_validator() for baskets of 1, 5 and 20 random items, with the items
+        loaded by load_items() and read from the ledger. The ledger time includes its catch up query on the stock
+        event log
+
+Usage:
+    python -m benchmarks.bench_inventory --items 1000000 --baskets 2000
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.common import temporary_database, item_price, seed_catalogue
+from pos import app, db
+from pos.models.item import Item
+from pos.services.inventory import InventoryLedger
+from pos.validators.payment_validator import load_items, payment_validator
+
+BASKET_SIZES = (1, 5, 20)
+
+
+def orm_bytes_per_item(sample):
+    """Bytes allocated per Item object loaded into a session"""
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    items = db.session.query(Item).filter(Item.id <= sample).all()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    item_count = len(items)
+    db.session.expunge_all()
+
+    return allocated / item_count
+
+
+def time_validation(load_basket, baskets):
+    timings = []
+
+    for order_quantities, payment_amount in baskets:
+        started = time.perf_counter()
+        payment_validator(order_quantities, payment_amount, load_basket(order_quantities))
+        timings.append((time.perf_counter() - started) * 1e6)
+
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[18]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000000)
+    parser.add_argument("--baskets", type=int, default=2000)
+    parser.add_argument("--sample", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    with temporary_database():
+        seed_catalogue(args.items)
+
+        with app.app_context():
+            inventory = InventoryLedger(app.config['INVENTORY_LEDGER_MAX_DENSE_ID'])
+
+            started = time.perf_counter()
+            inventory.load(db.session)
+            load_seconds = time.perf_counter() - started
+            db.session.commit()
+
+            orm_bytes = orm_bytes_per_item(min(args.sample, args.items))
+
+            print(f"{args.items} items")
+            print(f"memory per item: ledger {inventory.nbytes / len(inventory):.1f} B, ORM Item {orm_bytes:.1f} B")
+            print(f"ledger load: {load_seconds:.2f} s")
+            print(f"{'basket':>6} {'source':<10} {'p50 us':>9} {'p95 us':>9}")
+
+            for basket_size in BASKET_SIZES:
+                baskets = []
+
+                for _ in range(args.baskets):
+                    item_ids = rng.sample(range(1, args.items + 1), basket_size)
+                    baskets.append(({item_id: 1 for item_id in item_ids},
+                                    sum(item_price(item_id) for item_id in item_ids)))
+
+                for source, load_basket in (
+                    ('item table', lambda order_quantities: load_items(order_quantities, db.session)),
+                    ('ledger', lambda order_quantities: inventory.items(db.session, order_quantities)),
+                ):
+                    p50, p95 = time_validation(load_basket, baskets)
+                    db.session.rollback()
+                    print(f"{basket_size:>6} {source:<10} {p50:>9.1f} {p95:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
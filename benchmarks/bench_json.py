@@ -0,0 +1,120 @@
+"""Measure JSON serialization of large item responses per JSON backend, with and without the item fragment cache
+
+Seeds a catalogue into a temporary database, then measures for the stdlib and the orjson backend:
+    serialize: building the dicts of all items and encoding them as one jsonify response
+    fragments cold / warm: encoding all items with the fragment cache, empty and filled
+    page walk: downloading the whole catalogue through GET api/v1/items?limit=1000, following X-Next-Cursor, with
+        the fragment cache off and warm
+The orjson backend is skipped when orjson is not installed (pip install orjson).
+
+Usage:
+    python -m benchmarks.bench_json --items 10000 --repeat 20
+"""
+import argparse
+import time
+
+from flask import jsonify
+from flask.json import JSONEncoder
+
+from benchmarks.common import temporary_database, seed_catalogue
+from pos import app, db
+from pos.json_provider import OrjsonEncoder, orjson
+from pos.models.item import Item
+from pos.services.item_fragments import ItemFragmentCache, ITEM_ROW_COLUMNS
+
+PAGE_SIZE = 1000
+
+
+def measure(run, repeat, setup=None):
+    """Return the mean duration of run in milliseconds"""
+
+    total = 0
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        started = time.perf_counter()
+        run()
+        total += time.perf_counter() - started
+
+    return total / repeat * 1000
+
+
+def walk_pages(client):
+    """GET every page of the catalogue. Returns the number of bytes downloaded"""
+
+    downloaded, url = 0, f"/api/v1/items?limit={PAGE_SIZE}"
+
+    while url:
+        response = client.get(url)
+        downloaded += len(response.data)
+        cursor = response.headers.get('X-Next-Cursor')
+        url = cursor and f"/api/v1/items?limit={PAGE_SIZE}&cursor={cursor}"
+
+    return downloaded
+
+
+def measure_backend(repeat):
+    results = {}
+
+    with app.test_request_context():
+        items = Item.query.all()
+        rows = db.session.query(*ITEM_ROW_COLUMNS).all()
+        fragment_cache = ItemFragmentCache(len(rows))
+
+        results['serialize'] = measure(lambda: jsonify([item.serialize for item in items]), repeat)
+        results['fragments cold'] = measure(lambda: fragment_cache.encode_page(rows), repeat, fragment_cache.clear)
+        results['fragments warm'] = measure(lambda: fragment_cache.encode_page(rows), repeat)
+
+    client = app.test_client()
+    fragment_cache_size = app.config['ITEM_FRAGMENT_CACHE_SIZE']
+
+    try:
+        app.config['ITEM_FRAGMENT_CACHE_SIZE'] = 0
+        results['page walk'] = measure(lambda: walk_pages(client), repeat)
+    finally:
+        app.config['ITEM_FRAGMENT_CACHE_SIZE'] = fragment_cache_size
+
+    app.extensions.pop('item_fragments', None)
+    walk_pages(client)
+    results['page walk fragments'] = measure(lambda: walk_pages(client), repeat)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    backends = {'stdlib': JSONEncoder}
+
+    if orjson is None:
+        print("orjson is not installed, only the stdlib backend is measured")
+    else:
+        backends['orjson'] = OrjsonEncoder
+
+    json_encoder = app.json_encoder
+    results = {}
+
+    with temporary_database():
+        seed_catalogue(args.items)
+
+        try:
+            for name, encoder in backends.items():
+                app.json_encoder = encoder
+                results[name] = measure_backend(args.repeat)
+        finally:
+            app.json_encoder = json_encoder
+
+    print(f"{args.items} items, mean ms per response or page walk")
+    print(f"{'case':<20} " + ' '.join(f"{name:>10}" for name in results))
+
+    for case in next(iter(results.values())):
+        print(f"{case:<20} " + ' '.join(f"{backend_results[case]:>10.2f}" for backend_results in results.values()))
+
+
+if __name__ == "__main__":
+    main()
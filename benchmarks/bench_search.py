@@ -0,0 +1,154 @@
+"""Measure item search latency per search backend against an unindexed LIKE scan
+
+Seeds a catalogue of made-up brands and common menu words into a temporary database, then times typeahead queries
+of several shapes as the till would send them while the user types:
+    1 letter, 3 letters: the prefix of one description word
+    word: a whole description word
+    2 words: a whole word and the prefix of a second word
+for the FTS5 index, the in-process prefix index and a LIKE '%...%' scan of the description column, plus the
+GET api/v1/items/search endpoint on the default backend. Prints p50 and p95 latency in milliseconds.
+
+Usage:
+    python -m benchmarks.bench_search --items 100000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.common import temporary_database, SEED_CHUNK_SIZE
+from pos import app, db
+from pos.models.item import Item
+from pos.services.item_fragments import ITEM_ROW_COLUMNS
+from pos.services.item_search import Fts5ItemSearch, PrefixItemSearch, tokenize
+
+LIMIT = 10
+
+WORDS = (
+    "spicy mild smoked grilled roasted fresh vegan classic double crispy sweet sour hot iced large small family "
+    "garlic cheese chicken beef pork tofu salmon tuna prawn pizza salad soup burger wrap taco noodle rice curry "
+    "latte espresso mocha chai juice cake cookie muffin bagel sandwich fries pasta lasagna risotto margherita "
+    "funghi pepperoni hawaiian carbonara bolognese pesto caesar greek nicoise ramen pho udon katsu teriyaki "
+    "falafel hummus halloumi brownie cheesecake tiramisu gelato sorbet lemonade smoothie kombucha cola water"
+).split()
+
+
+def brand_names(rng, count):
+    """Made-up brand names, the rare words of a real catalogue"""
+
+    syllables = ["ka", "lo", "mi", "ra", "ve", "zu", "to", "ne", "shi", "bo", "da", "fe", "gu", "pa", "ri", "sa"]
+    return list({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(count)})
+
+
+def seed_search_catalogue(item_count, brands, rng):
+    """Insert item_count items described by a brand, one to three common words and a size"""
+
+    with app.app_context():
+        for start in range(1, item_count + 1, SEED_CHUNK_SIZE):
+            stop = min(start + SEED_CHUNK_SIZE, item_count + 1)
+            db.session.execute(Item.__table__.insert(), [
+                {'id': item_id, 'price_cents': 100, 'quantity': 10,
+                 'description': f"{rng.choice(brands)} {' '.join(rng.sample(WORDS, rng.randint(1, 3)))} "
+                                f"{item_id % 500}cl".title()}
+                for item_id in range(start, stop)
+            ])
+            db.session.commit()
+
+        db.session.remove()
+
+
+def build_queries(rng, brands, count):
+    """Return {shape: [query, ...]} with count queries per shape. Half of the queries look for a brand"""
+
+    queries = {'1 letter': [], '3 letters': [], 'word': [], '2 words': []}
+
+    for _ in range(count):
+        first = rng.choice(brands if rng.random() < 0.5 else WORDS)
+        second = rng.choice(WORDS)
+        queries['1 letter'].append(first[:1])
+        queries['3 letters'].append(first[:3])
+        queries['word'].append(first)
+        queries['2 words'].append(f"{first} {second[:3]}")
+
+    return queries
+
+
+def like_scan(session, query, limit):
+    """What a search without an index does: scan every description"""
+
+    rows = session.query(*ITEM_ROW_COLUMNS)
+
+    for word in tokenize(query):
+        rows = rows.filter(Item.description.ilike(f"%{word}%"))
+
+    return rows.order_by(Item.id).limit(limit).all()
+
+
+def measure(search, queries):
+    """Return (p50, p95) milliseconds of search(query) over queries"""
+
+    latencies = []
+
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    percentiles = statistics.quantiles(latencies, n=20)
+    return statistics.median(latencies), percentiles[18]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--brands", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    brands = brand_names(rng, args.brands)
+    queries = build_queries(rng, brands, args.queries)
+    results = {}
+
+    with temporary_database():
+        started = time.perf_counter()
+        seed_search_catalogue(args.items, brands, rng)
+        print(f"Seeded and indexed {args.items} items in {time.perf_counter() - started:.1f}s")
+
+        with app.app_context():
+            session = db.session
+            prefix_search = PrefixItemSearch(app.config['ITEM_SEARCH_RANK_CANDIDATES'])
+
+            started = time.perf_counter()
+            prefix_search.search(session, ["warm", "up"], LIMIT)
+            print(f"Built the in-process prefix index in {time.perf_counter() - started:.1f}s")
+
+            backends = {
+                'fts5': Fts5ItemSearch(app.config['ITEM_SEARCH_RANK_CANDIDATES']),
+                'prefix': prefix_search,
+            }
+
+            for name, backend in backends.items():
+                results[name] = {shape: measure(lambda query: backend.search(session, tokenize(query), LIMIT),
+                                                shape_queries)
+                                 for shape, shape_queries in queries.items()}
+
+            results['like scan'] = {shape: measure(lambda query: like_scan(session, query, LIMIT), shape_queries)
+                                    for shape, shape_queries in queries.items()}
+
+        client = app.test_client()
+        results['endpoint'] = {
+            shape: measure(lambda query: client.get("/api/v1/items/search", query_string={'q': query}), shape_queries)
+            for shape, shape_queries in queries.items()
+        }
+
+    print(f"{args.items} items, {args.queries} queries per shape, limit {LIMIT}, p50 / p95 ms")
+    print(f"{'backend':<12} " + ' '.join(f"{shape:>16}" for shape in queries))
+
+    for name, shape_results in results.items():
+        print(f"{name:<12} " + ' '.join(f"{p50:>7.2f} / {p95:>6.2f}" for p50, p95 in shape_results.values()))
+
+
+if __name__ == "__main__":
+    main()
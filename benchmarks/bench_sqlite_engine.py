@@ -0,0 +1,104 @@
+"""Compare concurrent read/write throughput of the default SQLite engine setup against the tuned one
+
+The baseline is SQLite's rollback journal with a new connection per session, like the original config. The tuned
+run uses WAL, synchronous=NORMAL, memory-mapped I/O, pooled connections and the read-only pool for GET routes.
+Reader threads list items while writer threads place orders for the same duration in both runs.
+
+Usage:
+    python -m benchmarks.bench_sqlite_engine --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import json
+import threading
+import time
+
+from benchmarks.common import temporary_database, seed_catalogue, item_price
+from config import Config, ProductionConfig
+from pos import app
+
+ENGINE_SETTINGS = {
+    'rollback-journal': {
+        'SQLITE_PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'READ_ONLY_POOL_ENABLED': False,
+    },
+    'tuned': {
+        'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS,
+        'SQLALCHEMY_ENGINE_OPTIONS': ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+        'READ_ONLY_POOL_ENABLED': True,
+        'READ_ONLY_ENGINE_OPTIONS': ProductionConfig.READ_ONLY_ENGINE_OPTIONS,
+    },
+}
+
+
+def drive(request, deadline, counters, lock):
+    client = app.test_client()
+    succeeded = failed = 0
+
+    while time.perf_counter() < deadline:
+        response = request(client)
+        if response.status_code < 400:
+            succeeded += 1
+        else:
+            failed += 1
+
+    with lock:
+        counters['succeeded'] += succeeded
+        counters['failed'] += failed
+
+
+def read_items(client):
+    return client.get("/api/v1/items?limit=50")
+
+
+def place_order(client):
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}, {"item_id": 2, "order_quantity": 1}],
+        "payment_amount": item_price(1) + item_price(2),
+        "order_note": "Lunch rush",
+    })
+    return client.post("/api/v1/orders", data=order_data, content_type="application/json")
+
+
+def measure(name, args):
+    original_config = {key: app.config.get(key) for key in ENGINE_SETTINGS[name]}
+    app.config.update(ENGINE_SETTINGS[name])
+
+    try:
+        with temporary_database():
+            seed_catalogue(1000)
+
+            reads = {'succeeded': 0, 'failed': 0}
+            writes = {'succeeded': 0, 'failed': 0}
+            lock = threading.Lock()
+            deadline = time.perf_counter() + args.seconds
+
+            threads = [threading.Thread(target=drive, args=(read_items, deadline, reads, lock))
+                       for _ in range(args.readers)]
+            threads += [threading.Thread(target=drive, args=(place_order, deadline, writes, lock))
+                        for _ in range(args.writers)]
+
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        app.config.update(original_config)
+
+    print(f"{name:<17} reads/sec {reads['succeeded'] / args.seconds:>9.0f} (failed {reads['failed']})   "
+          f"writes/sec {writes['succeeded'] / args.seconds:>8.0f} (failed {writes['failed']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    for name in ENGINE_SETTINGS:
+        measure(name, args)
+
+
+if __name__ == "__main__":
+    main()
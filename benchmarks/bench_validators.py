@@ -0,0 +1,121 @@
+"""Compare the per request cost of the input validators against the pydantic dataclasses they replaced
+
+Both item and order input are validated from an already parsed JSON body, for a valid and an invalid payload.
+The order payloads have ten order lines. The pydantic dataclass did not check order lines, so the lightweight
+validator does more work for them. The pydantic run is skipped when pydantic is not installed
+(pip install pydantic==1.8.2).
+
+Usage:
+    python -m benchmarks.bench_validators --iterations 100000
+"""
+import argparse
+import time
+
+from pos.exceptions.custom_exceptions import ValidationError
+from pos.validators.item_input_validator import ItemInputValidator
+from pos.validators.order_input_validator import OrderInputValidator
+
+ITEM_PAYLOADS = {
+    'valid': {"description": "Pizza", "price": 12.5, "quantity": 20},
+    'invalid': {"description": "", "price": -1, "quantity": 20},
+}
+
+ORDER_PAYLOADS = {
+    'valid': {
+        "order_items": [{"item_id": item_id, "order_quantity": 2} for item_id in range(1, 11)],
+        "payment_amount": 250,
+        "order_note": "No pineapples",
+    },
+    'invalid': {
+        "order_items": [{"item_id": item_id, "order_quantity": 2} for item_id in range(1, 11)],
+        "payment_amount": -250,
+        "order_note": "",
+    },
+}
+
+
+def pydantic_validators():
+    """The pydantic dataclasses as they were before the lightweight validators. None if pydantic is missing"""
+
+    try:
+        import pydantic
+        from pydantic.dataclasses import dataclass
+        from pydantic import conint, conlist, constr, confloat
+    except ImportError:
+        return None
+
+    @dataclass
+    class PydanticItemInputValidator:
+        description: constr(min_length=1)
+        price: confloat(gt=0)
+        quantity: conint(gt=0)
+
+    @dataclass
+    class PydanticOrderInputValidator:
+        order_items: conlist(dict, min_items=1)
+        payment_amount: confloat(gt=0)
+        order_note: constr(min_length=1)
+
+    def validate_item(payload):
+        # Same field by field construction the routes used
+        try:
+            PydanticItemInputValidator(payload['description'], payload['price'], payload['quantity'])
+        except pydantic.ValidationError:
+            pass
+
+    def validate_order(payload):
+        try:
+            PydanticOrderInputValidator(payload['order_items'], payload['payment_amount'], payload['order_note'])
+        except pydantic.ValidationError:
+            pass
+
+    return validate_item, validate_order
+
+
+def lightweight_validators():
+    def validate_item(payload):
+        try:
+            ItemInputValidator.parse(payload)
+        except ValidationError:
+            pass
+
+    def validate_order(payload):
+        try:
+            OrderInputValidator.parse(payload)
+        except ValidationError:
+            pass
+
+    return validate_item, validate_order
+
+
+def measure(validate, payload, iterations):
+    """Return the mean cost of one validation in microseconds"""
+    started = time.perf_counter()
+
+    for _ in range(iterations):
+        validate(payload)
+
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    implementations = {'lightweight': lightweight_validators(), 'pydantic': pydantic_validators()}
+
+    if implementations['pydantic'] is None:
+        print("pydantic is not installed, only the lightweight validators are measured")
+        del implementations['pydantic']
+
+    print(f"{'validator':<8} {'payload':<8} " + ' '.join(f"{name + ' us':>14}" for name in implementations))
+
+    for index, (validator, payloads) in enumerate((('item', ITEM_PAYLOADS), ('order', ORDER_PAYLOADS))):
+        for payload_name, payload in payloads.items():
+            costs = [measure(validators[index], payload, args.iterations) for validators in implementations.values()]
+            print(f"{validator:<8} {payload_name:<8} " + ' '.join(f"{cost:>14.2f}" for cost in costs))
+
+
+if __name__ == "__main__":
+    main()
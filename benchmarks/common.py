@@ -0,0 +1,90 @@
+import contextlib
+import os
+import tempfile
+
+from pos import app, db
+from pos.models.item import Item
+from pos.models.order import Order
+from pos.models.order_item import OrderItem
+from pos.services.sales import rebuild_sales
+
+SEED_CHUNK_SIZE = 10000
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """Point the app at an empty SQLite database in a temporary directory for the duration of a benchmark"""
+
+    original_uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    with tempfile.TemporaryDirectory() as directory:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        with app.app_context():
+            db.create_all()
+            db.session.remove()
+
+        try:
+            yield directory
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.get_engine().dispose()
+
+            app.config['SQLALCHEMY_DATABASE_URI'] = original_uri
+
+
+def item_price(item_id):
+    """Deterministic whole-number price of a seeded item, so expected payments are exact"""
+    return 1 + item_id % 50
+
+
+def seed_catalogue(item_count, quantity=10 ** 9):
+    """Insert item_count items with ids 1..item_count in chunks"""
+
+    with app.app_context():
+        for start in range(1, item_count + 1, SEED_CHUNK_SIZE):
+            stop = min(start + SEED_CHUNK_SIZE, item_count + 1)
+            db.session.execute(Item.__table__.insert(), [
+                {'id': item_id, 'description': f"Item {item_id}", 'price_cents': item_price(item_id) * 100,
+                 'quantity': quantity}
+                for item_id in range(start, stop)
+            ])
+            db.session.commit()
+
+        db.session.remove()
+
+
+def seed_orders(order_count, item_count, basket_size, rng):
+    """Insert order_count orders of basket_size random items each, in chunks, then build their sales aggregates"""
+
+    with app.app_context():
+        for start in range(1, order_count + 1, SEED_CHUNK_SIZE):
+            stop = min(start + SEED_CHUNK_SIZE, order_count + 1)
+            orders, order_items = [], []
+
+            for order_id in range(start, stop):
+                item_ids = rng.sample(range(1, item_count + 1), min(basket_size, item_count))
+                orders.append({'id': order_id, 'amount_cents': sum(item_price(item_id) for item_id in item_ids) * 100,
+                               'note': f"Seeded order {order_id}"})
+                order_items.extend({'order_id': order_id, 'item_id': item_id, 'ordered_quantity': 1,
+                                    'unit_price_cents': item_price(item_id) * 100}
+                                   for item_id in item_ids)
+
+            db.session.execute(Order.__table__.insert(), orders)
+            db.session.execute(OrderItem.__table__.insert(), order_items)
+            db.session.commit()
+
+        rebuild_sales(db.session)
+        db.session.commit()
+        db.session.remove()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+
+    if not sorted_values:
+        return 0
+
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
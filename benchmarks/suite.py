@@ -0,0 +1,221 @@
+"""Load and latency benchmark suite for the items and orders API
+
+Seeds a catalogue and an order history into a temporary SQLite database and drives the real Flask app, either
+in-process through app.test_client() or over a local threaded WSGI server with concurrent clients. Throughput
+and p50/p95/p99 latency of every scenario are written as JSON. Passing --baseline compares the run against a
+saved result file and exits with status 1 when any scenario regressed by more than --threshold.
+
+Usage:
+    python -m benchmarks.suite --items 10000 --orders 10000 --output bench.json
+    python -m benchmarks.suite --mode wsgi --concurrency 16 --baseline bench.json --threshold 0.2
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from benchmarks.common import temporary_database, seed_catalogue, seed_orders, item_price, percentile
+from pos import app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that does not log every request to stderr"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def list_items_request(rng, args):
+    return 'GET', '/api/v1/items?limit=100', None
+
+
+def get_item_request(rng, args):
+    return 'GET', f"/api/v1/items/{rng.randint(1, args.items)}", None
+
+
+def get_order_request(rng, args):
+    return 'GET', f"/api/v1/orders/{rng.randint(1, args.orders)}?expand=items", None
+
+
+def top_sellers_request(rng, args):
+    return 'GET', '/api/v1/reports/top-sellers?period=day&limit=10', None
+
+
+def place_order_request(basket_size):
+    def build(rng, args):
+        item_ids = rng.sample(range(1, args.items + 1), min(basket_size, args.items))
+        body = {
+            'order_items': [{'item_id': item_id, 'order_quantity': 1} for item_id in item_ids],
+            'payment_amount': sum(item_price(item_id) for item_id in item_ids),
+            'order_note': "Benchmark order",
+        }
+        return 'POST', '/api/v1/orders', json.dumps(body)
+
+    return build
+
+
+def scenarios(args):
+    yield 'list_items', list_items_request
+    yield 'get_item_by_id', get_item_request
+    for basket_size in args.basket_sizes:
+        yield f"place_order_basket_{basket_size}", place_order_request(basket_size)
+    yield 'get_order_by_id', get_order_request
+    yield 'top_sellers', top_sellers_request
+
+
+def summarize(latencies, elapsed, errors):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run_in_process(build_request, args, rng):
+    client = app.test_client()
+    requests = [build_request(rng, args) for _ in range(args.requests)]
+    latencies, errors = [], 0
+
+    started = time.perf_counter()
+
+    for method, path, body in requests:
+        request_started = time.perf_counter()
+        response = client.open(path, method=method, data=body, content_type='application/json')
+        latencies.append(time.perf_counter() - request_started)
+        errors += response.status_code >= 400
+
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def run_over_wsgi(build_request, args, rng, port):
+    requests = [build_request(rng, args) for _ in range(args.requests)]
+    local = threading.local()
+
+    def send(request):
+        method, path, body = request
+
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection('127.0.0.1', port)
+
+        request_started = time.perf_counter()
+        local.connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = local.connection.getresponse()
+        response.read()
+
+        return time.perf_counter() - request_started, response.status >= 400
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(send, requests))
+
+    elapsed = time.perf_counter() - started
+
+    return summarize([latency for latency, _ in outcomes], elapsed, sum(error for _, error in outcomes))
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human readable regressions of results against baseline"""
+
+    regressions = []
+
+    for mode, mode_results in results['results'].items():
+        for scenario, result in mode_results.items():
+            expected = baseline.get('results', {}).get(mode, {}).get(scenario)
+
+            if not expected:
+                continue
+
+            if result['p95_ms'] > expected['p95_ms'] * (1 + threshold):
+                regressions.append(f"{mode}/{scenario}: p95 {result['p95_ms']}ms > baseline {expected['p95_ms']}ms")
+
+            if result['throughput_rps'] < expected['throughput_rps'] * (1 - threshold):
+                regressions.append(f"{mode}/{scenario}: throughput {result['throughput_rps']} rps < baseline "
+                                   f"{expected['throughput_rps']} rps")
+
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Catalogue size to seed (1k to 1M)")
+    parser.add_argument("--orders", type=int, default=1000, help="Order history size to seed")
+    parser.add_argument("--seed-basket-size", type=int, default=3, help="Items per seeded order")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--basket-sizes", type=lambda value: [int(size) for size in value.split(',')],
+                        default=[1, 5, 20], help="Comma separated basket sizes for order placement")
+    parser.add_argument("--mode", choices=['in-process', 'wsgi', 'both'], default='both')
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients in wsgi mode")
+    parser.add_argument("--random-seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results previously written with --output")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative regression of p95 latency and throughput against the baseline")
+    return parser.parse_args(argv)
+
+
+def run(args):
+    rng = random.Random(args.random_seed)
+    modes = ['in-process', 'wsgi'] if args.mode == 'both' else [args.mode]
+    results = {'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+               'results': {}}
+
+    with temporary_database():
+        seed_catalogue(args.items)
+        seed_orders(args.orders, args.items, args.seed_basket_size, rng)
+
+        for mode in modes:
+            mode_results = results['results'][mode] = {}
+
+            if mode == 'wsgi':
+                server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+
+            try:
+                for name, build_request in scenarios(args):
+                    if mode == 'wsgi':
+                        mode_results[name] = run_over_wsgi(build_request, args, rng, server.server_port)
+                    else:
+                        mode_results[name] = run_in_process(build_request, args, rng)
+
+                    print(f"{mode:<11} {name:<24} {json.dumps(mode_results[name])}")
+            finally:
+                if mode == 'wsgi':
+                    server.shutdown()
+
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,174 @@
+import os
+
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
 class Config:
     # General Configs
     TESTING = False
     DEBUG = False
     PORT = 5000
 
+    # Startup Configs
+    # Send the hot read requests once per store when the app is created, so engines, compiled SQL and the item
+    # fragment cache are ready before the first client request. Connection pools are closed again afterwards, so
+    # apps created before workers fork stay fork safe
+    WARM_UP = False
+    # Items of the first catalogue page loaded by the warm-up
+    WARM_UP_ITEMS = 1000
+
     # Database Configs
     SQLALCHEMY_DATABASE_URI = 'sqlite:///../pos.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = True
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # PRAGMAs set on every new SQLite connection. WAL lets readers work while a writer commits
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are in KiB
+        'cache_size': -64 * 1024,
+    }
+    # Serve the GET routes from a separate read-only connection pool
+    READ_ONLY_POOL_ENABLED = False
+    READ_ONLY_ENGINE_OPTIONS = {}
+
+    # Store Configs
+    # Database URI per store id, e.g. {'store-1': 'sqlite:///../store-1.db'}. Requests to api/v1/items and
+    # api/v1/orders select their store with the X-Store-Id header and only use that store's database, reports
+    # without the header read all stores. Empty keeps every request on SQLALCHEMY_DATABASE_URI
+    STORES = {}
+    # Threads reading the stores in parallel for reports over all stores
+    STORE_FAN_OUT_WORKERS = 8
+
+    # JSON Configs
+    # 'orjson' encodes responses and decodes request bodies with the optional orjson package, 'stdlib' with the json
+    # module, 'auto' uses orjson when it is installed
+    JSON_BACKEND = 'auto'
+    # Pre-encoded JSON of this many items, reused by api/v1/items pages while the item version is unchanged.
+    # 0 disables it. Item writes that bypass the API do not change the version, restart the workers after them
+    ITEM_FRAGMENT_CACHE_SIZE = 100000
+
+    # Search Configs
+    # 'fts5' searches the SQLite FTS5 index, 'prefix' an in-process index of every worker, 'auto' uses FTS5 when the
+    # database has the item_search index (created with the tables, or with flask create-search-index)
+    ITEM_SEARCH_BACKEND = 'auto'
+    # Matches ranked per search. Queries matching more items rank the ones with the lowest ids
+    ITEM_SEARCH_RANK_CANDIDATES = 500
+
+    # Inventory Ledger Configs
+    # Check baskets against an in-process copy of the quantity and price of every item, kept in arrays indexed by
+    # item id and caught up from the stock event log, instead of loading the ordered items. Stock is still reserved
+    # with a guarded UPDATE, so the database stays the authority across worker processes
+    INVENTORY_LEDGER = False
+    # Items with ids up to this are kept in the arrays, 16 bytes per id. Larger ids are kept in a dict
+    INVENTORY_LEDGER_MAX_DENSE_ID = 10 ** 7
+
+    # Order Writer Configs
+    # Place the orders of POST api/v1/orders on one writer thread per store that commits many orders in one
+    # transaction, instead of one commit per request
+    ORDER_GROUP_COMMIT = False
+    # Most orders committed in one transaction
+    ORDER_GROUP_COMMIT_BATCH_SIZE = 100
+    # Seconds the writer waits for more orders before committing a smaller batch
+    ORDER_GROUP_COMMIT_MAX_WAIT = 0.002
+    # Orders waiting for the writer. Further orders are rejected with 503 and a Retry-After header
+    ORDER_GROUP_COMMIT_QUEUE_SIZE = 1000
+    # Seconds a request waits for its order to be committed before giving up with 503
+    ORDER_GROUP_COMMIT_TIMEOUT = 30
+
+    # Export Configs
+    # Number of rows fetched per round-trip by the NDJSON export endpoints
+    EXPORT_BATCH_SIZE = 1000
+
+    # Archive Configs
+    # flask archive-orders moves orders created more than this many days ago into compressed archive segments
+    ORDER_ARCHIVE_RETENTION_DAYS = 365
+    # Directory of the archive segments, relative to the pos package like the SQLite paths. Stores get their own
+    # subdirectory under stores/
+    ORDER_ARCHIVE_DIRECTORY = '../archive'
+    # Orders moved per write transaction
+    ORDER_ARCHIVE_BATCH_SIZE = 1000
+
+    # Idempotency Configs
+    # Number of recent POST api/v1/orders responses kept for Idempotency-Key retries and for how many seconds
+    IDEMPOTENCY_CACHE_SIZE = 10000
+    IDEMPOTENCY_CACHE_TTL = 24 * 60 * 60
+    # Seconds a retry waits for the in-flight request with the same key before giving up with 409
+    IDEMPOTENCY_WAIT_TIMEOUT = 10
+
+    # Item Cache Configs
+    # 'local' keeps an in-process LRU cache per worker, 'redis' shares one cache between workers, None disables it
+    ITEM_CACHE_BACKEND = 'local'
+    ITEM_CACHE_SIZE = 1024
+    ITEM_CACHE_TTL = 60
+    ITEM_CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+    # Instrumentation Configs
+    # Record per-endpoint latency, SQL and serialization metrics and expose them at /metrics
+    METRICS_ENABLED = False
+    # Add a Server-Timing header with the app, db and serialize durations to every response
+    METRICS_SERVER_TIMING = False
+    # Log a warning for requests slower than this many milliseconds
+    METRICS_SLOW_REQUEST_MS = 500
+
+    # Stock Feed Configs
+    # Stock events buffered per feed subscriber. A subscriber that falls further behind is disconnected and
+    # catches up from the stock event log when it reconnects
+    STOCK_FEED_QUEUE_SIZE = 1000
+    # Seconds between checks for stock events committed by other worker processes
+    STOCK_FEED_POLL_INTERVAL = 1
+    # Seconds between keep-alive comments on an idle event stream
+    STOCK_FEED_HEARTBEAT = 15
+
+    # ASGI Configs
+    # Options of the aiosqlite engine behind the async routes of pos/asgi.py. Client connections are not limited by
+    # the pool, requests wait for a pooled database connection instead
+    ASYNC_ENGINE_OPTIONS = {
+        'poolclass': AsyncAdaptedQueuePool,
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+    }
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+    # Tests never touch the repository's pos.db. tests/conftest.py gives every test its own database file
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+class ProductionConfig(Config):
+    WARM_UP = True
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pooled SQLite connections are handed between threads, one thread at a time
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': QueuePool,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_recycle': 3600,
+        'connect_args': {'check_same_thread': False},
+    }
+    READ_ONLY_POOL_ENABLED = True
+    READ_ONLY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+    }
+
+
+configs = {
+    'default': Config,
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
+
+
+def get_config(name=None):
+    """Return the config class called name, or the one named by the POS_CONFIG environment variable"""
+    return configs[name or os.environ.get('POS_CONFIG', 'default')]
@@ -1,31 +1,108 @@
+"""Point of sale API.
+
+Apps are built with create_app(). Importing pos is cheap: the routes, models and services are imported by the
+factory, and database engines and connection pools are created on first use. pos.app is the app of the POS_CONFIG
+config, created on first access, for app.py, the flask command and the ASGI entry point
+"""
+import threading
+
 from flask import Flask, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 
-app = Flask(__name__)
-app.config.from_object('config.Config')
-app.url_map.strict_slashes = False
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+from config import get_config
+from pos.database import PosSQLAlchemy
+
+db = PosSQLAlchemy()
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+
+def create_app(config=None, **settings):
+    """Create a POS app.
+
+    config is a config name ('development', 'testing' or 'production'), a config class, or None for the config
+    named by POS_CONFIG. settings override single config values, e.g. SQLALCHEMY_DATABASE_URI. Every app has its
+    own engines, caches and metrics, so several apps can be used side by side in one process
+    """
+
+    from pos.commands import init_commands
+    from pos.database import init_database, init_migrations
+    from pos.instrumentation import init_instrumentation
+    from pos.json_provider import init_json_provider
+    from pos.routes.items import items_bp
+    from pos.routes.orders import orders_bp
+    from pos.routes.reports import reports_bp
+    from pos.stores import init_stores
+    from pos.warmup import warm_up
+
+    app = Flask(__name__)
+    app.config.from_object(get_config(config) if config is None or isinstance(config, str) else config)
+    app.config.update(settings)
+    app.url_map.strict_slashes = False
+
+    init_json_provider(app)
+    db.init_app(app)
+    init_migrations(app, db)
+    init_database(app)
+    init_stores(app)
+
+    app.register_blueprint(items_bp, url_prefix="/api/v1/items")
+    app.register_blueprint(orders_bp, url_prefix="/api/v1/orders")
+    app.register_blueprint(reports_bp, url_prefix="/api/v1/reports")
+
+    init_instrumentation(app)
+    init_commands(app)
+    init_error_handlers(app)
+
+    if app.config['WARM_UP']:
+        warm_up(app)
+
+    return app
+
+
+def init_error_handlers(app):
+    """Return every HTTP error as a JSON body"""
+
+    from pos.exceptions.custom_exceptions import ValidationError
+
+    @app.errorhandler(400)
+    def bad_request(error):
+        response = {'error': str(error)}
+
+        # Validation errors also list every invalid field
+        if isinstance(error.description, ValidationError):
+            response['errors'] = error.description.errors()
+
+        return jsonify(response), 400
+
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({'error': str(error)}), 404
 
-from pos.routes.items import items_bp
-from pos.routes.orders import orders_bp
+    @app.errorhandler(409)
+    def conflict(error):
+        return jsonify({'error': str(error)}), 409
 
-app.register_blueprint(items_bp, url_prefix="/api/v1/items")
-app.register_blueprint(orders_bp, url_prefix="/api/v1/orders")
+    @app.errorhandler(503)
+    def service_unavailable(error):
+        # Load is shed for moments, clients retry after a second
+        return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
 
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({'error': str(error)}), 500
 
-# Error handlers
-@app.errorhandler(400)
-def bad_request(error):
-    return jsonify({'error': str(error)}), 400
 
+def __getattr__(name):
+    # pos.app is created on first access instead of at import time
+    global _default_app
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({'error': str(error)}), 404
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+    if _default_app is None:
+        with _default_app_lock:
+            if _default_app is None:
+                _default_app = create_app()
 
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({'error': str(error)}), 500
+    return _default_app
@@ -0,0 +1,401 @@
+"""ASGI serving mode.
+
+The hot till routes are served natively with async database access through aiosqlite, so one process holds many
+concurrent client connections without a thread per connection:
+
+    GET  api/v1/items/<item_id>
+    POST api/v1/orders
+    GET  api/v1/orders/<order_id>
+
+Every other route is passed to the Flask WSGI app on a worker thread, and so is POST api/v1/orders when
+ORDER_GROUP_COMMIT or INVENTORY_LEDGER is on, so orders go through the group commit writer and the inventory ledger
+as in WSGI mode. Both modes share the models, the validators, the order service, the item cache and the idempotency
+registry, and return the same JSON bodies and status codes. With STORES configured the X-Store-Id header selects the
+store database, and each store gets its own aiosqlite engine on first use. Requests served natively are not
+recorded by the /metrics instrumentation.
+
+Install the optional dependencies with `pip install -r requirements-async.txt` and run:
+
+    uvicorn pos.asgi:application
+"""
+import asyncio
+import re
+from urllib.parse import parse_qsl
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import g, json
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload, sessionmaker
+from werkzeug.exceptions import HTTPException, BadRequest, NotFound, Conflict, InternalServerError
+
+from pos import app
+from pos.database import configure_engine, get_store_engine
+from pos.exceptions.custom_exceptions import EmptyResourceError, QuantityError, PaymentError, \
+    IdempotencyConflictError, ValidationError
+from pos.models.item import Item
+from pos.models.order import Order
+from pos.models.order_item import OrderItem
+from pos.services.idempotency import get_idempotency_registry
+from pos.services.item_cache import get_item_cache, RedisItemCache
+from pos.services.order_archive import get_archive_directory, read_archived_record, segment_paths_query, \
+    serialize_archived_order
+from pos.services.orders import find_order_id, place_order
+from pos.stores import STORE_HEADER
+from pos.utils.conditional import validator_headers, is_not_modified, has_conditional_headers
+from pos.validators.base import MAX_INTEGER
+from pos.validators.order_input_validator import OrderInputValidator
+from pos.validators.order_read_input_validator import OrderReadInputValidator
+
+# HTTP error raised for each domain error, like the abort() calls of the Flask routes
+_error_responses = (
+    (ValidationError, BadRequest),
+    (QuantityError, BadRequest),
+    (PaymentError, BadRequest),
+    (EmptyResourceError, NotFound),
+    (IdempotencyConflictError, Conflict),
+)
+
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    """asgiref runs every WSGI request on one shared thread by default. The Flask app is thread safe, so fallback
+    requests run concurrently on the event loop's default executor instead
+    """
+
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+class _ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _ThreadPoolWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+class Request:
+    """The parts of an ASGI HTTP request the async routes use"""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+        # First value wins for repeated query parameters, like request.args.get()
+        self.args = {}
+        for name, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(name, value)
+
+        self.body = body
+
+    @property
+    def environ(self):
+        """The request headers as WSGI environ keys, for the werkzeug.http helpers"""
+        return {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in self.headers.items()}
+
+    @property
+    def json(self):
+        """Parsed JSON body, or None when the request is not JSON, like Flask's request.json"""
+
+        mimetype = self.headers.get('content-type', '').split(';')[0].strip().lower()
+
+        if mimetype != 'application/json' and not (mimetype.startswith('application/') and mimetype.endswith('+json')):
+            return None
+
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise BadRequest("Failed to decode JSON object")
+
+
+class AsyncStore:
+    """The async engine of one store database with the store's item cache, idempotency registry and order archive"""
+
+    def __init__(self, engine, item_cache, idempotency_registry, archive_directory):
+        self.engine = engine
+        self.session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.item_cache = item_cache
+        self.idempotency_registry = idempotency_registry
+        self.archive_directory = archive_directory
+
+
+class AsyncPosApp:
+    """ASGI application that serves the hot routes natively and everything else through the Flask app"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = _ThreadPoolWsgiToAsgi(flask_app)
+        # AsyncStore per store id. None is the SQLALCHEMY_DATABASE_URI database
+        self.stores = {}
+        self._startup_lock = asyncio.Lock()
+        self.routes = [
+            ('GET', re.compile(r'/api/v1/items/(\d+)/?'), self.get_item_by_id),
+            ('GET', re.compile(r'/api/v1/orders/(\d+)/?'), self.get_order_by_id),
+        ]
+
+        # The group commit writer and the inventory ledger block their callers on thread locks and futures, which
+        # would stall the event loop. With either on, orders are placed by the Flask app on a worker thread
+        if not flask_app.config['ORDER_GROUP_COMMIT'] and not flask_app.config['INVENTORY_LEDGER']:
+            self.routes.append(('POST', re.compile(r'/api/v1/orders/?'), self.add_order))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        route = self.match(scope) if scope['type'] == 'http' else None
+
+        if route is None:
+            await self.wsgi_app(scope, receive, send)
+            return
+
+        handler, path_parameters = route
+        body = await self.read_body(receive)
+
+        status, response, *headers = await self.dispatch(handler, Request(scope, body), path_parameters)
+        await self.send_json(send, status, response, *headers)
+
+    def match(self, scope):
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(scope['path'])
+
+            if match and scope['method'] == method:
+                path_parameters = [int(parameter) for parameter in match.groups()]
+
+                # Ids no table can hold are left to the WSGI app, which answers 404 like for any unknown path
+                if all(parameter <= MAX_INTEGER for parameter in path_parameters):
+                    return handler, path_parameters
+
+        return None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        """Open the default database"""
+        await self.open_store(None)
+
+    async def open_store(self, store_id):
+        """Return the AsyncStore of store_id. Its aiosqlite engine is created and the store's shared caches are
+        picked up on first use
+        """
+
+        store = self.stores.get(store_id)
+
+        if store is not None:
+            return store
+
+        async with self._startup_lock:
+            if store_id in self.stores:
+                return self.stores[store_id]
+
+            with self.flask_app.app_context():
+                g.store_id = store_id
+                # The sync engine already resolved relative SQLite paths against the app root
+                url = get_store_engine(store_id).url.set(drivername='sqlite+aiosqlite')
+                item_cache = get_item_cache()
+                idempotency_registry = get_idempotency_registry()
+                archive_directory = get_archive_directory()
+
+            engine = create_async_engine(url, **self.flask_app.config['ASYNC_ENGINE_OPTIONS'])
+            configure_engine(engine.sync_engine, self.flask_app.config)
+            store = self.stores[store_id] = AsyncStore(engine, item_cache, idempotency_registry,
+                                                          archive_directory)
+
+            return store
+
+    async def get_store(self, request):
+        """Return the AsyncStore selected by the X-Store-Id header, like the store selection of the Flask app"""
+
+        stores = self.flask_app.config['STORES']
+        store_id = request.headers.get(STORE_HEADER.lower())
+
+        if not stores:
+            store_id = None
+        elif not store_id:
+            raise BadRequest(f"The {STORE_HEADER} header is required")
+        elif store_id not in stores:
+            raise NotFound(f"Store {store_id} not found")
+
+        return await self.open_store(store_id)
+
+    async def shutdown(self):
+        stores, self.stores = self.stores, {}
+
+        for store in stores.values():
+            await store.engine.dispose()
+
+    @staticmethod
+    async def read_body(receive):
+        chunks = []
+
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def dispatch(self, handler, request, path_parameters):
+        """Run a route handler and turn errors into the JSON error bodies of the Flask error handlers"""
+
+        try:
+            return await handler(await self.get_store(request), request, *path_parameters)
+        except HTTPException as ex:
+            return ex.code, {'error': str(ex)}
+        except Exception as ex:
+            for error_type, http_error in _error_responses:
+                if isinstance(ex, error_type):
+                    response = {'error': str(http_error(str(ex)))}
+
+                    if isinstance(ex, ValidationError):
+                        response['errors'] = ex.errors()
+
+                    return http_error.code, response
+
+            return 500, {'error': str(InternalServerError(str(ex)))}
+
+    @staticmethod
+    async def send_json(send, status, response, headers=None):
+        if status == 304:
+            body, response_headers = b'', []
+        else:
+            # Same compact, key sorted output as Flask's jsonify
+            body = f"{json.dumps(response, separators=(',', ':'))}\n".encode()
+            response_headers = [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]
+
+        for name, value in (headers or {}).items():
+            response_headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def cache_call(method, *args):
+        """Call an item cache method. The redis cache does blocking network I/O, so it runs on a worker thread"""
+
+        if isinstance(method.__self__, RedisItemCache):
+            return await asyncio.to_thread(method, *args)
+
+        return method(*args)
+
+    async def get_item_by_id(self, store, request, item_id):
+        environ = request.environ
+        cache_entry = await self.cache_call(store.item_cache.get, item_id)
+
+        if cache_entry is None:
+            async with store.session_factory() as session:
+                if has_conditional_headers(environ):
+                    # Revalidate from the version columns without loading the item
+                    result = await session.execute(
+                        select(Item.version, Item.updated_at).where(Item.id == item_id)
+                    )
+                    versions = result.first()
+
+                    if versions and is_not_modified(environ, str(versions.version), versions.updated_at):
+                        return 304, None, validator_headers(str(versions.version), versions.updated_at)
+
+                item = await session.get(Item, item_id)
+
+            if not item:
+                raise EmptyResourceError(f"Item {item_id} not found")
+
+            cache_entry = await self.cache_call(store.item_cache.set, item_id, item.cache_entry)
+
+        headers = validator_headers(cache_entry['etag'], cache_entry['last_modified'])
+
+        if is_not_modified(environ, cache_entry['etag'], cache_entry['last_modified']):
+            return 304, None, headers
+
+        return 200, cache_entry['item'], headers
+
+    async def add_order(self, store, request):
+        # Validate input
+        order_input = OrderInputValidator.parse(request.json, idempotency_key=request.headers.get('idempotency-key'))
+
+        if order_input.idempotency_key is None:
+            return 200, await self.place_order(store, order_input)
+
+        # Retries wait for an in-flight request with the same key without blocking the event loop
+        registry = store.idempotency_registry
+        timeout = self.flask_app.config['IDEMPOTENCY_WAIT_TIMEOUT']
+        response = await asyncio.to_thread(registry.begin, order_input.idempotency_key, timeout)
+
+        if response is None:
+            try:
+                response = await self.place_order(store, order_input)
+            finally:
+                registry.finish(order_input.idempotency_key, response)
+
+        return 200, response
+
+    async def place_order(self, store, order_input):
+        """Place the order with the shared order service on the async session's connection"""
+
+        async with store.session_factory() as session:
+            try:
+                order_id = await session.run_sync(place_order, order_input.order_items, order_input.payment_amount,
+                                                  order_input.order_note, order_input.idempotency_key)
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+
+                # Lost the race against a concurrent request with the same idempotency key
+                order_id = await session.run_sync(find_order_id, order_input.idempotency_key)
+
+                if order_input.idempotency_key is None or order_id is None:
+                    raise
+
+        await self.cache_call(store.item_cache.invalidate,
+                              [order_item['item_id'] for order_item in order_input.order_items])
+
+        return {"order_id": order_id}
+
+    async def get_order_by_id(self, store, request, order_id):
+        # Validate input
+        read_input = OrderReadInputValidator.parse(request.args)
+
+        if read_input.expand == 'items':
+            items = selectinload(Order.items).selectinload(OrderItem.item)
+        else:
+            items = selectinload(Order.items)
+
+        async with store.session_factory() as session:
+            result = await session.execute(select(Order).options(items).where(Order.id == order_id))
+            order = result.scalars().first()
+
+            if not order:
+                result = await session.execute(segment_paths_query(order_id))
+                paths = result.scalars().all()
+
+                # Segments are decompressed from disk, so they are read on a worker thread
+                record = await asyncio.to_thread(read_archived_record, store.archive_directory, paths, order_id)
+
+                if record is None:
+                    raise EmptyResourceError(f"Order {order_id} not found. Please place orders")
+
+                archived_items = None
+
+                if read_input.expand == 'items':
+                    item_ids = [order_item['item_id'] for order_item in record['items']]
+                    result = await session.execute(select(Item).where(Item.id.in_(item_ids)))
+                    archived_items = {item.id: item for item in result.scalars()}
+
+                return 200, serialize_archived_order(record, archived_items)
+
+        if read_input.expand == 'items':
+            return 200, order.serialize_expanded
+
+        return 200, order.serialize
+
+
+application = AsyncPosApp(app)
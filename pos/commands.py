@@ -0,0 +1,277 @@
+from datetime import datetime
+
+import click
+from flask import current_app, g
+from flask.cli import with_appcontext
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateTable
+
+from pos import db
+from pos.database import get_store_engine
+from pos.models.item import Item
+from pos.models.order import Order
+from pos.models.order_archive_segment import OrderArchiveSegment
+from pos.models.order_item import OrderItem
+from pos.services.item_search import create_search_index
+from pos.services.order_archive import archive_cutoff, archive_orders, get_archive_directory, sales_rebuild_start
+from pos.services.sales import rebuild_sales
+from pos.utils.money import to_cents
+
+# (model, old float column, new integer cents column)
+MONEY_COLUMNS = (
+    (Item, 'price', 'price_cents'),
+    (Order, 'amount', 'amount_cents'),
+)
+
+
+def migrate_money_to_cents(connection):
+    """Convert the float money columns of a database created before prices were stored in cents.
+    Each float column is copied to its cents column, rounded half up to the nearest cent like to_cents(), then
+    dropped with its indexes. Tables that are already converted are skipped. Returns the names of the converted tables
+    """
+
+    converted_tables = []
+
+    for model, float_column, cents_column in MONEY_COLUMNS:
+        table = model.__table__
+        inspector = inspect(connection)
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+
+        if float_column not in columns:
+            continue
+
+        quoted_table = connection.dialect.identifier_preparer.quote(table.name)
+
+        if cents_column not in columns:
+            connection.execute(text(f"ALTER TABLE {quoted_table} ADD COLUMN {cents_column} INTEGER NOT NULL DEFAULT 0"))
+
+        # Converted with to_cents() instead of ROUND() in SQL, so half cents round up like amounts sent to the API
+        rows = connection.execute(text(f"SELECT id, {float_column} FROM {quoted_table}")).fetchall()
+
+        if rows:
+            connection.execute(
+                text(f"UPDATE {quoted_table} SET {cents_column} = :cents WHERE id = :id"),
+                [{'id': row_id, 'cents': to_cents(amount)} for row_id, amount in rows],
+            )
+
+        # SQLite cannot drop an indexed column
+        for index in inspector.get_indexes(table.name):
+            if float_column in index['column_names']:
+                connection.execute(text(f"DROP INDEX {connection.dialect.identifier_preparer.quote(index['name'])}"))
+
+        connection.execute(text(f"ALTER TABLE {quoted_table} DROP COLUMN {float_column}"))
+
+        for index in table.indexes:
+            if cents_column in index.columns:
+                index.create(bind=connection, checkfirst=True)
+
+        converted_tables.append(table.name)
+
+    return converted_tables
+
+
+def added_columns(now):
+    """(model, column, SQLite column definition) of the columns added to existing tables. SQLite only adds columns
+    with constant defaults, so orders of an older database are dated at the upgrade time now
+    """
+
+    return (
+        (Order, 'idempotency_key', "VARCHAR(64)"),
+        (Order, 'created_at', f"DATETIME NOT NULL DEFAULT '{now:%Y-%m-%d %H:%M:%S.%f}'"),
+        (OrderItem, 'unit_price_cents', "INTEGER"),
+        (Item, 'version', "INTEGER NOT NULL DEFAULT 0"),
+        (Item, 'updated_at', "DATETIME"),
+    )
+
+
+def add_missing_columns(connection, now=None):
+    """Bring a database created by an older release up to the current models. Missing tables are created, missing
+    columns are added, and missing indexes of the existing tables are created. Order items of older orders keep no
+    unit price, the sales aggregates use the current item price for them. Runs after migrate_money_to_cents(), which
+    adds the cents columns. Returns the added columns as table.column
+    """
+
+    db.Model.metadata.create_all(connection)
+
+    added = []
+    inspector = inspect(connection)
+
+    for model, column_name, definition in added_columns(now or datetime.utcnow()):
+        table = model.__table__
+
+        if column_name in {column['name'] for column in inspector.get_columns(table.name)}:
+            continue
+
+        quoted_table = connection.dialect.identifier_preparer.quote(table.name)
+        connection.execute(text(f"ALTER TABLE {quoted_table} ADD COLUMN {column_name} {definition}"))
+
+        # SQLite cannot add a column with a UNIQUE constraint, a unique index enforces it instead
+        if table.c[column_name].unique:
+            connection.execute(text(f"CREATE UNIQUE INDEX uq_{table.name}_{column_name} "
+                                    f"ON {quoted_table} ({column_name})"))
+
+        added.append(f"{table.name}.{column_name}")
+
+    for model in (Item, Order, OrderItem):
+        for index in model.__table__.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+    return added
+
+
+def rebuild_order_table(connection):
+    """Rebuild the order table of a database created without AUTOINCREMENT, so the ids of deleted and archived
+    orders are never handed out again. SQLite cannot add AUTOINCREMENT to a table, so the rows are copied into a new
+    table that replaces the old one, and the id sequence starts after the highest live or archived order id. Foreign
+    keys are not enforced, SQLite's default, so order_item keeps pointing at the new table. Runs after
+    add_missing_columns(). Returns True when the table was rebuilt
+    """
+
+    if connection.dialect.name != 'sqlite':
+        return False
+
+    table = Order.__table__
+    table_sql = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table.name}
+    ).scalar()
+
+    if 'AUTOINCREMENT' in table_sql.upper():
+        return False
+
+    preparer = connection.dialect.identifier_preparer
+    quoted_table = preparer.quote(table.name)
+    columns = ', '.join(preparer.quote(column.name) for column in table.columns)
+    create_sql = str(CreateTable(table).compile(dialect=connection.dialect))
+
+    connection.exec_driver_sql(create_sql.replace(f"CREATE TABLE {quoted_table} ", "CREATE TABLE order_rebuilt ", 1))
+    connection.exec_driver_sql(f"INSERT INTO order_rebuilt ({columns}) SELECT {columns} FROM {quoted_table}")
+    connection.exec_driver_sql(f"DROP TABLE {quoted_table}")
+    connection.exec_driver_sql(f"ALTER TABLE order_rebuilt RENAME TO {quoted_table}")
+
+    for index in table.indexes:
+        index.create(bind=connection)
+
+    last_order_id = max(
+        connection.execute(select(func.max(Order.id))).scalar() or 0,
+        connection.execute(select(func.max(OrderArchiveSegment.last_order_id))).scalar() or 0,
+    )
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {'name': table.name})
+    connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                       {'name': table.name, 'seq': last_order_id})
+
+    return True
+
+
+store_option = click.option('--store', 'store_id', help="Id of the store database to use, from STORES. Defaults to "
+                                                          "SQLALCHEMY_DATABASE_URI")
+
+
+def select_store(store_id):
+    """Route db.session of the command to the store_id database"""
+
+    if store_id is not None and store_id not in current_app.config['STORES']:
+        raise click.BadParameter(f"Unknown store {store_id}", param_hint='--store')
+
+    g.store_id = store_id
+
+
+@click.command('migrate-money')
+@store_option
+@with_appcontext
+def migrate_money_command(store_id):
+    """Convert item prices and order amounts of an existing database to integer cents"""
+
+    select_store(store_id)
+
+    with get_store_engine(store_id).begin() as connection:
+        converted_tables = migrate_money_to_cents(connection)
+
+    if converted_tables:
+        click.echo(f"Converted money columns of: {', '.join(converted_tables)}")
+    else:
+        click.echo("Money columns are already stored in cents")
+
+
+@click.command('upgrade-schema')
+@store_option
+@with_appcontext
+def upgrade_schema_command(store_id):
+    """Convert the money columns of an existing database, then add the tables and columns of this release"""
+
+    select_store(store_id)
+
+    with get_store_engine(store_id).begin() as connection:
+        converted_tables = migrate_money_to_cents(connection)
+        added = add_missing_columns(connection)
+        rebuilt = rebuild_order_table(connection)
+
+    if converted_tables:
+        click.echo(f"Converted money columns of: {', '.join(converted_tables)}")
+
+    click.echo(f"Added columns: {', '.join(added)}" if added else "No columns were missing")
+
+    if rebuilt:
+        click.echo("Rebuilt the order table with AUTOINCREMENT order ids")
+
+
+@click.command('backfill-sales')
+@store_option
+@with_appcontext
+def backfill_sales_command(store_id):
+    """Rebuild the hourly and daily sales aggregates from the order history. The aggregates of the days with
+    archived orders are kept
+    """
+
+    select_store(store_id)
+
+    row_count = rebuild_sales(db.session, sales_rebuild_start(db.session))
+    db.session.commit()
+
+    click.echo(f"Rebuilt {row_count} sales aggregate rows")
+
+
+@click.command('create-search-index')
+@store_option
+@with_appcontext
+def create_search_index_command(store_id):
+    """Create the item description search index if it is missing and index every item"""
+
+    select_store(store_id)
+
+    with get_store_engine(store_id).begin() as connection:
+        created = create_search_index(connection)
+
+    if created:
+        click.echo("Indexed item descriptions for search")
+    else:
+        click.echo("SQLite has no FTS5, searches use the in-process prefix index")
+
+
+@click.command('archive-orders')
+@store_option
+@click.option('--older-than-days', type=click.IntRange(min=0),
+              help="Archive orders created before the start of the day this many days ago. Defaults to "
+                   "ORDER_ARCHIVE_RETENTION_DAYS")
+@with_appcontext
+def archive_orders_command(store_id, older_than_days):
+    """Move old orders out of the order tables into compressed archive segments"""
+
+    select_store(store_id)
+
+    if older_than_days is None:
+        older_than_days = current_app.config['ORDER_ARCHIVE_RETENTION_DAYS']
+
+    cutoff = archive_cutoff(older_than_days)
+    order_count, segment_count = archive_orders(db.session, get_archive_directory(), cutoff,
+                                                current_app.config['ORDER_ARCHIVE_BATCH_SIZE'])
+
+    click.echo(f"Archived {order_count} orders created before {cutoff:%Y-%m-%d} into {segment_count} segments")
+
+
+def init_commands(app):
+    """Register the pos maintenance commands with the flask CLI"""
+    app.cli.add_command(migrate_money_command)
+    app.cli.add_command(upgrade_schema_command)
+    app.cli.add_command(backfill_sales_command)
+    app.cli.add_command(create_search_index_command)
+    app.cli.add_command(archive_orders_command)
@@ -0,0 +1,190 @@
+import threading
+
+import click
+from flask import _app_ctx_stack, current_app
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from pos.stores import current_store_id
+
+_store_engines_lock = threading.Lock()
+
+# Flask-SQLAlchemy's scope: the current greenlet when greenlet is installed, otherwise the current thread
+try:
+    from greenlet import getcurrent as _ident_func
+except ImportError:
+    _ident_func = threading.get_ident
+
+
+def _session_scope():
+    # db.session is shared by every app of the process. Also scoping it by app keeps the sessions of apps that are
+    # used in turn on one thread apart
+    app_context = _app_ctx_stack.top
+    return _ident_func(), app_context and app_context.app
+
+
+class PosSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy extension that tunes every engine it creates.
+    On SQLite the PRAGMAs in SQLITE_PRAGMAS are set on each new DBAPI connection. db.session sends the statements
+    of a request that selected a store to that store's database, and is scoped per app as well as per thread
+    """
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        configure_engine(engine, self.get_app().config)
+        return engine
+
+    def create_scoped_session(self, options=None):
+        return super().create_scoped_session({'scopefunc': _session_scope, **(options or {})})
+
+    def create_session(self, options):
+        return sessionmaker(class_=StoreRoutingSession, db=self, **options)
+
+
+class StoreRoutingSession(SignallingSession):
+    """Session bound to the database of the store selected in the current app context"""
+
+    def get_bind(self, mapper=None, clause=None):
+        store_id = current_store_id()
+
+        if store_id is not None:
+            return get_store_engine(store_id)
+
+        return super().get_bind(mapper, clause)
+
+
+def configure_engine(engine, config):
+    """Apply the SQLite connection PRAGMAs from config to every connection the engine opens"""
+
+    pragmas = config['SQLITE_PRAGMAS']
+
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in pragmas.items():
+            # journal_mode is a property of the database file and cannot be changed on a read-only connection
+            if name == 'journal_mode' and engine.url.query.get('mode') == 'ro':
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+        cursor.close()
+
+
+def read_only_uri(uri):
+    """Turn a SQLite database URI into a URI that opens the same file read-only"""
+
+    sa_url = make_url(uri)
+    return sa_url.set(database=f"file:{sa_url.database}", query={'mode': 'ro', 'uri': 'true'})
+
+
+def get_store_engine(store_id=None):
+    """Return the engine of the store_id database, or the default engine when store_id is None.
+
+    Store engines get the same engine options and PRAGMAs as the default engine. The tables are created when a
+    store database is first opened
+    """
+
+    from pos import db
+
+    if store_id is None:
+        return db.get_engine()
+
+    app = current_app._get_current_object()
+    uri = app.config['STORES'][store_id]
+    store_engines = app.extensions.setdefault('store_engines', {})
+    store_engine = store_engines.get(store_id)
+
+    if store_engine is None or store_engine[0] != uri:
+        with _store_engines_lock:
+            store_engine = store_engines.get(store_id)
+
+            if store_engine is None or store_engine[0] != uri:
+                if store_engine is not None:
+                    store_engine[1].dispose()
+
+                store_engine = store_engines[store_id] = (uri, _create_store_engine(db, app, uri))
+
+    return store_engine[1]
+
+
+def _create_store_engine(db, app, uri):
+    # The option handling of Flask-SQLAlchemy's own engines, which also resolves relative SQLite paths
+    engine_options = db.apply_pool_defaults(app, {})
+    sa_url, engine_options = db.apply_driver_hacks(app, make_url(uri), engine_options)
+    engine_options.update(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+
+    engine = db.create_engine(sa_url, engine_options)
+    db.Model.metadata.create_all(engine)
+
+    return engine
+
+
+def get_read_session():
+    """Return the session GET routes should read from.
+
+    With READ_ONLY_POOL_ENABLED this is a session on a separate read-only connection pool, so reads never queue
+    behind the writers' pool. Otherwise it is the regular db.session
+    """
+
+    from pos import db
+
+    if not current_app.config['READ_ONLY_POOL_ENABLED']:
+        return db.session
+
+    # Each store has its own read-only pool. It follows the write engine, which is recreated when the database
+    # URI changes
+    store_id = current_store_id()
+    write_url = get_store_engine(store_id).url
+    read_pools = current_app.extensions.setdefault('read_session', {})
+    read_pool = read_pools.get(store_id)
+
+    if read_pool is None or read_pool[0] != write_url:
+        if read_pool is not None:
+            read_pool[1].remove()
+            read_pool[1].get_bind().dispose()
+
+        read_pool = read_pools[store_id] = (write_url, _create_read_session(db, write_url))
+
+    return read_pool[1]
+
+
+def _create_read_session(db, write_url):
+    app = current_app._get_current_object()
+
+    engine_options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    engine_options.update(app.config['READ_ONLY_ENGINE_OPTIONS'])
+
+    # The write engine already resolved relative SQLite paths against the app root
+    read_engine = db.create_engine(read_only_uri(str(write_url)), engine_options)
+
+    return scoped_session(sessionmaker(bind=read_engine, query_cls=db.Query))
+
+
+def init_database(app):
+    """Remove the read-only sessions at the end of every app context, like Flask-SQLAlchemy does for db.session"""
+
+    @app.teardown_appcontext
+    def remove_read_session(response_or_exc):
+        for write_url, read_session in list(app.extensions.get('read_session', {}).values()):
+            read_session.remove()
+
+        return response_or_exc
+
+
+def init_migrations(app, db):
+    """Register Flask-Migrate for the flask db commands. Only done when the app is loaded by the flask command,
+    because importing Flask-Migrate also imports Alembic, the slowest import of a worker's startup
+    """
+
+    if click.get_current_context(silent=True) is None:
+        return
+
+    from flask_migrate import Migrate
+
+    Migrate(app, db)
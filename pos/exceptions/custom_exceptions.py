@@ -11,3 +11,36 @@ class QuantityError(Exception):
 class PaymentError(Exception):
     """Raised when payment amount is not correct"""
     pass
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when a request with the same idempotency key is still being processed"""
+    pass
+
+
+class ServiceUnavailableError(Exception):
+    """Raised when the server is too busy to take the request"""
+    pass
+
+
+class ValidationError(Exception):
+    """Raised when request input is not valid. Carries one error per invalid field"""
+
+    def __init__(self, model_name, errors):
+        super().__init__(model_name, errors)
+        self.model_name = model_name
+        self._errors = errors
+
+    def errors(self):
+        """Return the per-field errors as a list of {"loc": [...], "msg": ..., "type": ...}"""
+        return [{'loc': list(loc), 'msg': msg, 'type': error_type} for loc, msg, error_type in self._errors]
+
+    def __str__(self):
+        count = len(self._errors)
+        lines = [f"{count} validation error{'' if count == 1 else 's'} for {self.model_name}"]
+
+        for loc, msg, error_type in self._errors:
+            lines.append(' -> '.join(str(part) for part in loc))
+            lines.append(f"  {msg} (type={error_type})")
+
+        return '\n'.join(lines)
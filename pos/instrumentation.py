@@ -0,0 +1,249 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus sense: one counter per upper bound plus a sum and a count"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide store of request and SQL metrics, labelled by Flask endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._histograms = {}
+
+    def record_request(self, request_metrics, endpoint, method, status, duration):
+        with self._lock:
+            request_key = (endpoint, method, str(status))
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+
+            self._observe('pos_request_duration_seconds', LATENCY_BUCKETS, (endpoint, method), duration)
+            self._observe('pos_request_sql_statements', STATEMENT_COUNT_BUCKETS, (endpoint, method),
+                          len(request_metrics.sql_durations))
+            self._observe('pos_request_serialization_seconds', LATENCY_BUCKETS, (endpoint, method),
+                          request_metrics.serialization_duration)
+
+            for sql_duration in request_metrics.sql_durations:
+                self._observe('pos_sql_statement_duration_seconds', LATENCY_BUCKETS, (endpoint, method),
+                              sql_duration)
+
+    def render(self, extra_counters=()):
+        """Render every metric in the Prometheus text exposition format"""
+
+        lines = [
+            '# HELP pos_requests_total Requests handled, by endpoint, method and status',
+            '# TYPE pos_requests_total counter',
+        ]
+
+        with self._lock:
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'pos_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} '
+                             f'{count}')
+
+            for name, help_text in HISTOGRAM_HELP.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+
+                for (metric_name, (endpoint, method)), histogram in sorted(self._histograms.items()):
+                    if metric_name == name:
+                        lines.extend(_render_histogram(name, f'endpoint="{endpoint}",method="{method}"', histogram))
+
+        for name, help_text, value in extra_counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+            self._histograms.clear()
+
+    def _observe(self, name, buckets, labels, value):
+        histogram = self._histograms.get((name, labels))
+
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram(buckets)
+
+        histogram.observe(value)
+
+
+HISTOGRAM_HELP = {
+    'pos_request_duration_seconds': 'Request latency',
+    'pos_request_sql_statements': 'SQL statements executed per request',
+    'pos_sql_statement_duration_seconds': 'Duration of each SQL statement',
+    'pos_request_serialization_seconds': 'Time spent encoding JSON per request',
+}
+
+
+def _render_histogram(name, labels, histogram):
+    lines = []
+    cumulative_count = 0
+
+    for upper_bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+        cumulative_count += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{upper_bound}"}} {cumulative_count}')
+
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    return lines
+
+
+class RequestMetrics:
+    """Timings collected while a single request is handled"""
+
+    __slots__ = ('started_at', 'sql_durations', 'serialization_duration')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.sql_durations = []
+        self.serialization_duration = 0
+
+
+def get_metrics_registry():
+    """Return the metrics registry of the current app, creating it on first use"""
+
+    registry = current_app.extensions.get('metrics')
+
+    if registry is None:
+        registry = current_app.extensions.setdefault('metrics', MetricsRegistry())
+
+    return registry
+
+
+def _current_request_metrics():
+    if has_request_context():
+        return g.get('request_metrics')
+    return None
+
+
+# The start time is kept on the statement's execution context, which is dropped with the statement. A statement
+# that raises never reaches after_cursor_execute, so nothing is left behind on the pooled connection
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current_request_metrics() is not None:
+        context.pos_query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request_metrics = _current_request_metrics()
+    query_started_at = getattr(context, 'pos_query_started_at', None)
+
+    if request_metrics is not None and query_started_at is not None:
+        request_metrics.sql_durations.append(time.perf_counter() - query_started_at)
+
+
+def _start_request_metrics():
+    if current_app.config['METRICS_ENABLED']:
+        g.request_metrics = RequestMetrics()
+
+
+def _finish_request_metrics(response):
+    request_metrics = g.pop('request_metrics', None)
+
+    if request_metrics is None:
+        return response
+
+    duration = time.perf_counter() - request_metrics.started_at
+    sql_duration = sum(request_metrics.sql_durations)
+    endpoint = request.endpoint or 'unmatched'
+
+    get_metrics_registry().record_request(request_metrics, endpoint, request.method, response.status_code, duration)
+
+    if current_app.config['METRICS_SERVER_TIMING']:
+        response.headers['Server-Timing'] = (
+            f'app;dur={duration * 1000:.2f}, '
+            f'db;dur={sql_duration * 1000:.2f};desc="{len(request_metrics.sql_durations)} statements", '
+            f'serialize;dur={request_metrics.serialization_duration * 1000:.2f}'
+        )
+
+    if duration * 1000 >= current_app.config['METRICS_SLOW_REQUEST_MS']:
+        current_app.logger.warning(
+            "Slow request %s %s (%s) took %.1fms: %d SQL statements in %.1fms, %.1fms serializing",
+            request.method, request.path, endpoint, duration * 1000, len(request_metrics.sql_durations),
+            sql_duration * 1000, request_metrics.serialization_duration * 1000,
+        )
+
+    return response
+
+
+def _timed_json_encoder(json_encoder):
+    """Subclass the app's JSON encoder so time spent encoding responses is recorded"""
+
+    class TimedJSONEncoder(json_encoder):
+        def encode(self, o):
+            request_metrics = _current_request_metrics()
+
+            if request_metrics is None:
+                return super().encode(o)
+
+            started_at = time.perf_counter()
+            encoded = super().encode(o)
+            request_metrics.serialization_duration += time.perf_counter() - started_at
+
+            return encoded
+
+    return TimedJSONEncoder
+
+
+def metrics():
+    """
+    Description: Request and SQL metrics in the Prometheus text format. Only available when METRICS_ENABLED is set
+    URL: metrics
+    Method: GET
+    Content Type: text/plain
+    Body: N/A
+    Responses:
+        200: Success. Metrics returned
+        404: Metrics are disabled
+    """
+
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404, "Metrics are disabled. Set METRICS_ENABLED to enable them")
+
+    from pos.services.item_cache import get_item_cache
+
+    item_cache_stats = get_item_cache().stats
+    extra_counters = (
+        ('pos_item_cache_hits_total', 'Item cache hits in this process', item_cache_stats['hits']),
+        ('pos_item_cache_misses_total', 'Item cache misses in this process', item_cache_stats['misses']),
+    )
+
+    return Response(get_metrics_registry().render(extra_counters), mimetype=PROMETHEUS_MIMETYPE)
+
+
+def init_instrumentation(app):
+    """Register the request hooks, the timed JSON encoder and the /metrics endpoint.
+    Nothing is recorded unless METRICS_ENABLED is set, so the hooks cost one config lookup per request otherwise
+    """
+
+    app.before_request(_start_request_metrics)
+    app.after_request(_finish_request_metrics)
+    app.json_encoder = _timed_json_encoder(app.json_encoder)
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
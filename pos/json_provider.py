@@ -0,0 +1,73 @@
+"""Pluggable JSON encoding for responses and request bodies.
+
+JSON_BACKEND selects the implementation behind jsonify, request.json and flask.json: 'orjson' uses the optional
+orjson package, 'stdlib' the json module, and 'auto' picks orjson when it is installed. orjson only handles the
+compact output of jsonify. Pretty printing, and documents orjson encodes differently from the json module, fall back
+to the json module, so both backends return equal JSON documents. Only floats written with an exponent differ in
+notation, e.g. 1e16 instead of 1e+16
+"""
+from flask.json import JSONEncoder, JSONDecoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonEncoder(JSONEncoder):
+    """Flask JSON encoder that encodes compact output with orjson"""
+
+    def encode(self, o):
+        if self.indent is not None or (self.item_separator, self.key_separator) != (',', ':') or self.skipkeys:
+            return super().encode(o)
+
+        # Datetimes are passed to default() so they are encoded as HTTP dates, like Flask does
+        options = orjson.OPT_PASSTHROUGH_DATETIME
+
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+
+        try:
+            encoded = orjson.dumps(o, default=self.default, option=options).decode()
+        except TypeError:
+            # Non-string keys, integers wider than 64 bits, or a type default() cannot encode either. The json
+            # module sorts and converts keys its own way
+            return super().encode(o)
+
+        # orjson always writes UTF-8, the json module escapes non-ASCII characters when JSON_AS_ASCII is set
+        if self.ensure_ascii and not encoded.isascii():
+            return super().encode(o)
+
+        return encoded
+
+
+class OrjsonDecoder(JSONDecoder):
+    """Flask JSON decoder that decodes with orjson"""
+
+    def decode(self, s, *args, **kwargs):
+        if self.object_hook or self.object_pairs_hook or self.parse_float is not float or self.parse_int is not int:
+            return super().decode(s, *args, **kwargs)
+
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # The json module also accepts NaN and Infinity, and raises its own error for invalid documents
+            return super().decode(s, *args, **kwargs)
+
+
+def init_json_provider(app):
+    """Install the JSON encoder and decoder selected by JSON_BACKEND"""
+
+    backend = app.config['JSON_BACKEND']
+
+    if backend == 'auto':
+        backend = 'stdlib' if orjson is None else 'orjson'
+
+    if backend == 'orjson':
+        if orjson is None:
+            raise RuntimeError("JSON_BACKEND 'orjson' requires the orjson package. Run: pip install orjson")
+
+        app.json_encoder = OrjsonEncoder
+        app.json_decoder = OrjsonDecoder
+    elif backend != 'stdlib':
+        raise ValueError(f"Unknown JSON_BACKEND: {backend}")
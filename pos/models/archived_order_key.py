@@ -0,0 +1,15 @@
+from pos import db
+
+
+class ArchivedOrderKey(db.Model):
+    """Idempotency key of an archived order.
+
+    archive_orders() moves the idempotency key of every archived order here in the transaction that deletes the
+    order, so a retry with the key still returns the archived order id instead of placing the order again
+    """
+
+    idempotency_key = db.Column(db.String(64), primary_key=True)
+    order_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"ArchivedOrderKey(idempotency_key={self.idempotency_key}, order_id={self.order_id})"
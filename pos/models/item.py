@@ -1,13 +1,30 @@
+from werkzeug.http import http_date
+
 from pos import db
+from pos.utils.money import to_cents, from_cents
+
+
+def serialize_item(item):
+    """Serialize an Item, or a row selected with the same column names"""
+    return {
+        'id': item.id,
+        'description': item.description,
+        'price': from_cents(item.price_cents),
+        'quantity': item.quantity,
+    }
 
 
 class Item(db.Model):
     """Database model for menu Item"""
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    description = db.Column(db.String(50), unique=False, nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
+    description = db.Column(db.String(50), unique=False, nullable=False, index=True)
+    price_cents = db.Column(db.Integer, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, index=True)
+    # seq of the item's latest stock event and when it was written. Set by record_item_changes and used as the
+    # item's ETag and Last-Modified. seq is never reused, so an item added under a reused id gets a new ETag
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime)
 
     def __repr__(self):
         return f"Item(id={self.id}, price={self.price}, quantity={self.quantity})"
@@ -17,12 +34,25 @@ class Item(db.Model):
         self.price = price
         self.quantity = quantity
 
+    @property
+    def price(self):
+        """Unit price in currency units. Stored as integer cents in price_cents"""
+        return from_cents(self.price_cents)
+
+    @price.setter
+    def price(self, price):
+        self.price_cents = to_cents(price)
+
     @property
     def serialize(self):
         """Return object data in easily serializable format"""
+        return serialize_item(self)
+
+    @property
+    def cache_entry(self):
+        """Serialized item with its ETag and Last-Modified header values, as kept in the item cache"""
         return {
-            'id': self.id,
-            'description': self.description,
-            'price': self.price,
-            'quantity': self.quantity,
+            'item': self.serialize,
+            'etag': str(self.version),
+            'last_modified': http_date(self.updated_at) if self.updated_at else None,
         }
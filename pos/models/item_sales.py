@@ -0,0 +1,30 @@
+from pos import db
+from pos.utils.money import from_cents
+
+# Aggregation periods. Every order line is counted once per period
+SALES_PERIODS = ('hour', 'day')
+
+
+class ItemSales(db.Model):
+    """Units sold and revenue of one item in one hour or day, maintained as orders are placed"""
+
+    period = db.Column(db.String(4), primary_key=True)
+    period_start = db.Column(db.DateTime, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True, index=True)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"ItemSales(period={self.period}, period_start={self.period_start}, item_id={self.item_id}, " \
+               f"units_sold={self.units_sold}, revenue_cents={self.revenue_cents})"
+
+    @property
+    def serialize(self):
+        """Return object data in easily serializable format"""
+        return {
+            'period': self.period,
+            'period_start': self.period_start.isoformat(),
+            'item_id': self.item_id,
+            'units_sold': self.units_sold,
+            'revenue': from_cents(self.revenue_cents),
+        }
@@ -1,20 +1,38 @@
+from datetime import datetime
+
 from pos import db
+from pos.utils.money import to_cents, from_cents
 
 
 class Order(db.Model):
     """Database model for Order"""
 
+    # Archived orders leave the table, so ids must never be handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
     note = db.Column(db.String(50), unique=False, nullable=False)
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     items = db.relationship('OrderItem')
 
     def __repr__(self):
         return f"Order(id={self.id}, amount={self.amount}, note={self.note})"
 
-    def __init__(self, amount, note):
+    def __init__(self, amount, note, idempotency_key=None):
         self.amount = amount
         self.note = note
+        self.idempotency_key = idempotency_key
+
+    @property
+    def amount(self):
+        """Paid amount in currency units. Stored as integer cents in amount_cents"""
+        return from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, amount):
+        self.amount_cents = to_cents(amount)
 
     @property
     def serialize(self):
@@ -25,3 +43,13 @@ class Order(db.Model):
             'note': self.note,
             'items': [item.serialize for item in self.items],
         }
+
+    @property
+    def serialize_expanded(self):
+        """Return object data with item details inlined into every order item"""
+        return {
+            'id': self.id,
+            'amount': self.amount,
+            'note': self.note,
+            'items': [item.serialize_expanded for item in self.items],
+        }
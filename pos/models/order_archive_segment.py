@@ -0,0 +1,20 @@
+from pos import db
+
+
+class OrderArchiveSegment(db.Model):
+    """Index entry of one compressed archive segment of old orders.
+
+    Segments are gzip compressed NDJSON files with one order per line, written by archive_orders(). path is relative
+    to the store's archive directory. Every archived order id lies between first_order_id and last_order_id of its
+    segment
+    """
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    first_order_id = db.Column(db.Integer, nullable=False)
+    last_order_id = db.Column(db.Integer, nullable=False, index=True)
+    order_count = db.Column(db.Integer, nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"OrderArchiveSegment(first_order_id={self.first_order_id}, last_order_id={self.last_order_id})"
@@ -1,4 +1,5 @@
 from pos import db
+from pos.utils.money import from_cents
 
 
 class OrderItem(db.Model):
@@ -7,6 +8,9 @@ class OrderItem(db.Model):
     order_id = db.Column(db.ForeignKey('order.id'), primary_key=True)
     item_id = db.Column(db.ForeignKey('item.id'), primary_key=True)
     ordered_quantity = db.Column(db.Integer, nullable=False)
+    # Unit price when the order was placed. Null for orders placed before prices were recorded per order item
+    unit_price_cents = db.Column(db.Integer, nullable=True)
+    item = db.relationship('Item')
 
     @property
     def serialize(self):
@@ -16,3 +20,23 @@ class OrderItem(db.Model):
             'ordered_quantity': self.ordered_quantity
         }
 
+    @property
+    def unit_price(self):
+        """Unit price in currency units when the order was placed, or the current item price when it was not
+        recorded. None when neither is known
+        """
+
+        if self.unit_price_cents is not None:
+            return from_cents(self.unit_price_cents)
+
+        return self.item.price if self.item else None
+
+    @property
+    def serialize_expanded(self):
+        """Return object data with the ordered item's description and unit price inlined"""
+        return {
+            'item_id': self.item_id,
+            'ordered_quantity': self.ordered_quantity,
+            'description': self.item.description if self.item else None,
+            'price': self.unit_price,
+        }
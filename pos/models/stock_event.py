@@ -0,0 +1,49 @@
+from pos import db
+from pos.utils.money import from_cents
+
+# Kinds of change recorded in the stock event log
+STOCK_CHANGES = ('created', 'updated', 'sold', 'deleted')
+
+
+class StockEvent(db.Model):
+    """One entry of the append-only item change log.
+
+    Every write to an item appends the item's state after the change, in the writer's transaction. seq is
+    assigned in commit order and never reused, so terminals resume the feed from the last seq they applied
+    """
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    item_id = db.Column(db.Integer, nullable=False, index=True)
+    change = db.Column(db.String(7), nullable=False)
+    # Item state after the change. NULL for deleted items
+    description = db.Column(db.String(50))
+    price_cents = db.Column(db.Integer)
+    quantity = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"StockEvent(seq={self.seq}, item_id={self.item_id}, change={self.change})"
+
+    @property
+    def serialize(self):
+        """Return object data in easily serializable format"""
+
+        item = None
+
+        if self.change != 'deleted':
+            item = {
+                'id': self.item_id,
+                'description': self.description,
+                'price': from_cents(self.price_cents),
+                'quantity': self.quantity,
+            }
+
+        return {
+            'seq': self.seq,
+            'item_id': self.item_id,
+            'change': self.change,
+            'item': item,
+            'created_at': self.created_at.isoformat(),
+        }
@@ -1,13 +1,49 @@
-from flask import request, jsonify, abort, Blueprint
-from pydantic import ValidationError
+import time
+from operator import attrgetter
+
+from flask import request, jsonify, abort, Blueprint, current_app
+from werkzeug.exceptions import HTTPException
 
 from pos import db
-from pos.exceptions.custom_exceptions import EmptyResourceError
-from pos.models.item import Item
+from pos.database import get_read_session
+from pos.exceptions.custom_exceptions import ValidationError, EmptyResourceError
+from pos.models.item import Item, serialize_item
+from pos.services.item_cache import get_item_cache
+from pos.services.item_fragments import get_item_fragment_cache, ITEM_ROW_COLUMNS
+from pos.services.item_search import search_items
+from pos.services.stock_events import record_item_changes, record_item_removed, get_stock_events, \
+    get_stock_broker, latest_seq, encode_stock_event, catalogue_version, OVERFLOWED
+from pos.stores import require_store
+from pos.utils.conditional import validator_headers, is_not_modified, has_conditional_headers
+from pos.utils.cursor import encode_cursor
+from pos.utils.money import to_cents, CENTS_PER_UNIT
+from pos.utils.ndjson import ndjson_response, parse_ndjson, NDJSON_MIMETYPE
+from pos.utils.sse import sse_message, sse_response, SSE_KEEP_ALIVE
+from pos.utils.text import prefix_upper_bound
+from pos.validators.base import MAX_INTEGER
+from pos.validators.bulk_item_input_validator import BulkItemInputValidator, MAX_BULK_ROWS
+from pos.validators.export_input_validator import ExportInputValidator
 from pos.validators.item_input_validator import ItemInputValidator
+from pos.validators.item_list_input_validator import ItemListInputValidator
+from pos.validators.item_search_input_validator import ItemSearchInputValidator
+from pos.validators.stock_changes_input_validator import StockChangesInputValidator, \
+    StockStreamInputValidator, DEFAULT_CHANGES_LIMIT
 
 # Blueprint for api/v1/items routes
 items_bp = Blueprint("items", __name__)
+items_bp.before_request(require_store)
+
+# Columns selected for the fields= query parameter. The price is computed from the stored cents
+_item_field_columns = {
+    'description': Item.description,
+    'price': (Item.price_cents / float(CENTS_PER_UNIT)).label('price'),
+    'quantity': Item.quantity,
+}
+
+
+def _json_pretty_printed():
+    """Whether jsonify indents its output, in debug mode or with JSONIFY_PRETTYPRINT_REGULAR"""
+    return current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug
 
 
 @items_bp.route('/', methods=['POST'])
@@ -30,76 +66,514 @@ def add_item():
     """
 
     try:
-        description = request.json['description']
-        price = request.json['price']
-        quantity = request.json['quantity']
-
         # Validate input
-        ItemInputValidator(description, price, quantity)
+        item_input = ItemInputValidator.parse(request.json)
 
         # Create new item and commit to db
-        new_item = Item(description, price, quantity)
+        new_item = Item(item_input.description, item_input.price, item_input.quantity)
 
         db.session.add(new_item)
+        db.session.flush()
+        record_item_changes(db.session, 'created', [new_item.id])
         db.session.commit()
 
+        # Item ids of deleted items can be reused by SQLite
+        get_item_cache().invalidate([new_item.id])
+
         return jsonify(new_item.serialize), 200
 
     except ValidationError as ex:
-        abort(400, str(ex))
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+@items_bp.route('/bulk', methods=['POST'])
+def bulk_upsert_items():
+    """
+    Description: Add or update many items in a single transaction
+    URL: api/v1/items/bulk?atomic=true
+    Method: POST
+    Content Type: application/json (array of items) or application/x-ndjson (one item per line)
+    Query Parameters (all optional):
+        atomic: Write nothing when any row is invalid. By default valid rows are written and invalid rows reported
+    Body:
+        [
+            {
+                "description": "Salad",
+                "price": 12.5,
+                "quantity": 20
+            },
+            {
+                "id": 1,
+                "description": "Pizza",
+                "price": 22.5,
+                "quantity": 10
+            }
+        ]
+        Rows with an id update the existing item, rows without an id add a new item
+    Responses:
+        200: Success. Valid rows written. Body lists the inserted and updated counts and per-row errors
+        400: Invalid body, or atomic upsert with invalid rows (nothing written)
+        500: Internal server error
+    """
+
+    try:
+        atomic = request.args.get('atomic', 'false').lower() in ('true', '1')
+
+        if request.mimetype == NDJSON_MIMETYPE:
+            rows = parse_ndjson(request.get_data())
+        else:
+            rows = request.json
+
+        if not isinstance(rows, list) or not rows:
+            abort(400, "Body must be a non-empty array of items")
+
+        if len(rows) > MAX_BULK_ROWS:
+            abort(400, f"At most {MAX_BULK_ROWS} items can be written in one request")
+
+        # Validate all rows in one pass
+        inserts, updates, errors = [], [], []
+
+        for row_number, row in enumerate(rows):
+            if isinstance(row, UnicodeDecodeError):
+                errors.append({'row': row_number, 'error': "Row must be UTF-8 encoded"})
+                continue
+            if isinstance(row, ValueError):
+                errors.append({'row': row_number, 'error': f"Invalid JSON: {row}"})
+                continue
+            if not isinstance(row, dict):
+                errors.append({'row': row_number, 'error': "Row must be a JSON object"})
+                continue
+
+            try:
+                item_input = BulkItemInputValidator.parse(row)
+            except ValidationError as ex:
+                errors.append({'row': row_number, 'error': str(ex), 'errors': ex.errors()})
+                continue
+
+            mapping = {
+                'description': item_input.description,
+                'price_cents': to_cents(item_input.price),
+                'quantity': item_input.quantity,
+            }
+
+            if item_input.id is None:
+                inserts.append(mapping)
+            else:
+                mapping['id'] = item_input.id
+                updates.append((row_number, mapping))
+
+        # Updates can only target existing items. Existing ids are resolved with a single query
+        update_ids = {mapping['id'] for _, mapping in updates}
+        existing_ids = {item_id for item_id, in db.session.query(Item.id).filter(Item.id.in_(update_ids))}
+
+        for row_number, mapping in updates:
+            if mapping['id'] not in existing_ids:
+                errors.append({'row': row_number, 'error': f"Item {mapping['id']} not found"})
+
+        updates = [mapping for _, mapping in updates if mapping['id'] in existing_ids]
+        errors.sort(key=lambda error: error['row'])
+
+        result = {'inserted': 0, 'updated': 0, 'errors': errors}
+
+        if atomic and errors:
+            return jsonify(result), 400
+
+        # return_defaults inserts row by row and sets the id of every new row in its mapping. The SQLite dialect
+        # has no RETURNING for a multi-row insert
+        db.session.bulk_insert_mappings(Item, inserts, return_defaults=True)
+        db.session.bulk_update_mappings(Item, updates)
+
+        new_item_ids = [mapping['id'] for mapping in inserts]
+        updated_item_ids = [mapping['id'] for mapping in updates]
+
+        if new_item_ids:
+            record_item_changes(db.session, 'created', new_item_ids)
+        if updated_item_ids:
+            record_item_changes(db.session, 'updated', updated_item_ids)
+
+        db.session.commit()
+
+        # Item ids of deleted items can be reused by SQLite
+        get_item_cache().invalidate(new_item_ids + updated_item_ids)
+
+        result['inserted'] = len(inserts)
+        result['updated'] = len(updates)
+
+        return jsonify(result), 200
+
+    except HTTPException:
+        raise
     except Exception as ex:
+        db.session.rollback()
         abort(500, str(ex))
 
 
 @items_bp.route('/', methods=['GET'])
 def get_all_items():
     """
-    Description: Get all items in the system
-    URL: api/v1/items
+    Description: Get items in the system, one page at a time. Pages are ordered by item id
+    URL: api/v1/items?limit=100&cursor=MTAw&fields=id,description&min_price=5&max_price=20&in_stock=true&description_prefix=Pi
     Method: GET
     Content Type: application/json
+    Query Parameters (all optional):
+        limit: Maximum number of items returned. Defaults to 100, at most 1000
+        cursor: Opaque cursor taken from the X-Next-Cursor header of the previous page
+        fields: Comma separated list of item fields to return (id, description, price, quantity)
+        min_price, max_price: Inclusive price range
+        in_stock: Only return items with quantity above zero
+        description_prefix: Only return items whose description starts with this prefix (case sensitive)
     Body: N/A
+    Request Headers (all optional):
+        If-None-Match, If-Modified-Since: ETag and Last-Modified of a page the client already has
+    Response Headers:
+        X-Next-Cursor: Cursor for the next page. Absent on the last page
+        ETag, Last-Modified: Version and time of the latest item change in the catalogue
     Responses:
-        200: Success. All items returned
+        200: Success. Page of items returned
+        304: No item changed since the page the client already has
+        400: Query parameter validation error
         404: No items found in the system
         500: Internal server error
     """
 
     try:
-        all_items = Item.query.all()
-
-        if not all_items:
+        # Validate input
+        list_input = ItemListInputValidator.parse(request.args)
+
+        session = get_read_session()
+
+        # Every item write bumps the catalogue version, so an unchanged page is answered without querying items
+        version, last_modified = catalogue_version(session)
+        etag = str(version)
+        headers = validator_headers(etag, last_modified)
+
+        if is_not_modified(request.environ, etag, last_modified):
+            return '', 304, headers
+
+        # Only the requested columns are selected. The id is always selected because it is the page key
+        if list_input.fields:
+            columns = [Item.id] + [_item_field_columns[field] for field in list_input.fields if field != 'id']
+            query = session.query(*columns)
+        else:
+            # Plain rows instead of Item instances, serialized with serialize_item
+            query = session.query(*ITEM_ROW_COLUMNS)
+
+        if list_input.min_price is not None:
+            query = query.filter(Item.price_cents >= to_cents(list_input.min_price))
+        if list_input.max_price is not None:
+            query = query.filter(Item.price_cents <= to_cents(list_input.max_price))
+        if list_input.in_stock:
+            query = query.filter(Item.quantity > 0)
+        if list_input.description_prefix:
+            # Range comparison instead of LIKE so the description index can be used
+            prefix = list_input.description_prefix
+            upper_bound = prefix_upper_bound(prefix)
+            query = query.filter(Item.description >= prefix)
+
+            if upper_bound is not None:
+                query = query.filter(Item.description < upper_bound)
+        if list_input.cursor is not None:
+            query = query.filter(Item.id > list_input.cursor)
+
+        # One extra row tells whether there is a next page
+        rows = query.order_by(Item.id).limit(list_input.limit + 1).all()
+
+        if not rows and list_input.cursor is None:
             raise EmptyResourceError("Items not found. Please add items to menu")
 
-        return jsonify([item.serialize for item in all_items]), 200
+        has_next_page = len(rows) > list_input.limit
+        rows = rows[:list_input.limit]
 
+        if list_input.fields:
+            response = jsonify([{field: getattr(row, field) for field in list_input.fields} for row in rows])
+        else:
+            response = _item_rows_response(rows)
+
+        response.headers.update(headers)
+
+        if has_next_page:
+            response.headers['X-Next-Cursor'] = encode_cursor(rows[-1].id)
+
+        return response, 200
+
+    except ValidationError as ex:
+        abort(400, ex)
     except EmptyResourceError as ex:
         abort(404, str(ex))
     except Exception as ex:
         abort(500, str(ex))
 
 
-@items_bp.route('/<int:item_id>', methods=['GET'])
+def _item_rows_response(rows):
+    """JSON response with the list of ITEM_ROW_COLUMNS rows, assembled from pre-encoded item fragments if enabled"""
+
+    fragment_cache = get_item_fragment_cache()
+
+    if fragment_cache is not None and not _json_pretty_printed():
+        return current_app.response_class(fragment_cache.encode_page(rows) + b'\n',
+                                          mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+    return jsonify([serialize_item(row) for row in rows])
+
+
+@items_bp.route('/search', methods=['GET'])
+def search_items_by_description():
+    """
+    Description: Search items by description as the user types. Every word of q matches description words
+        starting with it, case and accent insensitive, so "piz marg" finds "Pizza Margherita"
+    URL: api/v1/items/search?q=piz%20marg&limit=10
+    Method: GET
+    Content Type: application/json
+    Query Parameters:
+        q: Search text, at most 100 characters
+        limit (optional): Maximum number of items returned. Defaults to 10, at most 100
+    Body: N/A
+    Responses:
+        200: Success. Matching items, best match first. Empty list when nothing matches
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        search_input = ItemSearchInputValidator.parse(request.args)
+
+        return _item_rows_response(search_items(get_read_session(), search_input.q, search_input.limit)), 200
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+@items_bp.route('/export', methods=['GET'])
+def export_items():
+    """
+    Description: Stream every item as newline-delimited JSON, ordered by item id
+    URL: api/v1/items/export?since_id=1000
+    Method: GET
+    Content Type: application/x-ndjson
+    Query Parameters (all optional):
+        since_id: Only export items with an id greater than since_id. Used to resume an interrupted export
+    Body: N/A
+    Responses:
+        200: Success. Items streamed, one JSON object per line
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        export_input = ExportInputValidator.parse(request.args)
+
+        items = (
+            get_read_session().query(Item)
+            .filter(Item.id > export_input.since_id)
+            .order_by(Item.id)
+            .yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+        )
+
+        return ndjson_response(items, lambda item: item.serialize)
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+@items_bp.route('/changes', methods=['GET'])
+def get_item_changes():
+    """
+    Description: Get the items changed after a stock event seq, for terminals keeping a local copy of the
+        catalogue. Only the latest change of each item is returned. Long-polls for new changes when wait is set
+    URL: api/v1/items/changes?since=1200&limit=1000&wait=25
+    Method: GET
+    Content Type: application/json
+    Query Parameters (all optional):
+        since: Return the changes after this seq, taken from last_seq of the previous response. Defaults to 0
+        limit: Maximum number of stock events read. Defaults to 1000, at most 10000
+        wait: Seconds to wait for a change when there is none yet. Defaults to 0, at most 30
+    Body: N/A
+    Responses:
+        200: Success. {"changes": [{"seq": 1201, "item_id": 1, "change": "sold", "item": {...}, "created_at": ...}],
+             "last_seq": 1201, "has_more": false}. item is null for deleted items
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        changes_input = StockChangesInputValidator.parse(request.args)
+
+        session = get_read_session()
+        stock_events = get_stock_events(session, changes_input.since, changes_input.limit)
+
+        if not stock_events and changes_input.wait:
+            stock_events = _wait_for_stock_events(session, changes_input)
+
+        # A later change of the same item replaces the earlier ones
+        latest_changes = {stock_event.item_id: stock_event for stock_event in stock_events}
+
+        return jsonify({
+            'changes': [stock_event.serialize for stock_event in sorted(latest_changes.values(),
+                                                                         key=attrgetter('seq'))],
+            'last_seq': stock_events[-1].seq if stock_events else changes_input.since,
+            'has_more': len(stock_events) == changes_input.limit,
+        }), 200
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+def _wait_for_stock_events(session, changes_input):
+    """Wait up to changes_input.wait seconds for stock events after changes_input.since"""
+
+    broker = get_stock_broker()
+    subscriber = broker.subscribe()
+    deadline = time.monotonic() + changes_input.wait
+
+    try:
+        while True:
+            # End the read transaction, so the next read sees the latest commit and the wait holds no snapshot
+            session.close()
+
+            # Read again after subscribing, an event may have committed in between
+            stock_events = get_stock_events(session, changes_input.since, changes_input.limit)
+            remaining = deadline - time.monotonic()
+
+            if stock_events or remaining <= 0:
+                return stock_events
+
+            session.close()
+            subscriber.get(remaining)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@items_bp.route('/changes/stream', methods=['GET'])
+def stream_item_changes():
+    """
+    Description: Stream item changes as Server-Sent Events. Every "change" event has the stock event seq as its
+        id and the same JSON data as an entry of api/v1/items/changes. A keep-alive comment is sent while idle.
+        A client that falls too far behind is disconnected and catches up when it reconnects with Last-Event-ID
+    URL: api/v1/items/changes/stream?since=1200
+    Method: GET
+    Content Type: text/event-stream
+    Query Parameters (all optional):
+        since: Replay the changes after this seq before streaming new ones. Defaults to the Last-Event-ID header,
+            or to new changes only
+    Body: N/A
+    Responses:
+        200: Success. Changes streamed until the client disconnects
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        stream_input = StockStreamInputValidator.parse(request.args)
+        since = stream_input.since
+
+        if since is None and request.headers.get('Last-Event-ID'):
+            since = StockStreamInputValidator.parse({'since': request.headers['Last-Event-ID']}).since
+
+        return sse_response(_stock_event_stream(since, current_app.config['STOCK_FEED_HEARTBEAT']))
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+def _stock_event_stream(since, heartbeat):
+    """Yield the stock events after since from the log, then the new events published by the broker"""
+
+    broker = get_stock_broker()
+    subscriber = broker.subscribe()
+    session = get_read_session()
+
+    try:
+        # Subscribed first, so no event committed during the replay is missed
+        if since is None:
+            since = latest_seq(session)
+
+        while True:
+            stock_events = get_stock_events(session, since, DEFAULT_CHANGES_LIMIT)
+
+            for stock_event in stock_events:
+                since, data = encode_stock_event(stock_event)
+                yield sse_message(data, 'change', since)
+
+            if len(stock_events) < DEFAULT_CHANGES_LIMIT:
+                break
+
+        # Release the connection for the rest of the stream
+        session.close()
+
+        while True:
+            encoded_event = subscriber.get(heartbeat)
+
+            if encoded_event is None:
+                yield SSE_KEEP_ALIVE
+            elif encoded_event is OVERFLOWED:
+                return
+            elif encoded_event[0] > since:
+                since, data = encoded_event
+                yield sse_message(data, 'change', since)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@items_bp.route(f'/<int(max={MAX_INTEGER}):item_id>', methods=['GET'])
 def get_item_by_id(item_id):
     """
     Description: Get an item by item_id
     URL: api/v1/items/123
     Method: GET
     Content Type: application/json
+    Request Headers (all optional):
+        If-None-Match, If-Modified-Since: ETag and Last-Modified of the item the client already has
     Body: N/A
+    Response Headers:
+        ETag, Last-Modified: Version and time of the item's latest change
     Responses:
         200: Success. Item found
+        304: Item not changed since the version the client already has
         404: Item with item_id not found
         500: Internal server error
     """
 
     try:
-        item = Item.query.get(item_id)
+        item_cache = get_item_cache()
+        cache_entry = item_cache.get(item_id)
 
-        if not item:
-            raise EmptyResourceError(f"Item {item_id} not found")
+        if cache_entry is None:
+            session = get_read_session()
 
-        return jsonify(item.serialize), 200
+            if has_conditional_headers(request.environ):
+                # Revalidate from the version columns without loading the item
+                versions = session.query(Item.version, Item.updated_at).filter(Item.id == item_id).first()
+
+                if versions and is_not_modified(request.environ, str(versions.version), versions.updated_at):
+                    return '', 304, validator_headers(str(versions.version), versions.updated_at)
+
+            item = session.query(Item).get(item_id)
+
+            if not item:
+                raise EmptyResourceError(f"Item {item_id} not found")
+
+            cache_entry = item_cache.set(item_id, item.cache_entry)
+
+        headers = validator_headers(cache_entry['etag'], cache_entry['last_modified'])
+
+        if is_not_modified(request.environ, cache_entry['etag'], cache_entry['last_modified']):
+            return '', 304, headers
+
+        return jsonify(cache_entry['item']), 200, headers
 
     except EmptyResourceError as ex:
         abort(404, str(ex))
@@ -107,7 +581,7 @@ def get_item_by_id(item_id):
         abort(500, str(ex))
 
 
-@items_bp.route('/<int:item_id>', methods=['PUT'])
+@items_bp.route(f'/<int(max={MAX_INTEGER}):item_id>', methods=['PUT'])
 def update_item_by_id(item_id):
     """
     Description: Update an item by item_id
@@ -122,38 +596,40 @@ def update_item_by_id(item_id):
     }
     Responses:
         200: Success. Item updated
+        400: Input validation error
         404: Item with item_id not found
         500: Internal server error
     """
 
     try:
-        description = request.json['description']
-        price = request.json['price']
-        quantity = request.json['quantity']
-
         # Validate input
-        ItemInputValidator(description, price, quantity)
+        item_input = ItemInputValidator.parse(request.json)
 
         item = Item.query.get(item_id)
 
         if not item:
             raise EmptyResourceError(f"Failed to update. Item {item_id} not found")
 
-        item.description = description
-        item.price = price
-        item.quantity = quantity
+        item.description = item_input.description
+        item.price = item_input.price
+        item.quantity = item_input.quantity
 
+        record_item_changes(db.session, 'updated', [item_id])
         db.session.commit()
 
+        get_item_cache().invalidate([item_id])
+
         return jsonify(item.serialize), 200
 
+    except ValidationError as ex:
+        abort(400, ex)
     except EmptyResourceError as ex:
         abort(404, str(ex))
     except Exception as ex:
         abort(500, str(ex))
 
 
-@items_bp.route('/<int:item_id>', methods=['DELETE'])
+@items_bp.route(f'/<int(max={MAX_INTEGER}):item_id>', methods=['DELETE'])
 def remove_item_by_id(item_id):
     """
     Description: Delete an item by item_id
@@ -174,8 +650,11 @@ def remove_item_by_id(item_id):
             raise EmptyResourceError(f"Failed to delete. Item {item_id} not found")
 
         db.session.delete(item)
+        record_item_removed(db.session, item_id)
         db.session.commit()
 
+        get_item_cache().invalidate([item_id])
+
         return jsonify(item.serialize), 200
 
     except EmptyResourceError as ex:
@@ -1,16 +1,62 @@
-from flask import request, jsonify, abort, Blueprint
-from pydantic import ValidationError
+from flask import request, jsonify, abort, Blueprint, current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from werkzeug.exceptions import HTTPException
 
 from pos import db
-from pos.exceptions.custom_exceptions import EmptyResourceError, QuantityError, PaymentError
-from pos.models.item import Item
+from pos.database import get_read_session
+from pos.exceptions.custom_exceptions import EmptyResourceError, QuantityError, PaymentError, \
+    IdempotencyConflictError, ServiceUnavailableError, ValidationError
+from pos.models.archived_order_key import ArchivedOrderKey
 from pos.models.order import Order
 from pos.models.order_item import OrderItem
-from pos.validators.order_input_validator import OrderInputValidator
-from pos.validators.payment_validator import payment_validator
+from pos.services.idempotency import get_idempotency_registry
+from pos.services.inventory import get_inventory_ledger, load_order_items
+from pos.services.item_cache import get_item_cache
+from pos.services.order_archive import find_archived_order, get_archive_directory
+from pos.services.order_writer import get_order_writer
+from pos.services.orders import create_order, find_order_id, place_order
+from pos.services.transactions import begin_write_transaction
+from pos.stores import require_store
+from pos.utils.cursor import encode_cursor
+from pos.utils.ndjson import ndjson_response
+from pos.validators.base import MAX_INTEGER
+from pos.validators.export_input_validator import ExportInputValidator
+from pos.validators.order_input_validator import OrderInputValidator, MAX_BATCH_ORDERS
+from pos.validators.order_read_input_validator import OrderReadInputValidator, OrderListInputValidator
+from pos.validators.payment_validator import merge_order_items, payment_validator
 
 # Blueprint for api/v1/orders routes
 orders_bp = Blueprint("orders", __name__)
+orders_bp.before_request(require_store)
+
+
+def _place_order(order_items, payment_amount, order_note, idempotency_key=None):
+    """Validate and place a single order. Returns the response body for POST api/v1/orders"""
+
+    if current_app.config['ORDER_GROUP_COMMIT']:
+        order_id = get_order_writer().place_order(order_items, payment_amount, order_note, idempotency_key,
+                                                  current_app.config['ORDER_GROUP_COMMIT_TIMEOUT'])
+        return {"order_id": order_id}
+
+    try:
+        order_id = place_order(db.session, order_items, payment_amount, order_note, idempotency_key,
+                               inventory=get_inventory_ledger())
+
+        db.session.commit()
+
+        get_item_cache().invalidate([order_item['item_id'] for order_item in order_items])
+    except IntegrityError:
+        db.session.rollback()
+
+        # Lost the race against a concurrent request with the same idempotency key
+        order_id = find_order_id(db.session, idempotency_key)
+
+        if idempotency_key is None or order_id is None:
+            raise
+
+    return {"order_id": order_id}
 
 
 @orders_bp.route('/', methods=['POST'])
@@ -20,6 +66,9 @@ def add_order():
     URL: api/v1/orders
     Method: POST
     Content Type: application/json
+    Headers (optional):
+        Idempotency-Key: Client generated key of at most 64 characters. A retry with the same key returns the
+        original {"order_id": ...} instead of placing the order again
     Body:
         {
             "order_items": [
@@ -39,70 +88,307 @@ def add_order():
         200: Success. Order placed successfully
         400: Invalid payment error, ordered quantity not available or input validation error
         404: Ordered item(s) not found in the system
+        409: A request with the same Idempotency-Key is still in progress
+        500: Internal server error
+        503: Too many orders are waiting to be placed (ORDER_GROUP_COMMIT). Retry after the Retry-After seconds
+    """
+
+    try:
+        # Validate input
+        order_input = OrderInputValidator.parse(request.json,
+                                                idempotency_key=request.headers.get('Idempotency-Key'))
+        order_items = order_input.order_items
+        payment_amount = order_input.payment_amount
+        order_note = order_input.order_note
+        idempotency_key = order_input.idempotency_key
+
+        if idempotency_key is None:
+            return jsonify(_place_order(order_items, payment_amount, order_note)), 200
+
+        # Retries wait for an in-flight request with the same key and then reuse its response
+        registry = get_idempotency_registry()
+        response = registry.begin(idempotency_key, current_app.config['IDEMPOTENCY_WAIT_TIMEOUT'])
+
+        if response is None:
+            try:
+                response = _place_order(order_items, payment_amount, order_note, idempotency_key)
+            finally:
+                registry.finish(idempotency_key, response)
+
+        return jsonify(response), 200
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except (QuantityError, PaymentError) as ex:
+        db.session.rollback()
+        abort(400, str(ex))
+    except EmptyResourceError as ex:
+        db.session.rollback()
+        abort(404, str(ex))
+    except IdempotencyConflictError as ex:
+        abort(409, str(ex))
+    except ServiceUnavailableError as ex:
+        abort(503, str(ex))
+    except Exception as ex:
+        db.session.rollback()
+        abort(500, str(ex))
+
+
+@orders_bp.route('/batch', methods=['POST'])
+def add_order_batch():
+    """
+    Description: Add many orders in one request, e.g. when an offline till replays its queued orders.
+    Orders are applied in sequence. Each order is accepted or rejected on its own and all accepted orders are
+    committed together. Orders whose idempotency_key was already used are not placed again
+    URL: api/v1/orders/batch
+    Method: POST
+    Content Type: application/json
+    Body:
+        {
+            "orders": [
+                {
+                    "order_items": [
+                        {
+                            "item_id":1,
+                            "order_quantity":1
+                        }
+                    ],
+                    "payment_amount": 12.5,
+                    "order_note": "Add extra cheese",
+                    "idempotency_key": "till-3-000123"
+                }
+            ]
+        }
+    Responses:
+        200: Success. Body lists the result of every order in request order:
+            {"index": 0, "status": "accepted", "order_id": 12}
+            {"index": 1, "status": "duplicate", "order_id": 7}
+            {"index": 2, "status": "rejected", "error": "Payment amount is too low"}
+        400: Body is not a list of orders
         500: Internal server error
     """
 
     try:
-        order_items = request.json['order_items']
-        payment_amount = request.json['payment_amount']
-        order_note = request.json['order_note']
+        orders = request.json.get('orders') if isinstance(request.json, dict) else None
+
+        if not isinstance(orders, list) or not orders:
+            abort(400, "Body must contain a non-empty list of orders")
+
+        if len(orders) > MAX_BATCH_ORDERS:
+            abort(400, f"At most {MAX_BATCH_ORDERS} orders can be placed in one request")
+
+        results = [None] * len(orders)
+        valid_orders = []
 
         # Validate input
-        OrderInputValidator(order_items, payment_amount, order_note)
+        for index, order in enumerate(orders):
+            try:
+                order_input = OrderInputValidator.parse(order)
+                valid_orders.append((index, order_input, merge_order_items(order_input.order_items)))
+            except ValidationError as ex:
+                results[index] = {'index': index, 'status': 'rejected', 'error': str(ex), 'errors': ex.errors()}
+
+        begin_write_transaction(db.session)
 
-        # Validate item availability and payment correctness
-        payment_validator(order_items, payment_amount)
+        # Resolve every referenced item and every already used idempotency key once for the whole batch
+        items = load_order_items(
+            db.session, {item_id for _, _, order_quantities in valid_orders for item_id in order_quantities},
+            get_inventory_ledger(),
+        )
+        available_quantities = {item_id: item.quantity for item_id, item in items.items()}
 
-        # Create order
-        new_order = Order(payment_amount, order_note)
-        db.session.add(new_order)
+        idempotency_keys = {order_input.idempotency_key for _, order_input, _ in valid_orders} - {None}
+        placed_orders = dict(
+            db.session.query(Order.idempotency_key, Order.id).filter(Order.idempotency_key.in_(idempotency_keys))
+        )
+        placed_orders.update(
+            db.session.query(ArchivedOrderKey.idempotency_key, ArchivedOrderKey.order_id)
+            .filter(ArchivedOrderKey.idempotency_key.in_(idempotency_keys))
+        )
 
-        for order_item in order_items:
-            item_id = order_item['item_id']
-            order_quantity = order_item['order_quantity']
+        for index, order_input, order_quantities in valid_orders:
+            idempotency_key = order_input.idempotency_key
 
-            item = Item.query.get(item_id)
-            item.quantity -= order_quantity
+            if idempotency_key in placed_orders:
+                results[index] = {'index': index, 'status': 'duplicate', 'order_id': placed_orders[idempotency_key]}
+                continue
 
-            order_item = OrderItem(item_id=item_id, ordered_quantity=order_quantity)
+            try:
+                # Validate item availability and payment correctness against the shared stock view
+                payment_validator(order_quantities, order_input.payment_amount, items, available_quantities)
 
-            # Update association table
-            new_order.items.append(order_item)
+                with db.session.begin_nested():
+                    new_order = create_order(db.session, order_quantities, items, order_input.payment_amount,
+                                             order_input.order_note, idempotency_key)
+            except (QuantityError, PaymentError, EmptyResourceError, IntegrityError) as ex:
+                results[index] = {'index': index, 'status': 'rejected', 'error': str(ex)}
+                continue
+
+            for item_id, order_quantity in order_quantities.items():
+                available_quantities[item_id] -= order_quantity
+
+            if idempotency_key is not None:
+                placed_orders[idempotency_key] = new_order.id
+
+            results[index] = {'index': index, 'status': 'accepted', 'order_id': new_order.id}
 
         db.session.commit()
 
-        return jsonify({"order_id": new_order.id}), 200
+        get_item_cache().invalidate(items)
 
-    except (ValidationError, QuantityError, PaymentError) as ex:
-        abort(400, str(ex))
+        return jsonify({'results': results}), 200
+
+    except HTTPException:
+        db.session.rollback()
+        raise
+    except Exception as ex:
+        db.session.rollback()
+        abort(500, str(ex))
+
+
+@orders_bp.route('/export', methods=['GET'])
+def export_orders():
+    """
+    Description: Stream every order with its order items as newline-delimited JSON, ordered by order id
+    URL: api/v1/orders/export?since_id=1000
+    Method: GET
+    Content Type: application/x-ndjson
+    Query Parameters (all optional):
+        since_id: Only export orders with an id greater than since_id. Used to resume an interrupted export
+    Body: N/A
+    Responses:
+        200: Success. Orders streamed, one JSON object per line
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        export_input = ExportInputValidator.parse(request.args)
+
+        # Order items of each batch are loaded with one extra IN (...) query instead of one query per order
+        orders = (
+            get_read_session().query(Order)
+            .options(selectinload(Order.items))
+            .filter(Order.id > export_input.since_id)
+            .order_by(Order.id)
+            .yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+        )
+
+        return ndjson_response(orders, lambda order: order.serialize)
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+def _order_query(expand_items):
+    """Order query that loads order items, and the ordered items when expanded, in one extra query each"""
+
+    if expand_items:
+        return get_read_session().query(Order).options(selectinload(Order.items).selectinload(OrderItem.item))
+
+    return get_read_session().query(Order).options(selectinload(Order.items))
+
+
+@orders_bp.route('/', methods=['GET'])
+def get_all_orders():
+    """
+    Description: Get orders in the system, one page at a time. Pages are ordered by order id
+    URL: api/v1/orders?limit=100&cursor=MTAw&expand=items
+    Method: GET
+    Content Type: application/json
+    Query Parameters (all optional):
+        limit: Maximum number of orders returned. Defaults to 100, at most 1000
+        cursor: Opaque cursor taken from the X-Next-Cursor header of the previous page
+        expand: 'items' inlines the description and unit price of every ordered item
+    Body: N/A
+    Response Headers:
+        X-Next-Cursor: Cursor for the next page. Absent on the last page
+    Responses:
+        200: Success. Page of orders returned
+        400: Query parameter validation error
+        404: No orders found in the system
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        list_input = OrderListInputValidator.parse(request.args)
+
+        query = _order_query(list_input.expand == 'items')
+
+        if list_input.cursor is not None:
+            query = query.filter(Order.id > list_input.cursor)
+
+        # One extra row tells whether there is a next page
+        orders = query.order_by(Order.id).limit(list_input.limit + 1).all()
+
+        if not orders and list_input.cursor is None:
+            raise EmptyResourceError("Orders not found. Please place orders")
+
+        has_next_page = len(orders) > list_input.limit
+        orders = orders[:list_input.limit]
+
+        if list_input.expand == 'items':
+            response = jsonify([order.serialize_expanded for order in orders])
+        else:
+            response = jsonify([order.serialize for order in orders])
+
+        if has_next_page:
+            response.headers['X-Next-Cursor'] = encode_cursor(orders[-1].id)
+
+        return response, 200
+
+    except ValidationError as ex:
+        abort(400, ex)
     except EmptyResourceError as ex:
         abort(404, str(ex))
     except Exception as ex:
         abort(500, str(ex))
 
 
-@orders_bp.route('/<int:order_id>', methods=['GET'])
+@orders_bp.route(f'/<int(max={MAX_INTEGER}):order_id>', methods=['GET'])
 def get_order_by_id(order_id):
     """
-    Description: Get an order by order_id
-    URL: api/v1/orders/1234
+    Description: Get an order by order_id. Archived orders are read from the order archive
+    URL: api/v1/orders/1234?expand=items
     Method: GET
     Content Type: application/json
+    Query Parameters (all optional):
+        expand: 'items' inlines the description and unit price of every ordered item
     Body: N/A
     Responses:
         200: Success. Order found
+        400: Query parameter validation error
         404: Order with order_id not found
         500: Internal server error
     """
 
     try:
-        order = Order.query.get(order_id)
+        # Validate input
+        read_input = OrderReadInputValidator.parse(request.args)
+
+        order = _order_query(read_input.expand == 'items').filter(Order.id == order_id).first()
 
         if not order:
-            raise EmptyResourceError(f"Order {order_id} not found. Please place orders")
+            # Old orders are moved to the archive by flask archive-orders
+            archived_order = find_archived_order(get_read_session(), get_archive_directory(), order_id,
+                                                 read_input.expand == 'items')
+
+            if archived_order is None:
+                raise EmptyResourceError(f"Order {order_id} not found. Please place orders")
+
+            return jsonify(archived_order), 200
+
+        if read_input.expand == 'items':
+            return jsonify(order.serialize_expanded), 200
 
         return jsonify(order.serialize), 200
 
+    except ValidationError as ex:
+        abort(400, ex)
     except EmptyResourceError as ex:
         abort(404, str(ex))
     except Exception as ex:
@@ -0,0 +1,239 @@
+from datetime import datetime, timedelta
+
+from flask import request, jsonify, abort, Blueprint
+from sqlalchemy import func
+
+from pos.database import get_read_session
+from pos.exceptions.custom_exceptions import ValidationError
+from pos.models.item import Item
+from pos.models.item_sales import ItemSales
+from pos.services.sales import period_start
+from pos.stores import run_per_store
+from pos.utils.money import from_cents
+from pos.validators.report_input_validator import TopSellersInputValidator, RevenueInputValidator, \
+    LowStockInputValidator
+
+# Blueprint for api/v1/reports routes
+reports_bp = Blueprint("reports", __name__)
+
+
+def _sales_query(session, columns, report_input):
+    """Query over the hourly or daily sales aggregates whose period starts in [start, end)"""
+
+    query = session.query(*columns).filter(ItemSales.period == report_input.period)
+
+    if report_input.start is not None:
+        query = query.filter(ItemSales.period_start >= report_input.start)
+    if report_input.end is not None:
+        query = query.filter(ItemSales.period_start < report_input.end)
+
+    return query
+
+
+def _merge_store_rows(store_results, sort_key, limit):
+    """Merge the rows each store returned into one list of at most limit rows. When several stores were read every
+    row gets the store_id it came from, as item ids are only unique within a store
+    """
+
+    if len(store_results) == 1:
+        return store_results[0][1]
+
+    rows = [dict(row, store_id=store_id) for store_id, store_rows in store_results for row in store_rows]
+    rows.sort(key=sort_key)
+
+    return rows[:limit]
+
+
+def _top_sellers(report_input):
+    session = get_read_session()
+    units_sold = func.sum(ItemSales.units_sold)
+    revenue_cents = func.sum(ItemSales.revenue_cents)
+    rank = units_sold if report_input.rank_by == 'units' else revenue_cents
+
+    rows = (
+        _sales_query(session, (ItemSales.item_id, units_sold, revenue_cents), report_input)
+        .group_by(ItemSales.item_id)
+        .order_by(rank.desc(), ItemSales.item_id)
+        .limit(report_input.limit)
+        .all()
+    )
+
+    # Deleted items keep their sales but have no description
+    descriptions = dict(session.query(Item.id, Item.description).filter(Item.id.in_([row[0] for row in rows])))
+
+    return [
+        {
+            'item_id': item_id,
+            'description': descriptions.get(item_id),
+            'units_sold': item_units_sold,
+            'revenue': from_cents(item_revenue_cents),
+        }
+        for item_id, item_units_sold, item_revenue_cents in rows
+    ]
+
+
+def _revenue(report_input):
+    columns = (ItemSales.period_start, func.sum(ItemSales.units_sold), func.sum(ItemSales.revenue_cents))
+
+    return (
+        _sales_query(get_read_session(), columns, report_input)
+        .group_by(ItemSales.period_start)
+        .order_by(ItemSales.period_start)
+        .all()
+    )
+
+
+def _low_stock(report_input):
+    session = get_read_session()
+    items = (
+        session.query(Item.id, Item.description, Item.quantity)
+        .filter(Item.quantity <= report_input.threshold)
+        .order_by(Item.quantity, Item.id)
+        .limit(report_input.limit)
+        .all()
+    )
+
+    first_day = period_start(datetime.utcnow(), 'day') - timedelta(days=report_input.days - 1)
+    units_sold = dict(
+        session.query(ItemSales.item_id, func.sum(ItemSales.units_sold))
+        .filter(ItemSales.period == 'day', ItemSales.period_start >= first_day)
+        .filter(ItemSales.item_id.in_([item.id for item in items]))
+        .group_by(ItemSales.item_id)
+    )
+
+    return [
+        {
+            'id': item.id,
+            'description': item.description,
+            'quantity': item.quantity,
+            'units_sold': units_sold.get(item.id, 0),
+        }
+        for item in items
+    ]
+
+
+@reports_bp.route('/top-sellers', methods=['GET'])
+def get_top_sellers():
+    """
+    Description: Get the best selling items, answered from the hourly or daily sales aggregates
+    URL: api/v1/reports/top-sellers?period=day&start=2021-08-01&end=2021-09-01&rank_by=revenue&limit=10
+    Method: GET
+    Content Type: application/json
+    Headers (optional):
+        X-Store-Id: Report on this store only. When stores are configured and the header is missing, all stores
+        are read in parallel and every entry gets the store_id it belongs to
+    Query Parameters (all optional):
+        period: Aggregates to read, 'hour' or 'day'. Defaults to 'day'
+        start, end: ISO 8601 dates or datetimes. Only periods starting in [start, end) are counted
+        rank_by: 'units' or 'revenue'. Defaults to 'units'
+        limit: Maximum number of items returned. Defaults to 10, at most 1000
+    Body: N/A
+    Responses:
+        200: Success. Items ordered by units sold or revenue, highest first
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        report_input = TopSellersInputValidator.parse(request.args)
+
+        rank = 'units_sold' if report_input.rank_by == 'units' else 'revenue'
+        rows = _merge_store_rows(
+            run_per_store(lambda: _top_sellers(report_input)),
+            lambda row: (-row[rank], row['store_id'], row['item_id']),
+            report_input.limit,
+        )
+
+        return jsonify(rows), 200
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+@reports_bp.route('/revenue', methods=['GET'])
+def get_revenue():
+    """
+    Description: Get units sold and revenue per hour or day, answered from the sales aggregates
+    URL: api/v1/reports/revenue?period=hour&start=2021-08-30&end=2021-08-31
+    Method: GET
+    Content Type: application/json
+    Headers (optional):
+        X-Store-Id: Report on this store only. When stores are configured and the header is missing, all stores
+        are read in parallel and their sales are summed per period
+    Query Parameters (all optional):
+        period: 'hour' or 'day'. Defaults to 'day'
+        start, end: ISO 8601 dates or datetimes. Only periods starting in [start, end) are returned
+    Body: N/A
+    Responses:
+        200: Success. One entry per period with sales, oldest first. Timestamps are UTC
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        report_input = RevenueInputValidator.parse(request.args)
+
+        # Periods are summed over all stores that were read
+        totals = {}
+
+        for store_id, rows in run_per_store(lambda: _revenue(report_input)):
+            for start, units_sold, revenue_cents in rows:
+                period_units_sold, period_revenue_cents = totals.get(start, (0, 0))
+                totals[start] = (period_units_sold + units_sold, period_revenue_cents + revenue_cents)
+
+        return jsonify([
+            {
+                'period_start': start.isoformat(),
+                'units_sold': units_sold,
+                'revenue': from_cents(revenue_cents),
+            }
+            for start, (units_sold, revenue_cents) in sorted(totals.items())
+        ]), 200
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
+
+
+@reports_bp.route('/low-stock', methods=['GET'])
+def get_low_stock():
+    """
+    Description: Get items that are running out, with their recent sales from the daily sales aggregates
+    URL: api/v1/reports/low-stock?threshold=10&days=7&limit=100
+    Method: GET
+    Content Type: application/json
+    Headers (optional):
+        X-Store-Id: Report on this store only. When stores are configured and the header is missing, all stores
+        are read in parallel and every entry gets the store_id it belongs to
+    Query Parameters (all optional):
+        threshold: Items with at most this quantity left are returned. Defaults to 10
+        days: Number of days, including today, counted in units_sold. Defaults to 7
+        limit: Maximum number of items returned. Defaults to 100, at most 1000
+    Body: N/A
+    Responses:
+        200: Success. Items ordered by quantity left, lowest first
+        400: Query parameter validation error
+        500: Internal server error
+    """
+
+    try:
+        # Validate input
+        report_input = LowStockInputValidator.parse(request.args)
+
+        rows = _merge_store_rows(
+            run_per_store(lambda: _low_stock(report_input)),
+            lambda row: (row['quantity'], row['store_id'], row['id']),
+            report_input.limit,
+        )
+
+        return jsonify(rows), 200
+
+    except ValidationError as ex:
+        abort(400, ex)
+    except Exception as ex:
+        abort(500, str(ex))
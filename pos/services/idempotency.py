@@ -0,0 +1,65 @@
+import threading
+import time
+
+from flask import current_app
+
+from pos.exceptions.custom_exceptions import IdempotencyConflictError
+from pos.stores import store_scoped
+from pos.utils.cache import TTLCache
+
+
+class IdempotencyRegistry:
+    """Remembers the responses of recent idempotent requests and serializes in-flight duplicates.
+
+    A request calls begin() with its key. The first caller becomes the owner and gets None back, later callers
+    with the same key wait until the owner calls finish() and then receive the owner's response. When the owner
+    fails it calls finish() without a response and one of the waiters becomes the new owner
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self._responses = TTLCache(max_size, ttl, clock)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key, timeout):
+        """Return the stored response for key, or None when the caller now owns the key"""
+
+        while True:
+            with self._lock:
+                response = self._responses.get(key)
+
+                if response is not None:
+                    return response
+
+                in_flight = self._in_flight.get(key)
+
+                if in_flight is None:
+                    self._in_flight[key] = threading.Event()
+                    return None
+
+            if not in_flight.wait(timeout):
+                raise IdempotencyConflictError(f"A request with idempotency key {key} is still in progress")
+
+    def finish(self, key, response=None):
+        """Store the owner's response, if any, and wake up the waiting duplicates"""
+
+        with self._lock:
+            if response is not None:
+                self._responses.set(key, response)
+
+            in_flight = self._in_flight.pop(key, None)
+
+        if in_flight is not None:
+            in_flight.set()
+
+    def clear(self):
+        self._responses.clear()
+
+
+def get_idempotency_registry():
+    """Return the idempotency registry of the current app and store, creating it on first use"""
+
+    return store_scoped('idempotency', lambda: IdempotencyRegistry(
+        current_app.config['IDEMPOTENCY_CACHE_SIZE'],
+        current_app.config['IDEMPOTENCY_CACHE_TTL'],
+    ))
@@ -0,0 +1,171 @@
+"""In-process inventory ledger for basket checks.
+
+With INVENTORY_LEDGER every worker keeps the quantity and price of every item in two arrays of 64-bit integers
+indexed by item id, about 16 bytes per item instead of an ORM Item per ordered item. Before each basket check the
+ledger applies the stock events committed since its last check, by any worker process, with one query on the
+stock_event primary key. So it sees every change made through the API, like a fresh item query would.
+
+The ledger only replaces reading the ordered items. Stock is still reserved with the guarded UPDATE of
+reserve_stock() in the order's transaction, so the database stays the authority across worker processes and a
+basket the ledger accepted against stock sold a moment ago is still rejected. Nothing is ever written back from the
+ledger, so after a crash or restart it is simply loaded again from the item table
+"""
+import threading
+from array import array
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import bindparam, func, select
+
+from pos.models.item import Item
+from pos.models.stock_event import StockEvent
+from pos.services.stock_events import latest_seq
+from pos.stores import store_scoped
+from pos.validators.payment_validator import load_items
+
+# Quantity of the array slots of ids without an item
+MISSING = -1
+
+# What payment_validator() and create_order() read of an item
+LedgerItem = namedtuple('LedgerItem', 'id quantity price_cents')
+
+_stock_events_statement = (
+    select(StockEvent.seq, StockEvent.item_id, StockEvent.change, StockEvent.quantity, StockEvent.price_cents)
+    .where(StockEvent.seq > bindparam('since_seq'))
+    .order_by(StockEvent.seq)
+    .limit(bindparam('limit'))
+)
+
+
+class InventoryLedger:
+    """Quantity and price in cents of every item, in arrays indexed by item id.
+
+    Ids up to max_dense_id are kept in the arrays, so their memory grows with the largest id. The few items with
+    larger ids, e.g. created with explicit ids by the bulk route, are kept in a dict instead
+    """
+
+    # Stock events applied per query while catching up
+    batch_size = 10000
+
+    def __init__(self, max_dense_id):
+        self.max_dense_id = max_dense_id
+        self._lock = threading.Lock()
+        self._quantities = array('q')
+        self._prices = array('q')
+        self._sparse = {}
+        self._last_seq = None
+
+    def items(self, session, item_ids):
+        """Return {item_id: LedgerItem} of the items in item_ids that exist, like load_items()"""
+
+        with self._lock:
+            self._catch_up(session.connection())
+
+            found_items = {}
+            quantities, prices, size = self._quantities, self._prices, len(self._quantities)
+
+            for item_id in item_ids:
+                if 0 <= item_id < size:
+                    if quantities[item_id] != MISSING:
+                        found_items[item_id] = LedgerItem(item_id, quantities[item_id], prices[item_id])
+                elif item_id in self._sparse:
+                    found_items[item_id] = LedgerItem(item_id, *self._sparse[item_id])
+
+            return found_items
+
+    def load(self, session):
+        """Load every item now instead of on the first basket check"""
+
+        with self._lock:
+            self._catch_up(session.connection())
+
+    def clear(self):
+        with self._lock:
+            self._quantities = array('q')
+            self._prices = array('q')
+            self._sparse = {}
+            self._last_seq = None
+
+    def __len__(self):
+        return sum(quantity != MISSING for quantity in self._quantities) + len(self._sparse)
+
+    @property
+    def nbytes(self):
+        """Memory of the arrays in bytes"""
+        return (len(self._quantities) + len(self._prices)) * self._quantities.itemsize
+
+    def _catch_up(self, connection):
+        if self._last_seq is None:
+            self._load(connection)
+
+        while True:
+            stock_events = connection.execute(
+                _stock_events_statement, {'since_seq': self._last_seq, 'limit': self.batch_size}
+            ).all()
+
+            for seq, item_id, change, quantity, price_cents in stock_events:
+                if change == 'deleted':
+                    self._set(item_id, MISSING, 0)
+                else:
+                    self._set(item_id, quantity, price_cents)
+
+                self._last_seq = seq
+
+            if len(stock_events) < self.batch_size:
+                return
+
+    def _load(self, connection):
+        # Events committed while the items are read are applied again by the catch up, which is harmless because
+        # every event holds the item's whole state
+        self._last_seq = latest_seq(connection)
+        self._sparse = {}
+
+        size = min(connection.execute(select(func.max(Item.id))).scalar() or -1, self.max_dense_id) + 1
+
+        self._quantities = array('q', [MISSING]) * size
+        self._prices = array('q', [0]) * size
+
+        # Rows are fetched as they are applied, so the whole item table is never held as rows
+        for item_id, quantity, price_cents in connection.execute(select(Item.id, Item.quantity, Item.price_cents)):
+            self._set(item_id, quantity, price_cents)
+
+    def _set(self, item_id, quantity, price_cents):
+        if item_id > self.max_dense_id:
+            if quantity == MISSING:
+                self._sparse.pop(item_id, None)
+            else:
+                self._sparse[item_id] = (quantity, price_cents)
+            return
+
+        if item_id >= len(self._quantities):
+            # New items get the next ids, so the arrays grow by at least a quarter to keep appends cheap
+            size = min(max(item_id + 1, len(self._quantities) * 5 // 4), self.max_dense_id + 1)
+            self._quantities.extend(array('q', [MISSING]) * (size - len(self._quantities)))
+            self._prices.extend(array('q', [0]) * (size - len(self._prices)))
+
+        self._quantities[item_id] = quantity
+        self._prices[item_id] = price_cents
+
+
+def get_inventory_ledger():
+    """Return the inventory ledger of the current app and store, creating it on first use. None when
+    INVENTORY_LEDGER is off
+    """
+
+    if not current_app.config['INVENTORY_LEDGER']:
+        return None
+
+    return store_scoped('inventory_ledger', lambda: InventoryLedger(
+        current_app.config['INVENTORY_LEDGER_MAX_DENSE_ID'],
+    ))
+
+
+def load_order_items(session, item_ids, inventory=None):
+    """Return {item_id: item} of the ordered items for payment_validator(), from inventory when one is passed and
+    from the item table otherwise
+    """
+
+    if inventory is None:
+        return load_items(item_ids, session)
+
+    return inventory.items(session, item_ids)
@@ -0,0 +1,162 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from types import MappingProxyType
+
+from flask import current_app
+
+from pos.stores import current_store_id, store_scoped
+from pos.utils.cache import TTLCache
+
+
+class ItemCache(ABC):
+    """Read-through cache of serialized items, keyed by item id.
+
+    Backends store immutable snapshots of Item.cache_entry. Writers invalidate the ids they changed after their
+    transaction commits, and every entry also expires after a TTL so a missed invalidation heals itself
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, item_id):
+        """Return the cached snapshot for item_id, or None"""
+
+        snapshot = self._get(item_id)
+
+        with self._stats_lock:
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return snapshot
+
+    @abstractmethod
+    def set(self, item_id, serialized_item):
+        """Cache a snapshot of serialized_item and return it"""
+        ...
+
+    @abstractmethod
+    def invalidate(self, item_ids):
+        """Drop the cached snapshots of item_ids"""
+        ...
+
+    @abstractmethod
+    def clear(self):
+        """Drop every cached snapshot"""
+        ...
+
+    @property
+    def stats(self):
+        """Hit and miss counters of this process"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    @abstractmethod
+    def _get(self, item_id):
+        ...
+
+
+class NullItemCache(ItemCache):
+    """Item cache that never caches. Used when ITEM_CACHE_BACKEND is None"""
+
+    def set(self, item_id, serialized_item):
+        return MappingProxyType(dict(serialized_item))
+
+    def invalidate(self, item_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def _get(self, item_id):
+        return None
+
+
+class LocalItemCache(ItemCache):
+    """In-process item cache with size-bounded LRU and TTL eviction. Each worker process has its own copy"""
+
+    def __init__(self, max_size, ttl):
+        super().__init__()
+        self._snapshots = TTLCache(max_size, ttl)
+
+    def set(self, item_id, serialized_item):
+        snapshot = MappingProxyType(dict(serialized_item))
+        self._snapshots.set(item_id, snapshot)
+        return snapshot
+
+    def invalidate(self, item_ids):
+        for item_id in item_ids:
+            self._snapshots.delete(item_id)
+
+    def clear(self):
+        self._snapshots.clear()
+
+    def _get(self, item_id):
+        return self._snapshots.get(item_id)
+
+
+class RedisItemCache(ItemCache):
+    """Item cache shared by all worker processes through a Redis-compatible server. Each store has its own keys.
+    Requires the optional redis package
+    """
+
+    key_prefix = 'pos:item:'
+
+    def __init__(self, url, ttl, store_id=None):
+        super().__init__()
+
+        if store_id is not None:
+            self.key_prefix = f"pos:store:{store_id}:item:"
+
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("ITEM_CACHE_BACKEND 'redis' requires the redis package. Run: pip install redis")
+
+        self._client = redis.Redis.from_url(url)
+        self._ttl = ttl
+
+    def set(self, item_id, serialized_item):
+        snapshot = MappingProxyType(dict(serialized_item))
+        self._client.set(self._key(item_id), json.dumps(dict(snapshot)), ex=self._ttl)
+        return snapshot
+
+    def invalidate(self, item_ids):
+        keys = [self._key(item_id) for item_id in item_ids]
+
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{self.key_prefix}*"):
+            self._client.delete(key)
+
+    def _get(self, item_id):
+        cached = self._client.get(self._key(item_id))
+        return None if cached is None else MappingProxyType(json.loads(cached))
+
+    def _key(self, item_id):
+        return f"{self.key_prefix}{item_id}"
+
+
+def create_item_cache(config, store_id=None):
+    """Create the item cache of store_id selected by ITEM_CACHE_BACKEND: 'local', 'redis' or None"""
+
+    backend = config['ITEM_CACHE_BACKEND']
+
+    if backend is None:
+        return NullItemCache()
+    if backend == 'local':
+        return LocalItemCache(config['ITEM_CACHE_SIZE'], config['ITEM_CACHE_TTL'])
+    if backend == 'redis':
+        return RedisItemCache(config['ITEM_CACHE_REDIS_URL'], config['ITEM_CACHE_TTL'], store_id)
+
+    raise ValueError(f"Unknown ITEM_CACHE_BACKEND: {backend}")
+
+
+def get_item_cache():
+    """Return the item cache of the current app and store, creating it on first use"""
+    return store_scoped('item_cache', lambda: create_item_cache(current_app.config, current_store_id()))
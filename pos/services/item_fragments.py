@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+from pos.models.item import Item, serialize_item
+from pos.stores import store_scoped
+
+# Columns list responses select for full items, in this order. version keys the fragments
+ITEM_ROW_COLUMNS = (Item.id, Item.description, Item.price_cents, Item.quantity, Item.version)
+_ID, _VERSION = 0, 4
+
+
+class ItemFragmentCache:
+    """Pre-encoded JSON objects of serialized items for list responses.
+
+    Fragments are keyed by item id and remember the item version they were encoded from. Every item write changes
+    the version, so a fragment is reused until the item changes and a page is assembled by joining bytes instead of
+    building and encoding a dict per row. Size-bounded LRU, one per worker process
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode_page(self, rows):
+        """Return the compact JSON array of the serialized rows as bytes, like jsonify without the newline.
+        rows are selected with ITEM_ROW_COLUMNS. Columns are read by position, which is much cheaper than by name
+        """
+
+        fragments = [None] * len(rows)
+        missing = []
+
+        # One lock round-trip per page rather than per row
+        with self._lock:
+            for index, row in enumerate(rows):
+                cached = self._fragments.get(row[_ID])
+
+                if cached is not None and cached[0] == row[_VERSION]:
+                    self._fragments.move_to_end(row[_ID])
+                    fragments[index] = cached[1]
+                else:
+                    missing.append(index)
+
+        if missing:
+            # Same encoder and options as jsonify. One encoder instance for all missing rows
+            encoder = current_app.json_encoder(
+                separators=(',', ':'),
+                ensure_ascii=current_app.config['JSON_AS_ASCII'],
+                sort_keys=current_app.config['JSON_SORT_KEYS'],
+            )
+            encoded = [(rows[index], encoder.encode(serialize_item(rows[index])).encode()) for index in missing]
+
+            with self._lock:
+                for index, (row, fragment) in zip(missing, encoded):
+                    self._fragments[row[_ID]] = (row[_VERSION], fragment)
+                    self._fragments.move_to_end(row[_ID])
+                    fragments[index] = fragment
+
+                while len(self._fragments) > self.max_size:
+                    self._fragments.popitem(last=False)
+
+        return b'[' + b','.join(fragments) + b']'
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+def get_item_fragment_cache():
+    """Return the item fragment cache of the current app and store, or None when ITEM_FRAGMENT_CACHE_SIZE is 0"""
+
+    if not current_app.config['ITEM_FRAGMENT_CACHE_SIZE']:
+        return None
+
+    return store_scoped('item_fragments', lambda: ItemFragmentCache(current_app.config['ITEM_FRAGMENT_CACHE_SIZE']))
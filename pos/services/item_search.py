@@ -0,0 +1,255 @@
+"""Full-text and typeahead search over item descriptions.
+
+Every word of a query matches description words starting with it, so "piz marg" finds "Pizza Margherita".
+When SQLite has the FTS5 extension the descriptions are indexed in the item_search virtual table. It is an
+external content table over item, kept in sync by triggers on every insert, delete and description update, no
+matter which route or command writes the item. Without FTS5 each worker keeps an in-process prefix index of the
+description words that catches up from the stock event log before every search, so it also sees the writes of
+other worker processes.
+
+Both backends rank at most ITEM_SEARCH_RANK_CANDIDATES matches, the ones with the lowest ids, so the latency of
+one-letter queries that match most of the catalogue stays bounded. Longer queries match fewer items and are
+ranked exactly
+"""
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import bindparam, column, event, select, table
+
+from pos.models.item import Item
+from pos.services.item_fragments import ITEM_ROW_COLUMNS
+from pos.services.stock_events import get_stock_events, latest_seq
+from pos.stores import store_scoped
+from pos.utils.text import prefix_upper_bound
+
+# Same word splitting and case and diacritics folding as the unicode61 tokenizer of the FTS5 index
+_WORD = re.compile(r'[^\W_]+')
+
+_SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS item_search USING fts5("
+    "description, content='item', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS item_search_insert AFTER INSERT ON item BEGIN "
+    "INSERT INTO item_search(rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS item_search_delete AFTER DELETE ON item BEGIN "
+    "INSERT INTO item_search(item_search, rowid, description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS item_search_update AFTER UPDATE OF description ON item BEGIN "
+    "INSERT INTO item_search(item_search, rowid, description) VALUES ('delete', old.id, old.description); "
+    "INSERT INTO item_search(rowid, description) VALUES (new.id, new.description); END",
+)
+
+_search_table = table('item_search', column('rowid'), column('rank'), column('item_search'))
+
+
+def tokenize(text):
+    """Split text into case folded words without diacritics"""
+
+    folded = unicodedata.normalize('NFKD', text.casefold())
+    return _WORD.findall(''.join(char for char in folded if not unicodedata.combining(char)))
+
+
+def fts5_available(connection):
+    """Whether the SQLite library behind connection was built with FTS5"""
+
+    if connection.dialect.name != 'sqlite':
+        return False
+
+    return bool(connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def create_search_index(connection):
+    """Create the item_search table and its triggers if they are missing, then index every item.
+    Returns False when SQLite has no FTS5 and the prefix index is used instead
+    """
+
+    if not fts5_available(connection):
+        return False
+
+    for statement in _SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+    connection.exec_driver_sql("INSERT INTO item_search(item_search) VALUES ('rebuild')")
+
+    return True
+
+
+def search_index_exists(connection):
+    return connection.dialect.name == 'sqlite' and connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_search'"
+    ).first() is not None
+
+
+@event.listens_for(Item.__table__, 'after_create')
+def _create_search_index(target, connection, **kwargs):
+    create_search_index(connection)
+
+
+@event.listens_for(Item.__table__, 'before_drop')
+def _drop_search_index(target, connection, **kwargs):
+    # The triggers are dropped with the item table
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS item_search")
+
+
+def _fts5_search_statement():
+    candidates = (
+        select(_search_table.c.rowid, _search_table.c.rank)
+        .where(_search_table.c.item_search.op('MATCH')(bindparam('match')))
+        .limit(bindparam('candidates'))
+        .subquery()
+    )
+
+    return (
+        select(*ITEM_ROW_COLUMNS)
+        .join(candidates, Item.id == candidates.c.rowid)
+        .order_by(candidates.c.rank, Item.id)
+        .limit(bindparam('limit'))
+    )
+
+
+class Fts5ItemSearch:
+    """Item search on the item_search FTS5 index, ranked by BM25"""
+
+    # Built once, so every search reuses the cached compiled SQL
+    statement = _fts5_search_statement()
+
+    def __init__(self, rank_candidates):
+        self.rank_candidates = rank_candidates
+
+    def search(self, session, words, limit):
+        match = ' '.join(f'"{word}"*' for word in words)
+
+        return session.execute(
+            self.statement, {'match': match, 'candidates': self.rank_candidates, 'limit': limit}
+        ).all()
+
+    def clear(self):
+        pass
+
+
+class PrefixItemSearch:
+    """In-process item search for SQLite builds without FTS5.
+
+    The index is a sorted list of (word, item_id) pairs. The items with a word starting with a prefix are one
+    contiguous slice found with two binary searches, with a fraction of the memory of a trie over the same words.
+    Items with more whole-word matches and shorter descriptions rank first
+    """
+
+    # Stock events applied per query while catching up
+    batch_size = 10000
+
+    def __init__(self, rank_candidates):
+        self.rank_candidates = rank_candidates
+        self._lock = threading.Lock()
+        self._entries = []
+        self._item_words = {}
+        self._last_seq = None
+
+    def search(self, session, words, limit):
+        with self._lock:
+            self._catch_up(session)
+
+            matches = None
+
+            # Narrowest prefix first, so the intersections stay small
+            for word_matches in sorted((self._prefix_matches(word) for word in words), key=len):
+                matches = word_matches if matches is None else matches & word_matches
+
+                if not matches:
+                    return []
+
+            candidates = heapq.nsmallest(self.rank_candidates, matches)
+            item_ids = heapq.nsmallest(limit, candidates, key=lambda item_id: self._rank(item_id, words))
+
+        rows = {row[0]: row for row in session.execute(select(*ITEM_ROW_COLUMNS).where(Item.id.in_(item_ids)))}
+
+        return [rows[item_id] for item_id in item_ids if item_id in rows]
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._item_words = {}
+            self._last_seq = None
+
+    def _prefix_matches(self, prefix):
+        start = bisect.bisect_left(self._entries, (prefix,))
+        upper_bound = prefix_upper_bound(prefix)
+        end = len(self._entries) if upper_bound is None else bisect.bisect_left(self._entries, (upper_bound,))
+
+        return {item_id for _, item_id in self._entries[start:end]}
+
+    def _rank(self, item_id, words):
+        item_words = self._item_words[item_id]
+        return -sum(word in item_words for word in words), len(item_words), item_id
+
+    def _catch_up(self, session):
+        if self._last_seq is None:
+            # Events committed while the items are read are applied again by the next catch up, which is harmless
+            self._last_seq = latest_seq(session)
+            self._entries = sorted(
+                (word, item_id)
+                for item_id, description in session.query(Item.id, Item.description)
+                for word in self._index_words(item_id, description)
+            )
+            return
+
+        while True:
+            stock_events = get_stock_events(session, self._last_seq, self.batch_size)
+
+            for stock_event in stock_events:
+                self._remove(stock_event.item_id)
+
+                if stock_event.change != 'deleted':
+                    for word in self._index_words(stock_event.item_id, stock_event.description):
+                        bisect.insort(self._entries, (word, stock_event.item_id))
+
+                self._last_seq = stock_event.seq
+
+            if len(stock_events) < self.batch_size:
+                return
+
+    def _index_words(self, item_id, description):
+        words = self._item_words[item_id] = tuple(dict.fromkeys(tokenize(description)))
+        return words
+
+    def _remove(self, item_id):
+        for word in self._item_words.pop(item_id, ()):
+            index = bisect.bisect_left(self._entries, (word, item_id))
+            del self._entries[index]
+
+
+def create_item_search(config, session):
+    """Create the search backend selected by ITEM_SEARCH_BACKEND: 'fts5', 'prefix', or 'auto' for FTS5 when the
+    database has the item_search index
+    """
+
+    backend = config['ITEM_SEARCH_BACKEND']
+
+    if backend == 'auto':
+        backend = 'fts5' if search_index_exists(session.connection()) else 'prefix'
+
+    if backend == 'fts5':
+        return Fts5ItemSearch(config['ITEM_SEARCH_RANK_CANDIDATES'])
+    if backend == 'prefix':
+        return PrefixItemSearch(config['ITEM_SEARCH_RANK_CANDIDATES'])
+
+    raise ValueError(f"Unknown ITEM_SEARCH_BACKEND: {backend}")
+
+
+def get_item_search(session):
+    """Return the item search backend of the current app and store, creating it on first use"""
+    return store_scoped('item_search', lambda: create_item_search(current_app.config, session))
+
+
+def search_items(session, query, limit):
+    """Return the ITEM_ROW_COLUMNS rows of at most limit items matching every word of query, best match first"""
+
+    words = tokenize(query)
+
+    if not words:
+        return []
+
+    return get_item_search(session).search(session, words, limit)
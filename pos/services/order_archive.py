@@ -0,0 +1,265 @@
+"""Archival of old orders into compressed segments.
+
+archive_orders() moves the orders created before a cutoff out of the order and order_item tables, in batches of
+ORDER_ARCHIVE_BATCH_SIZE orders. Every batch is written as one gzip compressed NDJSON segment per month, one order
+with its order items per line, then the batch is deleted and its segments are added to the order_archive_segment
+index in one short write transaction, which also keeps the idempotency keys of the deleted orders in
+archived_order_key. The segment files are written before that transaction, so the write lock is only held for the
+deletes, and a failed run leaves at most an unindexed file that the next run overwrites.
+
+find_archived_order() looks an order id up in the index and reads the order from its segment, so reads by order id
+keep working after an order was archived. The sales aggregates are not touched, so reports still count archived
+orders
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, func, insert, select
+
+from pos.models.archived_order_key import ArchivedOrderKey
+from pos.models.item import Item
+from pos.models.order import Order
+from pos.models.order_archive_segment import OrderArchiveSegment
+from pos.models.order_item import OrderItem
+from pos.services.sales import period_start
+from pos.services.transactions import begin_write_transaction
+from pos.stores import current_store_id
+from pos.utils.money import from_cents
+
+_segment_table = OrderArchiveSegment.__table__
+
+# Decoded segments kept per process. Segments never change once they are indexed
+SEGMENT_CACHE_SIZE = 32
+
+_segment_lookup = (
+    select(OrderArchiveSegment.path)
+    .where(OrderArchiveSegment.last_order_id >= bindparam('order_id'))
+    .where(OrderArchiveSegment.first_order_id <= bindparam('order_id'))
+)
+
+
+def get_archive_directory():
+    """Return the archive directory of the current app and store. Relative ORDER_ARCHIVE_DIRECTORY paths are
+    resolved against the pos package, like the SQLite database paths
+    """
+
+    directory = os.path.join(current_app.root_path, current_app.config['ORDER_ARCHIVE_DIRECTORY'])
+    store_id = current_store_id()
+
+    if store_id is None:
+        return os.path.normpath(directory)
+
+    return os.path.normpath(os.path.join(directory, 'stores', store_id))
+
+
+def archive_cutoff(retention_days, now=None):
+    """Return the start of the day retention_days ago. Orders created before it are archived. Whole days are
+    archived, so no hourly or daily sales period is split between archived and kept orders
+    """
+
+    return period_start((now or datetime.utcnow()) - timedelta(days=retention_days), 'day')
+
+
+def _archive_records(session, orders):
+    """Return the archive records of order rows, with their order items read in one query"""
+
+    order_items = {}
+
+    for order_item in session.execute(
+        select(OrderItem.order_id, OrderItem.item_id, OrderItem.ordered_quantity, OrderItem.unit_price_cents)
+        .where(OrderItem.order_id.in_([order.id for order in orders]))
+    ):
+        order_items.setdefault(order_item.order_id, []).append({
+            'item_id': order_item.item_id,
+            'ordered_quantity': order_item.ordered_quantity,
+            'unit_price_cents': order_item.unit_price_cents,
+        })
+
+    return [
+        {
+            'id': order.id,
+            'amount_cents': order.amount_cents,
+            'note': order.note,
+            'idempotency_key': order.idempotency_key,
+            'created_at': order.created_at.isoformat(),
+            'items': order_items.get(order.id, []),
+        }
+        for order in orders
+    ]
+
+
+def write_segment(directory, month, records):
+    """Write archive records to a new segment file under directory and return its index row.
+    The file is complete on disk before it is renamed into place
+    """
+
+    path = os.path.join(month, f"orders-{records[0]['id']:010d}-{records[-1]['id']:010d}.ndjson.gz")
+    full_path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    with open(f"{full_path}.tmp", 'wb') as segment_file:
+        with gzip.GzipFile(fileobj=segment_file, mode='wb') as gzip_file:
+            gzip_file.write(b''.join(
+                json.dumps(record, separators=(',', ':')).encode() + b'\n' for record in records
+            ))
+
+        segment_file.flush()
+        os.fsync(segment_file.fileno())
+
+    os.replace(f"{full_path}.tmp", full_path)
+
+    return {
+        'first_order_id': records[0]['id'],
+        'last_order_id': records[-1]['id'],
+        'order_count': len(records),
+        'path': path,
+        'created_at': datetime.utcnow(),
+    }
+
+
+def archive_orders(session, directory, cutoff, batch_size):
+    """Move the orders created before cutoff into archive segments under directory.
+    Returns (number of orders archived, number of segments written)
+    """
+
+    order_count = segment_count = 0
+    order_columns = (Order.id, Order.amount_cents, Order.note, Order.idempotency_key, Order.created_at)
+
+    while True:
+        orders = session.execute(
+            select(*order_columns).where(Order.created_at < cutoff).order_by(Order.id).limit(batch_size)
+        ).all()
+
+        if not orders:
+            return order_count, segment_count
+
+        segments = [
+            write_segment(directory, month, list(month_records))
+            for month, month_records in groupby(_archive_records(session, orders),
+                                                key=lambda record: record['created_at'][:7])
+        ]
+        order_ids = [order.id for order in orders]
+        archived_keys = [
+            {'idempotency_key': order.idempotency_key, 'order_id': order.id}
+            for order in orders if order.idempotency_key is not None
+        ]
+
+        # Ends the read transaction, the write lock is only taken for the deletes
+        session.rollback()
+        begin_write_transaction(session)
+
+        session.execute(delete(OrderItem.__table__).where(OrderItem.order_id.in_(order_ids)))
+        session.execute(delete(Order.__table__).where(Order.id.in_(order_ids)))
+        session.execute(insert(_segment_table), segments)
+
+        if archived_keys:
+            # Retries with the key of an archived order keep getting its id
+            session.execute(insert(ArchivedOrderKey.__table__), archived_keys)
+
+        session.commit()
+
+        order_count += len(order_ids)
+        segment_count += len(segments)
+
+
+def sales_rebuild_start(session):
+    """Return the time from which the sales aggregates can be rebuilt from the order table. None when no order was
+    archived, so everything can be rebuilt. Aggregates before it also count archived orders and must be kept
+    """
+
+    if session.query(OrderArchiveSegment.id).first() is None:
+        return None
+
+    # Orders are archived by whole days, so the day of the oldest kept order has no archived orders
+    oldest_order = session.query(func.min(Order.created_at)).scalar()
+
+    return period_start(oldest_order, 'day') if oldest_order is not None else datetime.max
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _read_segment(path):
+    """Return {order_id: encoded archive record} of the segment file at path. Every line starts with {"id":<id>,
+    so the lines are indexed without decoding them, and only the requested order is decoded
+    """
+
+    with gzip.open(path, 'rb') as segment_file:
+        return {int(line[6:line.index(b',')]): line for line in segment_file.read().splitlines()}
+
+
+def _archived_unit_price(order_item, items):
+    """Return the unit price of an archived order item, or the current price of its item from items"""
+
+    if order_item.get('unit_price_cents') is not None:
+        return from_cents(order_item['unit_price_cents'])
+
+    return items[order_item['item_id']].price if order_item['item_id'] in items else None
+
+
+def serialize_archived_order(record, items=None):
+    """Return an archive record like Order.serialize, or like Order.serialize_expanded when items maps the ids of
+    the ordered items to their current Item. Like OrderItem.unit_price, the price is the recorded unit price, or the
+    current item price for order items archived without one
+    """
+
+    if items is None:
+        order_items = [
+            {'item_id': order_item['item_id'], 'ordered_quantity': order_item['ordered_quantity']}
+            for order_item in record['items']
+        ]
+    else:
+        order_items = [
+            {
+                'item_id': order_item['item_id'],
+                'ordered_quantity': order_item['ordered_quantity'],
+                'description': items[order_item['item_id']].description if order_item['item_id'] in items else None,
+                'price': _archived_unit_price(order_item, items),
+            }
+            for order_item in record['items']
+        ]
+
+    return {'id': record['id'], 'amount': from_cents(record['amount_cents']), 'note': record['note'],
+            'items': order_items}
+
+
+def segment_paths_query(order_id):
+    """Return the query of the paths of the indexed segments whose id range holds order_id"""
+    return _segment_lookup.params(order_id=order_id)
+
+
+def read_archived_record(directory, paths, order_id):
+    """Return the archive record of order_id from the first of the segments at paths under directory that holds
+    it, or None. Only reads files, so async callers can run it on a worker thread
+    """
+
+    for path in paths:
+        encoded_record = _read_segment(os.path.join(directory, path)).get(order_id)
+
+        if encoded_record is not None:
+            return json.loads(encoded_record)
+
+    return None
+
+
+def find_archived_order(session, directory, order_id, expand=False):
+    """Return the archived order order_id serialized like GET api/v1/orders/<order_id>, or None when it was not
+    archived. expand inlines the current description and price of every ordered item
+    """
+
+    record = read_archived_record(directory, session.execute(segment_paths_query(order_id)).scalars().all(),
+                                  order_id)
+
+    if record is None:
+        return None
+
+    items = None
+
+    if expand:
+        item_ids = [order_item['item_id'] for order_item in record['items']]
+        items = {item.id: item for item in session.query(Item).filter(Item.id.in_(item_ids))}
+
+    return serialize_archived_order(record, items)
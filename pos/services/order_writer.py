@@ -0,0 +1,200 @@
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from flask import current_app, g
+from sqlalchemy.exc import IntegrityError
+
+from pos import db
+from pos.exceptions.custom_exceptions import ServiceUnavailableError
+from pos.services.inventory import get_inventory_ledger
+from pos.services.item_cache import get_item_cache
+from pos.services.orders import find_order_id, place_order
+from pos.services.stock_events import record_item_changes
+from pos.services.transactions import begin_write_transaction
+from pos.stores import current_store_id, store_scoped
+
+logger = logging.getLogger(__name__)
+
+_PendingOrder = namedtuple('_PendingOrder', 'order_items payment_amount order_note idempotency_key future')
+
+# Queued by close() to stop the writer thread
+_STOP = object()
+
+
+class GroupCommitOrderWriter:
+    """Places the orders of POST api/v1/orders on one writer thread that commits many orders per transaction.
+
+    Request threads validate the input and queue the order. The writer takes every queued order, up to batch_size,
+    waiting at most max_wait seconds for more when fewer are queued. Each order is placed in its own savepoint, so an
+    order that is short on stock or underpaid is rejected alone, and the accepted ones are committed together. The
+    request then gets its order id, or the error of its order, exactly as with a commit per request. When queue_size
+    orders are already waiting new orders are rejected with ServiceUnavailableError instead of queueing up
+    """
+
+    def __init__(self, app, batch_size, max_wait, queue_size, store_id=None):
+        self.app = app
+        self.store_id = store_id
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._orders = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batch_count = 0
+        self.order_count = 0
+
+    def place_order(self, order_items, payment_amount, order_note, idempotency_key=None, timeout=None):
+        """Queue an order and wait until it is committed. Returns the order id, or raises the error of the order"""
+
+        future = Future()
+
+        try:
+            self._orders.put_nowait(_PendingOrder(order_items, payment_amount, order_note, idempotency_key, future))
+        except queue.Full:
+            raise ServiceUnavailableError("Too many orders are waiting to be placed. Please retry")
+
+        self._start()
+
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise ServiceUnavailableError("The order was not confirmed in time. Retry with the same Idempotency-Key "
+                                          "to find out whether it was placed")
+
+    def close(self):
+        """Stop the writer thread after the orders already queued are placed"""
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            self._orders.put(_STOP)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='order-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            g.store_id = self.store_id
+
+            while True:
+                batch = self._next_batch()
+
+                if batch is None:
+                    return
+
+                try:
+                    self._write(batch)
+                except Exception as ex:
+                    logger.exception("Failed to commit a batch of %d orders", len(batch))
+                    db.session.rollback()
+
+                    for pending_order in batch:
+                        if not pending_order.future.done():
+                            pending_order.future.set_exception(ex)
+                finally:
+                    db.session.remove()
+
+    def _next_batch(self):
+        """Return the next orders to commit together, or None once close() was called and no orders are left"""
+
+        pending_order = self._orders.get()
+
+        if pending_order is _STOP:
+            return None
+
+        batch = [pending_order]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.batch_size:
+            try:
+                # Orders already queued are taken without waiting, more are waited for until the deadline
+                pending_order = self._orders.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+
+            if pending_order is _STOP:
+                # Stop after this batch
+                self._orders.put(_STOP)
+                break
+
+            batch.append(pending_order)
+
+        return batch
+
+    def _write(self, batch):
+        session = db.session
+        inventory = get_inventory_ledger()
+        begin_write_transaction(session)
+
+        results = []
+
+        for pending_order in batch:
+            try:
+                results.append((self._place(session, pending_order, inventory), None))
+            except Exception as ex:
+                results.append((None, ex))
+
+        sold_item_ids = {
+            order_item['item_id']
+            for pending_order, (order_id, _) in zip(batch, results) if order_id is not None
+            for order_item in pending_order.order_items
+        }
+
+        # One stock event per sold item for the whole batch instead of one per order line
+        if sold_item_ids:
+            record_item_changes(session, 'sold', list(sold_item_ids))
+
+        session.commit()
+
+        self.batch_count += 1
+        self.order_count += len(batch)
+
+        for pending_order, (order_id, error) in zip(batch, results):
+            if error is None:
+                pending_order.future.set_result(order_id)
+            else:
+                pending_order.future.set_exception(error)
+
+        # The orders are committed, a cache failure must not turn them into errors
+        try:
+            get_item_cache().invalidate(sold_item_ids)
+        except Exception:
+            logger.exception("Failed to invalidate the item cache after a batch of %d orders", len(batch))
+
+    @staticmethod
+    def _place(session, pending_order, inventory):
+        """Place one order of the batch in a savepoint, so its failure only rolls back its own writes"""
+
+        try:
+            with session.begin_nested():
+                return place_order(session, pending_order.order_items, pending_order.payment_amount,
+                                   pending_order.order_note, pending_order.idempotency_key, record_changes=False,
+                                   inventory=inventory)
+        except IntegrityError:
+            # Lost the race against another worker placing an order with the same idempotency key
+            order_id = find_order_id(session, pending_order.idempotency_key)
+
+            if pending_order.idempotency_key is None or order_id is None:
+                raise
+
+            return order_id
+
+
+def get_order_writer():
+    """Return the group commit order writer of the current app and store, creating it on first use"""
+
+    return store_scoped('order_writer', lambda: GroupCommitOrderWriter(
+        current_app._get_current_object(),
+        current_app.config['ORDER_GROUP_COMMIT_BATCH_SIZE'],
+        current_app.config['ORDER_GROUP_COMMIT_MAX_WAIT'],
+        current_app.config['ORDER_GROUP_COMMIT_QUEUE_SIZE'],
+        current_store_id(),
+    ))
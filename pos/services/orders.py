@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from pos.models.archived_order_key import ArchivedOrderKey
+from pos.models.order import Order
+from pos.models.order_item import OrderItem
+from pos.services.inventory import load_order_items
+from pos.services.sales import record_sales
+from pos.services.stock import reserve_stock
+from pos.services.stock_events import record_item_changes
+from pos.validators.payment_validator import merge_order_items, payment_validator
+
+
+def create_order(session, order_quantities, items, payment_amount, order_note, idempotency_key=None,
+                 record_changes=True):
+    """Reserve stock for every order line and add the order with its order items to the session.
+    items maps every ordered item_id to its Item, whose price is recorded as the unit price and counted in the
+    sales aggregates. The stock changes are appended to the stock event log, unless record_changes is False and the
+    caller records them once for many orders. The order is flushed so its id is available. The caller commits, or
+    rolls back on any error
+    """
+
+    # Reserve stock with a guarded update so concurrent checkouts cannot oversell
+    reserve_stock(session, order_quantities)
+
+    new_order = Order(payment_amount, order_note, idempotency_key)
+    new_order.created_at = datetime.utcnow()
+    session.add(new_order)
+
+    order_lines = []
+
+    for item_id, order_quantity in order_quantities.items():
+        unit_price_cents = items[item_id].price_cents
+        order_item = OrderItem(item_id=item_id, ordered_quantity=order_quantity, unit_price_cents=unit_price_cents)
+
+        # Update association table
+        new_order.items.append(order_item)
+        order_lines.append((item_id, order_quantity, unit_price_cents))
+
+    session.flush()
+
+    # Same transaction as the order, so reports never count an order that was rolled back
+    record_sales(session, new_order.created_at, order_lines)
+
+    if record_changes:
+        # Terminals following the stock feed see the new quantities once the order commits
+        record_item_changes(session, 'sold', list(order_quantities))
+
+    return new_order
+
+
+def find_order_id(session, idempotency_key):
+    """Return the id of the order placed with idempotency_key, also when it was archived, or None"""
+
+    order_id = session.query(Order.id).filter(Order.idempotency_key == idempotency_key).scalar()
+
+    if order_id is None:
+        order_id = session.query(ArchivedOrderKey.order_id).filter(
+            ArchivedOrderKey.idempotency_key == idempotency_key
+        ).scalar()
+
+    return order_id
+
+
+def place_order(session, order_items, payment_amount, order_note, idempotency_key=None, record_changes=True,
+                inventory=None):
+    """Validate and place a single order from its validated order lines. Returns the order id.
+    When the idempotency key was already used the existing order id is returned and nothing is written. The basket
+    is checked against inventory, an InventoryLedger, when one is passed. Shared by the WSGI and ASGI routes and the
+    group commit order writer. The caller commits, or rolls back on any error
+    """
+
+    if idempotency_key is not None:
+        # The order may already have been placed by another worker, or before the response cache expired
+        order_id = find_order_id(session, idempotency_key)
+
+        if order_id is not None:
+            return order_id
+
+    # Duplicate item_ids in the request are merged into a single order line
+    order_quantities = merge_order_items(order_items)
+
+    # Validate item availability and payment correctness
+    items = load_order_items(session, order_quantities, inventory)
+    payment_validator(order_quantities, payment_amount, items)
+
+    # Reserve stock and create order
+    return create_order(session, order_quantities, items, payment_amount, order_note, idempotency_key,
+                        record_changes).id
@@ -0,0 +1,98 @@
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from pos.models.item import Item
+from pos.models.item_sales import ItemSales, SALES_PERIODS
+from pos.models.order import Order
+from pos.models.order_item import OrderItem
+
+_sales_table = ItemSales.__table__
+
+# Adds the units and revenue of one order line to its hourly or daily row, creating the row for the first sale.
+# Executed once per order with one parameter set per order line and period
+_insert_sales = sqlite_insert(_sales_table)
+_record_statement = _insert_sales.on_conflict_do_update(
+    index_elements=[_sales_table.c.period, _sales_table.c.period_start, _sales_table.c.item_id],
+    set_={
+        'units_sold': _sales_table.c.units_sold + _insert_sales.excluded.units_sold,
+        'revenue_cents': _sales_table.c.revenue_cents + _insert_sales.excluded.revenue_cents,
+    },
+)
+
+# SQLite strftime formats that truncate Order.created_at like period_start() does. The output matches how
+# SQLAlchemy stores DateTime values, so rows written by record_sales and rebuild_sales compare equal
+_period_formats = {
+    'hour': '%Y-%m-%d %H:00:00.000000',
+    'day': '%Y-%m-%d 00:00:00.000000',
+}
+
+
+def period_start(timestamp, period):
+    """Truncate a timestamp to the start of its hour or day"""
+
+    if period == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record_sales(session, created_at, order_lines):
+    """Add the order lines of a new order to the hourly and daily sales aggregates.
+    order_lines are (item_id, ordered_quantity, unit_price_cents) tuples. Runs in the caller's transaction, so
+    the aggregates are rolled back together with the order
+    """
+
+    parameters = [
+        {
+            'period': period,
+            'period_start': period_start(created_at, period),
+            'item_id': item_id,
+            'units_sold': ordered_quantity,
+            'revenue_cents': ordered_quantity * unit_price_cents,
+        }
+        for period in SALES_PERIODS
+        for item_id, ordered_quantity, unit_price_cents in order_lines
+    ]
+
+    session.execute(_record_statement, parameters)
+
+
+def rebuild_sales(session, since=None):
+    """Recompute all sales aggregates from the order history with one INSERT ... SELECT per period.
+    Order items without a recorded unit price are valued at the item's current price. since, the start of a day,
+    limits the rebuild to the periods from then on and keeps the older aggregates, e.g. of archived orders. Returns
+    the number of aggregate rows
+    """
+
+    if since is None:
+        session.execute(_sales_table.delete())
+    else:
+        session.execute(_sales_table.delete().where(_sales_table.c.period_start >= since))
+
+    unit_price_cents = func.coalesce(OrderItem.unit_price_cents, Item.price_cents, 0)
+
+    for period in SALES_PERIODS:
+        bucket = func.strftime(_period_formats[period], Order.created_at)
+
+        aggregates = (
+            select(
+                literal(period),
+                bucket,
+                OrderItem.item_id,
+                func.sum(OrderItem.ordered_quantity),
+                func.sum(OrderItem.ordered_quantity * unit_price_cents),
+            )
+            .select_from(OrderItem)
+            .join(Order, Order.id == OrderItem.order_id)
+            .outerjoin(Item, Item.id == OrderItem.item_id)
+            .group_by(bucket, OrderItem.item_id)
+        )
+
+        if since is not None:
+            aggregates = aggregates.where(Order.created_at >= since)
+
+        session.execute(insert(_sales_table).from_select(
+            ['period', 'period_start', 'item_id', 'units_sold', 'revenue_cents'], aggregates
+        ))
+
+    return session.query(func.count()).select_from(_sales_table).scalar()
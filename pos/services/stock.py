@@ -0,0 +1,41 @@
+from sqlalchemy import bindparam, update
+
+from pos.exceptions.custom_exceptions import QuantityError
+from pos.models.item import Item
+
+# Guarded decrement. A row is only updated when enough stock is left, so two concurrent checkouts for the
+# last units cannot both succeed. Executed once per order with one parameter set per order line
+_reserve_statement = (
+    update(Item.__table__)
+    .where(Item.__table__.c.id == bindparam('reserve_item_id'))
+    .where(Item.__table__.c.quantity >= bindparam('reserve_quantity'))
+    .values(quantity=Item.__table__.c.quantity - bindparam('reserve_quantity'))
+)
+
+
+def reserve_stock(session, order_quantities):
+    """Decrement stock for every ordered item in a single guarded UPDATE.
+    Raises QuantityError when any line could not be reserved. The caller is expected to roll back the
+    transaction in that case so lines that were already decremented are restored
+    """
+
+    parameters = [
+        {'reserve_item_id': item_id, 'reserve_quantity': order_quantity}
+        for item_id, order_quantity in order_quantities.items()
+    ]
+
+    result = session.execute(_reserve_statement, parameters)
+
+    if result.rowcount == len(parameters):
+        return
+
+    # At least one line lost the race. Report the first line that is short on stock now
+    current_quantities = dict(
+        session.query(Item.id, Item.quantity).filter(Item.id.in_(order_quantities)).all()
+    )
+
+    for item_id, order_quantity in order_quantities.items():
+        if current_quantities.get(item_id, 0) < order_quantity:
+            raise QuantityError(f"Quantity: {order_quantity} not available for item: {item_id}")
+
+    raise QuantityError("Ordered quantity is no longer available")
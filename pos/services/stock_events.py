@@ -0,0 +1,244 @@
+import logging
+import queue
+import threading
+import weakref
+from datetime import datetime
+
+from flask import current_app, g, json
+from sqlalchemy import event, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from pos import db
+from pos.database import get_store_engine
+from pos.models.item import Item
+from pos.models.stock_event import StockEvent
+from pos.stores import current_store_id, store_scoped
+
+logger = logging.getLogger(__name__)
+
+_event_table = StockEvent.__table__
+_event_columns = ['item_id', 'change', 'description', 'price_cents', 'quantity', 'created_at']
+
+# Session.info key set by the writers, so only transactions that changed items wake up the brokers
+_PENDING_KEY = 'stock_events_pending'
+
+# Brokers of every app in this process, woken up after a transaction with item changes commits
+_brokers = weakref.WeakSet()
+
+# Marker queued for a subscriber whose queue overflowed
+OVERFLOWED = object()
+
+
+def record_item_changes(session, change, item_ids):
+    """Append the current state of the items in item_ids to the stock event log with one INSERT ... SELECT, then
+    set each item's version to the seq of its new event. item_ids is a list of ids or a SELECT of ids. Runs in
+    the caller's transaction after its item writes are flushed, so the log holds exactly the committed changes
+    """
+
+    session.flush()
+
+    now = datetime.utcnow()
+    changed_items = select(
+        Item.id, literal(change), Item.description, Item.price_cents, Item.quantity, literal(now)
+    ).where(Item.id.in_(item_ids))
+
+    session.execute(insert(_event_table).from_select(_event_columns, changed_items))
+
+    # Served from the item_id index without scanning the item's older events
+    item_seq = select(func.max(StockEvent.seq)).where(StockEvent.item_id == Item.id).scalar_subquery()
+    session.execute(
+        update(Item.__table__).where(Item.id.in_(item_ids)).values(version=item_seq, updated_at=now),
+        execution_options={'synchronize_session': False},
+    )
+
+    session.info[_PENDING_KEY] = True
+
+
+def record_item_removed(session, item_id):
+    """Append the removal of item_id to the stock event log in the caller's transaction"""
+
+    session.execute(insert(_event_table).values(item_id=item_id, change='deleted', created_at=datetime.utcnow()))
+    session.info[_PENDING_KEY] = True
+
+
+def latest_seq(connection):
+    """Return the seq of the newest stock event, 0 when the log is empty. connection is a session or connection"""
+    return connection.execute(select(func.max(StockEvent.seq))).scalar() or 0
+
+
+def catalogue_version(session):
+    """Return the seq and time of the newest stock event, the ETag and Last-Modified of the item catalogue.
+    Every item write appends a stock event, so the catalogue changed when the seq changed. (0, None) when the log
+    is empty
+    """
+
+    newest_event = session.query(StockEvent.seq, StockEvent.created_at).order_by(StockEvent.seq.desc()).first()
+
+    return tuple(newest_event) if newest_event else (0, None)
+
+
+def get_stock_events(session, since_seq, limit):
+    """Return up to limit stock events with a seq greater than since_seq, oldest first"""
+
+    return (
+        session.query(StockEvent)
+        .filter(StockEvent.seq > since_seq)
+        .order_by(StockEvent.seq)
+        .limit(limit)
+        .all()
+    )
+
+
+def encode_stock_event(stock_event):
+    """Return (seq, compact JSON of the serialized event). Encoded once per event and shared by all subscribers"""
+    return stock_event.seq, json.dumps(stock_event.serialize, separators=(',', ':'))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        for broker in list(_brokers):
+            broker.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+class StockSubscriber:
+    """Bounded queue of encoded stock events for one feed client.
+
+    A subscriber that falls more than max_size events behind is not waited for. Its queue stops accepting events
+    and get() returns OVERFLOWED, so the client reconnects and catches up from the log instead
+    """
+
+    def __init__(self, max_size):
+        self._events = queue.Queue(max_size)
+        self.overflowed = False
+
+    def offer(self, encoded_event):
+        if self.overflowed:
+            return
+
+        try:
+            self._events.put_nowait(encoded_event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Return the next encoded event, OVERFLOWED, or None when nothing arrived within timeout seconds"""
+
+        if self.overflowed:
+            return OVERFLOWED
+
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return OVERFLOWED if self.overflowed else None
+
+
+class StockEventBroker:
+    """Fans new stock events out to the feed subscribers of this process.
+
+    One broker thread reads each new event from the log once and offers it to every subscriber, so the database
+    load does not grow with the number of connected terminals. The thread is woken up right after a local
+    transaction with item changes commits, and polls every poll_interval seconds for changes committed by other
+    worker processes. It only runs while there are subscribers
+    """
+
+    # Events read from the log per query
+    batch_size = 1000
+
+    def __init__(self, app, queue_size, poll_interval, store_id=None):
+        self.app = app
+        self.store_id = store_id
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_seq = 0
+        _brokers.add(self)
+
+    def notify(self):
+        """Wake up the broker thread to publish newly committed events"""
+        self._wakeup.set()
+
+    def subscribe(self):
+        """Return a new subscriber that receives every event committed from now on"""
+
+        subscriber = StockSubscriber(self.queue_size)
+
+        with self._lock:
+            self._subscribers.add(subscriber)
+
+            if self._thread is None:
+                # Events already in the log are replayed from the database by the feed routes. Read on a
+                # short-lived connection, so a long-running stream does not keep a read transaction open
+                with get_store_engine(self.store_id).connect() as connection:
+                    self._last_seq = latest_seq(connection)
+                self._thread = threading.Thread(target=self._run, name='stock-event-broker', daemon=True)
+                self._thread.start()
+
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _run(self):
+        with self.app.app_context():
+            g.store_id = self.store_id
+
+            while True:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+
+                try:
+                    self._publish_new_events()
+                except Exception:
+                    logger.exception("Failed to publish stock events")
+                finally:
+                    db.session.remove()
+
+    def _publish_new_events(self):
+        while True:
+            encoded_events = [encode_stock_event(stock_event)
+                              for stock_event in get_stock_events(db.session, self._last_seq, self.batch_size)]
+
+            if not encoded_events:
+                return
+
+            self._last_seq = encoded_events[-1][0]
+
+            with self._lock:
+                subscribers = list(self._subscribers)
+
+            for subscriber in subscribers:
+                for encoded_event in encoded_events:
+                    subscriber.offer(encoded_event)
+
+            if len(encoded_events) < self.batch_size:
+                return
+
+
+def get_stock_broker():
+    """Return the stock event broker of the current app and store, creating it on first use"""
+
+    return store_scoped('stock_events', lambda: StockEventBroker(
+        current_app._get_current_object(),
+        current_app.config['STOCK_FEED_QUEUE_SIZE'],
+        current_app.config['STOCK_FEED_POLL_INTERVAL'],
+        current_store_id(),
+    ))
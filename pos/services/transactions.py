@@ -0,0 +1,13 @@
+def begin_write_transaction(session):
+    """Start the session's transaction as a write transaction.
+
+    pysqlite only issues BEGIN right before the first INSERT/UPDATE/DELETE, so a SAVEPOINT emitted before any
+    write would become the outermost transaction and its RELEASE would commit. On SQLite this takes the write
+    lock up front with BEGIN IMMEDIATE, which gives savepoints a real outer transaction to nest in and avoids
+    a failed read-to-write lock upgrade halfway through a batch. Other backends need nothing here
+    """
+
+    connection = session.connection()
+
+    if connection.dialect.name == 'sqlite' and not connection.connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
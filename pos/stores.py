@@ -0,0 +1,94 @@
+"""Store sharding.
+
+With STORES configured every store keeps its items, orders, sales aggregates and stock events in its own database.
+Requests select their store with the X-Store-Id header, and db.session and get_read_session() route every statement
+of the request to that store's database, so a busy store never holds a write lock another store waits for. Store
+databases are created with all tables on first use, so a store is added by adding its URI to STORES.
+
+Caches and registries whose keys are only unique within one database, like item ids, are kept per store with
+store_scoped(). Reports over all stores read every store in parallel with run_per_store()
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, current_app, g, has_app_context, request
+
+STORE_HEADER = 'X-Store-Id'
+
+_executor_lock = threading.Lock()
+
+
+def current_store_id():
+    """Return the store selected for the current app context, or None for the default database"""
+    return g.get('store_id') if has_app_context() else None
+
+
+def store_scoped(name, factory):
+    """Return the current store's instance of an app extension, creating it with factory() on first use.
+    Without store sharding there is a single instance
+    """
+
+    instances = current_app.extensions.setdefault(name, {})
+    store_id = current_store_id()
+    instance = instances.get(store_id)
+
+    if instance is None:
+        instance = instances.setdefault(store_id, factory())
+
+    return instance
+
+
+def require_store():
+    """before_request hook of the blueprints whose data is kept per store"""
+
+    if current_app.config['STORES'] and current_store_id() is None:
+        abort(400, f"The {STORE_HEADER} header is required")
+
+
+def run_per_store(task):
+    """Run task() on the request's store, or on every store in parallel when stores are configured and the request
+    did not select one. task runs with its store selected in its own app context. Returns a list of
+    (store_id, result) pairs. store_id is None when a single database was read
+    """
+
+    app = current_app._get_current_object()
+
+    if not app.config['STORES'] or current_store_id() is not None:
+        return [(None, task())]
+
+    def run(store_id):
+        with app.app_context():
+            g.store_id = store_id
+            return task()
+
+    store_ids = list(app.config['STORES'])
+
+    return list(zip(store_ids, _fan_out_executor(app).map(run, store_ids)))
+
+
+def _fan_out_executor(app):
+    executor = app.extensions.get('store_fan_out')
+
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get('store_fan_out')
+
+            if executor is None:
+                executor = app.extensions['store_fan_out'] = ThreadPoolExecutor(
+                    app.config['STORE_FAN_OUT_WORKERS'], thread_name_prefix='store-fan-out'
+                )
+
+    return executor
+
+
+def init_stores(app):
+    """Select the store named by the X-Store-Id header for every request"""
+
+    @app.before_request
+    def select_store():
+        store_id = request.headers.get(STORE_HEADER) if app.config['STORES'] else None
+
+        if store_id and store_id not in app.config['STORES']:
+            abort(404, f"Store {store_id} not found")
+
+        g.store_id = store_id or None
@@ -0,0 +1,24 @@
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+
+
+def validator_headers(etag, last_modified=None):
+    """ETag and Last-Modified response headers. last_modified is a datetime or an HTTP date string"""
+
+    headers = {'ETag': quote_etag(etag)}
+
+    if last_modified is not None:
+        headers['Last-Modified'] = last_modified if isinstance(last_modified, str) else http_date(last_modified)
+
+    return headers
+
+
+def is_not_modified(environ, etag, last_modified=None):
+    """Whether the If-None-Match or If-Modified-Since header in the WSGI environ matches the current validators.
+    If-None-Match takes precedence, as required by RFC 7232
+    """
+
+    return not is_resource_modified(environ, etag=etag, last_modified=last_modified)
+
+
+def has_conditional_headers(environ):
+    return 'HTTP_IF_NONE_MATCH' in environ or 'HTTP_IF_MODIFIED_SINCE' in environ
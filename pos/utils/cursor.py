@@ -0,0 +1,24 @@
+import base64
+import binascii
+
+
+def encode_cursor(last_id):
+    """Encode the id of the last returned row as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor back to the id of the last returned row.
+    Raises ValueError when the cursor was not produced by encode_cursor
+    """
+
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        last_id = int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if last_id < 0:
+        raise ValueError("Invalid cursor")
+
+    return last_id
@@ -0,0 +1,26 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Money is stored and summed as integer cents. Floats only exist at the JSON boundary
+CENTS_PER_UNIT = 100
+
+_ONE = Decimal(1)
+
+
+def to_cents(amount):
+    """Convert an amount in currency units (int, float, Decimal or numeric str) to integer cents.
+    Amounts are rounded half up to the nearest cent. Floats are converted through their shortest repr, so a
+    client side sum like 0.1 + 0.2 becomes 30 cents
+    """
+
+    if type(amount) is int:
+        return amount * CENTS_PER_UNIT
+
+    if not isinstance(amount, Decimal):
+        amount = Decimal(repr(amount) if isinstance(amount, float) else amount)
+
+    return int(amount.scaleb(2).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Convert integer cents to a float amount for JSON output. 1005 cents becomes 10.05 exactly as printed"""
+    return cents / CENTS_PER_UNIT
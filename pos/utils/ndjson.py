@@ -0,0 +1,34 @@
+from flask import Response, json, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def ndjson_response(rows, serialize):
+    """Stream rows as newline-delimited JSON, one serialized row per line.
+    Rows are consumed lazily so a server-side cursor is never materialized in memory
+    """
+
+    def generate():
+        for row in rows:
+            yield json.dumps(serialize(row), separators=(',', ':')) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def parse_ndjson(data):
+    """Parse a newline-delimited JSON body. Blank lines are skipped.
+    Returns a list with the decoded value of each line, or the ValueError raised while decoding it. Lines are
+    decoded from UTF-8 one by one, so a line that is not UTF-8 only fails itself with a UnicodeDecodeError
+    """
+
+    rows = []
+
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line.decode()))
+        except ValueError as ex:
+            rows.append(ex)
+
+    return rows
@@ -0,0 +1,30 @@
+from flask import Response, stream_with_context
+
+SSE_MIMETYPE = 'text/event-stream'
+
+# Comment line sent on idle streams so clients and proxies do not time out the connection
+SSE_KEEP_ALIVE = ': keep-alive\n\n'
+
+
+def sse_message(data, event=None, event_id=None):
+    """Format one Server-Sent Events message. data must not contain newlines, e.g. compact JSON"""
+
+    lines = []
+
+    if event_id is not None:
+        lines.append(f"id: {event_id}\n")
+    if event is not None:
+        lines.append(f"event: {event}\n")
+
+    lines.append(f"data: {data}\n\n")
+
+    return ''.join(lines)
+
+
+def sse_response(messages):
+    """Stream formatted Server-Sent Events messages as they are yielded.
+    Caching and proxy buffering are disabled so every message reaches the client immediately
+    """
+
+    return Response(stream_with_context(messages), mimetype=SSE_MIMETYPE,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,14 @@
+import sys
+
+
+def prefix_upper_bound(prefix):
+    """Return the smallest string greater than every string that starts with prefix, or None when there is none.
+    Trailing U+10FFFF characters cannot be incremented, so they are dropped before the last character is incremented
+    """
+
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+
+    if not prefix:
+        return None
+
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
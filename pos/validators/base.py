@@ -0,0 +1,283 @@
+import math
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from pos.exceptions.custom_exceptions import ValidationError
+from pos.utils.money import to_cents, from_cents
+
+# Marks a field that is absent from the input, as opposed to present and null
+MISSING = object()
+
+# Largest integer SQLite stores. Larger ids, quantities and cent amounts are rejected before they reach a query
+MAX_INTEGER = 2 ** 63 - 1
+_MAX_MONEY = Decimal(MAX_INTEGER).scaleb(-2)
+
+
+class FieldError(Exception):
+    """Raised by field checks. Holds (loc, msg, type) tuples, loc being relative to the checked value"""
+
+    def __init__(self, msg=None, error_type=None, errors=None):
+        super().__init__(msg)
+        self.errors = errors if errors is not None else [((), msg, error_type)]
+
+
+class Field:
+    """A field check plus its default. Fields without a default are required"""
+
+    __slots__ = ('check', 'default')
+
+    def __init__(self, check, default=MISSING):
+        self.check = check
+        self.default = default
+
+    def validate(self, value):
+        if value is not None and value is not MISSING:
+            return self.check(value)
+
+        if self.default is not MISSING:
+            return self.default
+        if value is MISSING:
+            raise FieldError("field required", "value_error.missing")
+        raise FieldError("none is not an allowed value", "type_error.none.not_allowed")
+
+
+def _check_bounds(value, gt, ge, le):
+    if gt is not None and not value > gt:
+        raise FieldError(f"ensure this value is greater than {gt}", "value_error.number.not_gt")
+    if ge is not None and not value >= ge:
+        raise FieldError(f"ensure this value is greater than or equal to {ge}", "value_error.number.not_ge")
+    if le is not None and not value <= le:
+        raise FieldError(f"ensure this value is less than or equal to {le}", "value_error.number.not_le")
+    return value
+
+
+def string(min_length=None, max_length=None, default=MISSING):
+    def check(value):
+        if not isinstance(value, str):
+            raise FieldError("str type expected", "type_error.str")
+        if min_length is not None and len(value) < min_length:
+            raise FieldError(f"ensure this value has at least {min_length} characters",
+                             "value_error.any_str.min_length")
+        if max_length is not None and len(value) > max_length:
+            raise FieldError(f"ensure this value has at most {max_length} characters",
+                             "value_error.any_str.max_length")
+        return value
+
+    return Field(check, default)
+
+
+def number(gt=None, ge=None, le=None, from_string=False, default=MISSING):
+    """Int or float field. from_string also accepts numeric strings, for query parameters"""
+
+    def check(value):
+        if type(value) is float or type(value) is int:
+            pass
+        elif from_string and isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                raise FieldError("value is not a valid float", "type_error.float")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise FieldError("value is not a valid float", "type_error.float")
+
+        if not math.isfinite(value):
+            raise FieldError("value is not a finite number", "value_error.number.not_finite")
+
+        return _check_bounds(value, gt, ge, le)
+
+    return Field(check, default)
+
+
+def integer(gt=None, ge=None, le=None, from_string=False, default=MISSING):
+    """Int field. Floats without a fractional part are accepted. from_string also accepts digit strings.
+    Values are at most MAX_INTEGER
+    """
+
+    le = MAX_INTEGER if le is None else min(le, MAX_INTEGER)
+
+    def check(value):
+        if type(value) is int:
+            pass
+        elif from_string and isinstance(value, str):
+            try:
+                value = int(value)
+            except ValueError:
+                raise FieldError("value is not a valid integer", "type_error.integer")
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif isinstance(value, bool) or not isinstance(value, int):
+            raise FieldError("value is not a valid integer", "type_error.integer")
+
+        return _check_bounds(value, gt, ge, le)
+
+    return Field(check, default)
+
+
+def money(gt=None, ge=None, default=MISSING):
+    """Amount in currency units, rounded half up to whole cents. Returns a Decimal with two decimal places.
+    Bounds are checked after rounding, so money(gt=0) rejects amounts below half a cent. Amounts are within
+    MAX_INTEGER cents
+    """
+
+    number_check = number().check
+
+    def check(value):
+        # Checked before rounding, which cannot represent much larger amounts
+        cents = to_cents(_check_bounds(number_check(value), None, -_MAX_MONEY, _MAX_MONEY))
+        _check_bounds(from_cents(cents), gt, ge, None)
+        return Decimal(cents).scaleb(-2)
+
+    return Field(check, default)
+
+
+_TRUE_STRINGS = frozenset(('true', '1', 'yes', 'on'))
+_FALSE_STRINGS = frozenset(('false', '0', 'no', 'off'))
+
+
+def boolean(default=MISSING):
+    """Bool field. Also accepts the usual true/false strings, for query parameters"""
+
+    def check(value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            if value.lower() in _TRUE_STRINGS:
+                return True
+            if value.lower() in _FALSE_STRINGS:
+                return False
+        raise FieldError("value could not be parsed to a boolean", "type_error.bool")
+
+    return Field(check, default)
+
+
+def choice(*choices, default=MISSING):
+    """Field that must be one of the given strings"""
+
+    def check(value):
+        if value not in choices:
+            raise FieldError(f"value is not a valid choice, permitted: {', '.join(map(repr, choices))}",
+                             "type_error.enum")
+        return value
+
+    return Field(check, default)
+
+
+def timestamp(default=MISSING):
+    """ISO 8601 date or datetime string, e.g. 2021-08-30 or 2021-08-30T14:00:00. Returns a naive UTC datetime"""
+
+    def check(value):
+        if not isinstance(value, str):
+            raise FieldError("invalid datetime format", "value_error.datetime")
+
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise FieldError("invalid datetime format", "value_error.datetime")
+
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return parsed
+
+    return Field(check, default)
+
+
+def obj(fields):
+    """JSON object field whose keys are checked by fields. Other keys are dropped"""
+
+    field_items = tuple(fields.items())
+
+    def check(value):
+        if not isinstance(value, dict):
+            raise FieldError("value is not a valid dict", "type_error.dict")
+
+        validated, errors = _validate_fields(field_items, value, {})
+
+        if errors:
+            raise FieldError(errors=errors)
+
+        return validated
+
+    return Field(check)
+
+
+def list_of(item, min_items=None, max_items=None, default=MISSING):
+    """JSON array field whose elements are checked by the item field"""
+
+    def check(value):
+        if not isinstance(value, list):
+            raise FieldError("value is not a valid list", "type_error.list")
+        if min_items is not None and len(value) < min_items:
+            raise FieldError(f"ensure this value has at least {min_items} items", "value_error.list.min_items")
+        if max_items is not None and len(value) > max_items:
+            raise FieldError(f"ensure this value has at most {max_items} items", "value_error.list.max_items")
+
+        validated, errors = [], []
+
+        for index, element in enumerate(value):
+            try:
+                validated.append(item.validate(element))
+            except FieldError as ex:
+                errors.extend(((index,) + loc, msg, error_type) for loc, msg, error_type in ex.errors)
+
+        if errors:
+            raise FieldError(errors=errors)
+
+        return validated
+
+    return Field(check, default)
+
+
+def _validate_fields(field_items, data, overrides):
+    validated, errors = {}, []
+
+    for name, field in field_items:
+        value = overrides[name] if overrides and name in overrides else data.get(name, MISSING)
+
+        try:
+            validated[name] = field.validate(value)
+        except FieldError as ex:
+            errors.extend(((name,) + loc, msg, error_type) for loc, msg, error_type in ex.errors)
+
+    return validated, errors
+
+
+class InputValidator:
+    """Base class of the request input validators.
+
+    Subclasses declare their fields in the fields dict. Validators are built from keyword arguments or, with
+    parse(), from a parsed JSON body or the query string. Validated values become attributes of the validator.
+    Every invalid field is reported at once in a single ValidationError
+    """
+
+    fields = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_items = tuple(cls.fields.items())
+
+    def __init__(self, **values):
+        self._validate(values, {})
+
+    @classmethod
+    def parse(cls, data, **overrides):
+        """Validate a JSON object or query string mapping. overrides take precedence over keys in data"""
+
+        if not hasattr(data, 'get'):
+            raise ValidationError(cls.__name__, [((), "value is not a valid dict", "type_error.dict")])
+
+        validator = cls.__new__(cls)
+        validator._validate(data, overrides)
+        return validator
+
+    def _validate(self, data, overrides):
+        validated, errors = _validate_fields(self._field_items, data, overrides)
+
+        if errors:
+            raise ValidationError(type(self).__name__, errors)
+
+        self.__dict__.update(validated)
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{type(self).__name__}({values})"
@@ -0,0 +1,16 @@
+from pos.validators.base import InputValidator, string, integer, money
+
+MAX_BULK_ROWS = 10000
+
+
+class BulkItemInputValidator(InputValidator):
+    """Data validation class for one row of a bulk item upsert.
+    Rows with an id update the existing item, rows without an id add a new item
+    """
+
+    fields = {
+        'description': string(min_length=1),
+        'price': money(gt=0),
+        'quantity': integer(gt=0),
+        'id': integer(gt=0, default=None),
+    }
@@ -0,0 +1,9 @@
+from pos.validators.base import InputValidator, integer
+
+
+class ExportInputValidator(InputValidator):
+    """Data validation class for export query parameters"""
+
+    fields = {
+        'since_id': integer(ge=0, from_string=True, default=0),
+    }
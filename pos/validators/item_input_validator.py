@@ -1,11 +1,11 @@
-from pydantic.dataclasses import dataclass
-from pydantic import conint, constr, confloat
+from pos.validators.base import InputValidator, string, integer, money
 
 
-@dataclass
-class ItemInputValidator:
-    """Pydantic data validation class for item input"""
+class ItemInputValidator(InputValidator):
+    """Data validation class for item input"""
 
-    description: constr(min_length=1)
-    price: confloat(gt=0)
-    quantity: conint(gt=0)
+    fields = {
+        'description': string(min_length=1),
+        'price': money(gt=0),
+        'quantity': integer(gt=0),
+    }
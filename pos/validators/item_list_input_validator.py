@@ -0,0 +1,49 @@
+from pos.utils.cursor import decode_cursor
+from pos.validators.base import InputValidator, Field, FieldError, string, number, integer, boolean
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Item columns that can be requested with the fields= query parameter
+ITEM_FIELDS = ('id', 'description', 'price', 'quantity')
+
+
+def cursor_field():
+    """Optional opaque cursor, decoded to the id of the last row on the previous page"""
+
+    def check(cursor):
+        try:
+            return decode_cursor(cursor)
+        except ValueError as ex:
+            raise FieldError(str(ex), "value_error")
+
+    return Field(check, default=None)
+
+
+def _item_fields(fields):
+    """Split fields into a tuple of known item columns"""
+
+    if not isinstance(fields, str):
+        raise FieldError("str type expected", "type_error.str")
+
+    requested_fields = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown_fields = [field for field in requested_fields if field not in ITEM_FIELDS]
+
+    if not requested_fields or unknown_fields:
+        raise FieldError(f"fields must be a comma separated list of {', '.join(ITEM_FIELDS)}", "value_error")
+
+    return requested_fields
+
+
+class ItemListInputValidator(InputValidator):
+    """Data validation class for item listing query parameters"""
+
+    fields = {
+        'limit': integer(gt=0, le=MAX_PAGE_SIZE, from_string=True, default=DEFAULT_PAGE_SIZE),
+        'cursor': cursor_field(),
+        'fields': Field(_item_fields, default=None),
+        'min_price': number(ge=0, from_string=True, default=None),
+        'max_price': number(ge=0, from_string=True, default=None),
+        'in_stock': boolean(default=False),
+        'description_prefix': string(min_length=1, default=None),
+    }
@@ -0,0 +1,14 @@
+from pos.validators.base import InputValidator, string, integer
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_LENGTH = 100
+
+
+class ItemSearchInputValidator(InputValidator):
+    """Data validation class for item search query parameters"""
+
+    fields = {
+        'q': string(min_length=1, max_length=MAX_QUERY_LENGTH),
+        'limit': integer(gt=0, le=MAX_SEARCH_LIMIT, from_string=True, default=DEFAULT_SEARCH_LIMIT),
+    }
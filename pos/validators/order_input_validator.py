@@ -1,11 +1,22 @@
-from pydantic.dataclasses import dataclass
-from pydantic import conlist, constr, confloat
+from pos.validators.base import InputValidator, string, integer, money, obj, list_of
 
+MAX_BATCH_ORDERS = 500
 
-@dataclass
-class OrderInputValidator:
-    """Pydantic data validation class for order input"""
+# Maximum number of order lines in one order
+MAX_BASKET_SIZE = 200
 
-    order_items: conlist(dict, min_items=1)
-    payment_amount: confloat(gt=0)
-    order_note: constr(min_length=1)
+
+class OrderInputValidator(InputValidator):
+    """Data validation class for order input. Every order line needs a positive integer item_id and
+    order_quantity
+    """
+
+    fields = {
+        'order_items': list_of(obj({
+            'item_id': integer(gt=0),
+            'order_quantity': integer(gt=0),
+        }), min_items=1, max_items=MAX_BASKET_SIZE),
+        'payment_amount': money(gt=0),
+        'order_note': string(min_length=1),
+        'idempotency_key': string(min_length=1, max_length=64, default=None),
+    }
@@ -0,0 +1,27 @@
+from pos.validators.base import InputValidator, Field, FieldError, integer
+from pos.validators.item_list_input_validator import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, cursor_field
+
+
+def _expand(expand):
+    """Only order items can be expanded"""
+    if expand != 'items':
+        raise FieldError("expand must be 'items'", "value_error")
+    return expand
+
+
+class OrderReadInputValidator(InputValidator):
+    """Data validation class for single order query parameters"""
+
+    fields = {
+        'expand': Field(_expand, default=None),
+    }
+
+
+class OrderListInputValidator(InputValidator):
+    """Data validation class for order listing query parameters"""
+
+    fields = {
+        'limit': integer(gt=0, le=MAX_PAGE_SIZE, from_string=True, default=DEFAULT_PAGE_SIZE),
+        'cursor': cursor_field(),
+        'expand': Field(_expand, default=None),
+    }
@@ -1,34 +1,69 @@
 from pos.models.item import Item
 from pos.exceptions.custom_exceptions import EmptyResourceError, QuantityError, PaymentError
+from pos.utils.money import to_cents
 
 
-def payment_validator(order_items, payment_amount):
+def merge_order_items(order_items):
+    """Merge order lines that reference the same item_id.
+    Returns a dict of item_id -> total order quantity, in the order the items were first requested
+    """
+
+    order_quantities = {}
+
+    for order_item in order_items:
+        item_id = order_item['item_id']
+        order_quantities[item_id] = order_quantities.get(item_id, 0) + order_item['order_quantity']
+
+    return order_quantities
+
+
+def load_items(item_ids, session=None):
+    """Load all items with the given ids in a single query. Returns a dict of item_id -> Item.
+    Uses db.session unless another session is passed in
+    """
+
+    query = Item.query if session is None else session.query(Item)
+    return {item.id: item for item in query.filter(Item.id.in_(item_ids)).all()}
+
+
+def payment_validator(order_quantities, payment_amount, items=None, available_quantities=None):
     """This method checks and validation below conditions
         1) Item availability
         2) Order quantity availability
         3) Payment correctness (payment high or low than expected amount)
+
+    All ordered items are loaded with a single query unless already loaded items are passed in. The items are
+    returned as a dict of item_id -> Item so the caller can reuse them without looking the items up again.
+    available_quantities optionally overrides item.quantity, so several orders can be checked against a shared
+    in-memory stock view. The payment is compared in integer cents, so it is exact and rounded to the nearest cent
     """
 
-    expected_payment_amount = 0
+    if items is None:
+        items = load_items(order_quantities)
 
-    for order_item in order_items:
-        item_id = order_item['item_id']
-        order_quantity = order_item['order_quantity']
+    expected_cents = 0
 
-        item = Item.query.get(item_id)
+    for item_id, order_quantity in order_quantities.items():
+        item = items.get(item_id)
 
         # Item does not exist
         if not item:
             raise EmptyResourceError(f"Items {item_id} not found")
 
+        available_quantity = item.quantity if available_quantities is None else available_quantities[item_id]
+
         # Quantity does not exist
-        if order_quantity > item.quantity:
+        if order_quantity > available_quantity:
             raise QuantityError(f"Quantity: {order_quantity} not available for item: {item_id}")
 
-        expected_payment_amount += (order_quantity * item.price)
+        expected_cents += order_quantity * item.price_cents
 
-    if expected_payment_amount > payment_amount:
+    payment_cents = to_cents(payment_amount)
+
+    if expected_cents > payment_cents:
         raise PaymentError("Payment amount is too low")
 
-    if expected_payment_amount < payment_amount:
+    if expected_cents < payment_cents:
         raise PaymentError("Payment amount is too high")
+
+    return items
@@ -0,0 +1,36 @@
+from pos.models.item_sales import SALES_PERIODS
+from pos.validators.base import InputValidator, integer, choice, timestamp
+
+MAX_REPORT_ROWS = 1000
+
+
+class TopSellersInputValidator(InputValidator):
+    """Data validation class for top sellers report query parameters"""
+
+    fields = {
+        'period': choice(*SALES_PERIODS, default='day'),
+        'start': timestamp(default=None),
+        'end': timestamp(default=None),
+        'rank_by': choice('units', 'revenue', default='units'),
+        'limit': integer(gt=0, le=MAX_REPORT_ROWS, from_string=True, default=10),
+    }
+
+
+class RevenueInputValidator(InputValidator):
+    """Data validation class for revenue report query parameters"""
+
+    fields = {
+        'period': choice(*SALES_PERIODS, default='day'),
+        'start': timestamp(default=None),
+        'end': timestamp(default=None),
+    }
+
+
+class LowStockInputValidator(InputValidator):
+    """Data validation class for low stock report query parameters"""
+
+    fields = {
+        'threshold': integer(ge=0, from_string=True, default=10),
+        'days': integer(gt=0, le=366, from_string=True, default=7),
+        'limit': integer(gt=0, le=MAX_REPORT_ROWS, from_string=True, default=100),
+    }
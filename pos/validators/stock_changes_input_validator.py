@@ -0,0 +1,24 @@
+from pos.validators.base import InputValidator, integer, number
+
+DEFAULT_CHANGES_LIMIT = 1000
+MAX_CHANGES_LIMIT = 10000
+# Longest a long-poll request waits for a new stock event
+MAX_WAIT_SECONDS = 30
+
+
+class StockChangesInputValidator(InputValidator):
+    """Data validation class for stock change feed query parameters"""
+
+    fields = {
+        'since': integer(ge=0, from_string=True, default=0),
+        'limit': integer(gt=0, le=MAX_CHANGES_LIMIT, from_string=True, default=DEFAULT_CHANGES_LIMIT),
+        'wait': number(ge=0, le=MAX_WAIT_SECONDS, from_string=True, default=0),
+    }
+
+
+class StockStreamInputValidator(InputValidator):
+    """Data validation class for stock event stream query parameters"""
+
+    fields = {
+        'since': integer(ge=0, from_string=True, default=None),
+    }
@@ -0,0 +1,72 @@
+"""Warm-up of a new app before it accepts traffic.
+
+The first requests of a fresh worker pay for opening database connections, compiling SQL and filling the caches.
+warm_up() sends the hot read requests once per store through the app itself, so those costs are paid at startup.
+The compiled SQL stays cached on the engines, the first catalogue page stays in the item fragment cache and the
+inventory ledger is loaded when INVENTORY_LEDGER is on. The connection pools are closed at the end, so an app warmed
+up before the workers fork shares no open connections
+"""
+import logging
+import time
+
+from flask import g
+
+from pos.services.inventory import get_inventory_ledger
+from pos.stores import STORE_HEADER
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up_store(client, headers, items):
+    """Send the warm-up requests of one store. Returns the number of requests sent"""
+
+    items_response = client.get(f"/api/v1/items?limit={items}", headers=headers)
+    orders_response = client.get("/api/v1/orders?limit=1", headers=headers)
+    paths = ["/api/v1/items/search?q=a", "/api/v1/reports/top-sellers"]
+
+    if items_response.status_code == 200 and items_response.json:
+        paths.append(f"/api/v1/items/{items_response.json[0]['id']}")
+    if orders_response.status_code == 200 and orders_response.json:
+        paths.append(f"/api/v1/orders/{orders_response.json[0]['id']}")
+
+    for path in paths:
+        client.get(path, headers=headers)
+
+    return 2 + len(paths)
+
+
+def warm_up(app):
+    """Send the hot read requests of every store to app, then close its connection pools"""
+
+    from pos import db
+
+    started_at = time.perf_counter()
+    client = app.test_client()
+    request_count = 0
+
+    for store_id in app.config['STORES'] or [None]:
+        headers = {STORE_HEADER: store_id} if store_id is not None else {}
+
+        try:
+            request_count += _warm_up_store(client, headers, app.config['WARM_UP_ITEMS'])
+
+            with app.app_context():
+                g.store_id = store_id
+                inventory = get_inventory_ledger()
+
+                if inventory is not None:
+                    inventory.load(db.session)
+        except Exception:
+            # A worker that could not warm up still serves requests, only its first ones are slower
+            logger.exception("Warm-up of store %s failed", store_id)
+
+    with app.app_context():
+        db.get_engine().dispose()
+
+    for uri, engine in app.extensions.get('store_engines', {}).values():
+        engine.dispose()
+
+    for write_url, read_session in app.extensions.get('read_session', {}).values():
+        read_session.get_bind().dispose()
+
+    logger.info("Warmed up with %d requests in %.1fms", request_count, (time.perf_counter() - started_at) * 1000)
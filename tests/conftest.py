@@ -0,0 +1,58 @@
+import pytest
+from pos import create_app, db
+import json
+
+
+@pytest.fixture
+def app_settings():
+    """Config values of the test app on top of TestingConfig. Test modules override this fixture"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_settings):
+    """A new app per test, on its own database and archive directory under tmp_path"""
+
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pos.db'}",
+        'ORDER_ARCHIVE_DIRECTORY': str(tmp_path / "archive"),
+        **app_settings,
+    }
+    app = create_app("testing", **settings)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+
+        for order_writer in app.extensions.get('order_writer', {}).values():
+            order_writer.close()
+
+        db.session.remove()
+        db.get_engine().dispose()
+
+        for uri, engine in app.extensions.get('store_engines', {}).values():
+            engine.dispose()
+
+        for write_url, read_session in app.extensions.get('read_session', {}).values():
+            read_session.remove()
+            read_session.get_bind().dispose()
+
+
+@pytest.fixture
+def test_client(app):
+    """Get a test client for testing"""
+    return app.test_client()
+
+
+@pytest.fixture
+def add_test_item(test_client):
+    """Method to add a test item to the test client app"""
+
+    post_data = json.dumps({
+        "description": "Pizza",
+        "price": 15.5,
+        "quantity": 20
+    })
+
+    response = test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+    return response
@@ -0,0 +1,87 @@
+import pytest
+import subprocess
+import sys
+from config import ProductionConfig
+from pos import create_app, db
+from pos.services.item_fragments import get_item_fragment_cache
+import json
+
+
+@pytest.fixture
+def apps(tmp_path):
+    """Two apps side by side, each on its own database"""
+
+    apps = [create_app("testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / name}.db", METRICS_ENABLED=True)
+            for name in "ab"]
+
+    for app in apps:
+        with app.app_context():
+            db.create_all()
+
+    yield apps
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.get_engine().dispose()
+
+
+def add_test_item(app, description):
+    post_data = json.dumps({"description": description, "price": 10, "quantity": 5})
+    response = app.test_client().post("/api/v1/items", data=post_data, content_type="application/json")
+    assert response.status_code == 200
+
+
+def test_create_app__apps_are_isolated(apps):
+    """create_app success case. Every app has its own database and metrics"""
+
+    add_test_item(apps[0], "Pizza")
+    add_test_item(apps[1], "Soup")
+    add_test_item(apps[1], "Salad")
+
+    assert [item["description"] for item in apps[0].test_client().get("/api/v1/items").json] == ["Pizza"]
+    assert [item["description"] for item in apps[1].test_client().get("/api/v1/items").json] == ["Soup", "Salad"]
+
+    metrics = apps[0].test_client().get("/metrics").get_data(as_text=True)
+
+    assert 'endpoint="items.add_item",method="POST",status="200"} 1' in metrics
+
+
+def test_create_app__config_and_settings():
+    """create_app selects a config by name or class and overrides single settings"""
+
+    app = create_app("testing", WARM_UP_ITEMS=5)
+
+    assert app.config['TESTING'] and app.config['WARM_UP_ITEMS'] == 5
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == "sqlite://"
+    assert create_app(ProductionConfig, WARM_UP=False).config['WARM_UP'] is False
+
+
+def test_create_app__warm_up(tmp_path):
+    """The warm-up loads the first catalogue page into the item fragment cache"""
+
+    database_uri = f"sqlite:///{tmp_path / 'pos'}.db"
+    writer_app = create_app("testing", SQLALCHEMY_DATABASE_URI=database_uri)
+
+    with writer_app.app_context():
+        db.create_all()
+
+    add_test_item(writer_app, "Pizza")
+    add_test_item(writer_app, "Soup")
+
+    app = create_app("testing", SQLALCHEMY_DATABASE_URI=database_uri, WARM_UP=True)
+
+    with app.app_context():
+        assert len(get_item_fragment_cache()) == 2
+        db.get_engine().dispose()
+
+    with writer_app.app_context():
+        db.get_engine().dispose()
+
+
+def test_import__does_not_create_app():
+    """Importing pos builds no app, so workers only pay for the apps they create"""
+
+    script = "import sys, pos; assert pos._default_app is None and 'pos.routes.items' not in sys.modules"
+
+    subprocess.run([sys.executable, "-c", script], check=True)
@@ -0,0 +1,194 @@
+import pytest
+from flask import current_app
+import asyncio
+from datetime import datetime
+from pos import db
+from pos.models.order import Order
+from pos.services.idempotency import get_idempotency_registry
+from pos.services.item_cache import get_item_cache
+from pos.services.order_archive import archive_orders, get_archive_directory
+import json
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("asgiref")
+
+from pos.asgi import AsyncPosApp
+
+
+async def asgi_request(application, method, path, body=None, headers=()):
+    """Send one HTTP request to an ASGI app. Returns the status code and the body"""
+
+    path, _, query_string = path.partition('?')
+    body = (body or '').encode()
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 50000),
+        'http_version': '1.1',
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] +
+                   [(name.encode(), value.encode()) for name, value in headers],
+    }
+    request_messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status, chunks = None, []
+
+    async def receive():
+        return request_messages.pop(0)
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        else:
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+
+    return status, b''.join(chunks)
+
+
+def asgi_requests(requests):
+    """Send requests in order to a fresh ASGI app and shut it down afterwards"""
+
+    app = current_app._get_current_object()
+
+    async def run():
+        application = AsyncPosApp(app)
+        await application.startup()
+
+        try:
+            return [await asgi_request(application, *request) for request in requests]
+        finally:
+            await application.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_asgi__same_responses_as_wsgi(test_client, add_test_item):
+    """The async routes return the same status codes and JSON bodies as the Flask routes"""
+
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 2}],
+        "payment_amount": 31,
+        "order_note": "No pineapples"
+    })
+    invalid_order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 0}],
+        "payment_amount": 31,
+        "order_note": "No pineapples"
+    })
+
+    requests = [
+        ("GET", "/api/v1/items/1"),
+        ("GET", "/api/v1/items/99"),
+        ("POST", "/api/v1/orders", invalid_order_data),
+        ("POST", "/api/v1/orders", order_data.replace("31", "30")),
+        ("POST", "/api/v1/orders", order_data),
+        ("GET", "/api/v1/orders/1?expand=items"),
+        ("GET", "/api/v1/orders/1?expand=all"),
+        ("GET", "/api/v1/orders/99"),
+        ("GET", "/api/v1/orders/99999999999999999999"),
+    ]
+
+    asgi_responses = asgi_requests(requests)
+
+    # Replay the same requests through the Flask app on a fresh database with the same menu
+    db.drop_all()
+    db.create_all()
+    get_item_cache().clear()
+    test_client.post("/api/v1/items", data=json.dumps({"description": "Pizza", "price": 15.5, "quantity": 20}),
+                     content_type="application/json")
+
+    wsgi_responses = []
+    for method, path, *body in requests:
+        response = test_client.open(path, method=method, data=body[0] if body else None,
+                                    content_type="application/json")
+        wsgi_responses.append((response.status_code, response.data))
+
+    assert [status for status, _ in asgi_responses] == [200, 404, 400, 400, 200, 200, 400, 404, 404]
+    assert asgi_responses == wsgi_responses
+
+
+def test_asgi__idempotent_order_placed_once(app, add_test_item):
+    """A retried order with the same Idempotency-Key returns the first order id"""
+
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}],
+        "payment_amount": 15.5,
+        "order_note": "Retry"
+    })
+    headers = [("Idempotency-Key", "till-9-0001")]
+    get_idempotency_registry().clear()
+
+    responses = asgi_requests([("POST", "/api/v1/orders", order_data, headers)] * 2 + [("GET", "/api/v1/items/1")])
+
+    assert responses[0] == responses[1] == (200, b'{"order_id":1}\n')
+    assert json.loads(responses[2][1])["quantity"] == 19
+
+
+def test_asgi__other_routes_served_by_flask(app, add_test_item):
+    """Routes without an async handler are passed to the Flask app"""
+
+    status, body = asgi_requests([("GET", "/api/v1/items?fields=description")])[0]
+
+    assert status == 200
+    assert json.loads(body) == [{"description": "Pizza"}]
+
+
+def test_asgi__conditional_get_item(app, add_test_item):
+    """The async item route answers 304 for the ETag returned by the Flask route"""
+
+    etag = app.test_client().get("/api/v1/items/1").headers["ETag"]
+    get_item_cache().clear()
+
+    responses = asgi_requests([("GET", "/api/v1/items/1", None, [("If-None-Match", etag)])] * 2)
+
+    assert responses == [(304, b''), (304, b'')]
+
+
+def test_asgi__store_routing(app, tmp_path):
+    """With stores configured the async routes use the database of the X-Store-Id store"""
+
+    app.config['STORES'] = {"store-a": f"sqlite:///{tmp_path / 'store-a'}.db"}
+    headers = [("X-Store-Id", "store-a")]
+
+    app.test_client().post("/api/v1/items", data=json.dumps({"description": "Soup", "price": 4.25, "quantity": 3}),
+                           content_type="application/json", headers=dict(headers))
+
+    responses = asgi_requests([
+        ("GET", "/api/v1/items/1", None, headers),
+        ("GET", "/api/v1/items/1"),
+        ("GET", "/api/v1/items/1", None, [("X-Store-Id", "store-z")]),
+    ])
+
+    assert [status for status, _ in responses] == [200, 400, 404]
+    assert json.loads(responses[0][1])["description"] == "Soup"
+    assert json.loads(responses[2][1]) == {"error": "404 Not Found: Store store-z not found"}
+
+
+def test_asgi__get_archived_order(test_client, add_test_item):
+    """The async GET api/v1/orders/<order_id> route also reads archived orders"""
+
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 2}],
+        "payment_amount": 31,
+        "order_note": "No pineapples"
+    })
+    test_client.post("/api/v1/orders", data=order_data, content_type="application/json")
+    expected = test_client.get("/api/v1/orders/1?expand=items").data
+
+    db.session.query(Order).update({"created_at": datetime(2024, 1, 5)})
+    db.session.commit()
+    archive_orders(db.session, get_archive_directory(), datetime(2025, 1, 1), batch_size=100)
+
+    responses = asgi_requests([("GET", "/api/v1/orders/1?expand=items"), ("GET", "/api/v1/orders/99")])
+
+    assert db.session.query(Order).count() == 0
+    assert responses == [
+        (200, expected), (404, b'{"error":"404 Not Found: Order 99 not found. Please place orders"}\n')
+    ]
@@ -0,0 +1,24 @@
+from benchmarks import suite
+
+
+def test_suite__runs_in_process():
+    """The benchmark suite seeds a catalogue and measures every scenario without errors"""
+
+    args = suite.parse_args(["--items", "20", "--orders", "10", "--requests", "5", "--basket-sizes", "1,3",
+                             "--mode", "in-process"])
+    results = suite.run(args)["results"]["in-process"]
+
+    assert list(results) == ["list_items", "get_item_by_id", "place_order_basket_1", "place_order_basket_3",
+                             "get_order_by_id", "top_sellers"]
+    assert all(result["requests"] == 5 and result["errors"] == 0 for result in results.values())
+
+
+def test_suite__compare_reports_regressions():
+    """compare flags scenarios whose p95 latency or throughput regressed beyond the threshold"""
+
+    baseline = {"results": {"wsgi": {"get_item_by_id": {"p95_ms": 10, "throughput_rps": 100}}}}
+    slower = {"results": {"wsgi": {"get_item_by_id": {"p95_ms": 13, "throughput_rps": 75}}}}
+    similar = {"results": {"wsgi": {"get_item_by_id": {"p95_ms": 11, "throughput_rps": 90}}}}
+
+    assert len(suite.compare(slower, baseline, threshold=0.2)) == 2
+    assert suite.compare(similar, baseline, threshold=0.2) == []
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from pos import db
+from pos.database import get_read_session, read_only_uri
+from pos.models.item import Item
+from config import get_config, Config, ProductionConfig
+
+
+def test_sqlite_pragmas__applied_to_new_connections(app):
+    """Every new SQLite connection runs in WAL mode with the configured PRAGMAs"""
+
+    assert db.session.execute("PRAGMA journal_mode").scalar() == "wal"
+    assert db.session.execute("PRAGMA synchronous").scalar() == 1
+    assert db.session.execute("PRAGMA busy_timeout").scalar() == Config.SQLITE_PRAGMAS['busy_timeout']
+
+
+def test_read_only_uri():
+    """read_only_uri opens the same SQLite file in read-only mode"""
+
+    assert str(read_only_uri("sqlite:////var/pos/pos.db")) == "sqlite:///file:/var/pos/pos.db?mode=ro&uri=true"
+
+
+def test_get_read_session__reads_committed_data_and_rejects_writes(app, test_client, add_test_item):
+    """The read-only pool serves GET routes and cannot write"""
+
+    app.config['READ_ONLY_POOL_ENABLED'] = True
+    read_session = get_read_session()
+
+    assert read_session is not db.session
+    assert read_session.query(Item).get(1).description == "Pizza"
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"description":"Pizza"' in response.data
+
+    with pytest.raises(OperationalError):
+        read_session.execute("DELETE FROM item")
+
+    read_session.rollback()
+
+
+def test_get_config__selects_environment_config(monkeypatch):
+    """get_config picks the config class by name or by the POS_CONFIG environment variable"""
+
+    monkeypatch.delenv("POS_CONFIG", raising=False)
+    assert get_config() is Config
+    assert get_config("production") is ProductionConfig
+
+    monkeypatch.setenv("POS_CONFIG", "production")
+    assert get_config() is ProductionConfig
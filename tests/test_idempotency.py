@@ -0,0 +1,132 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from pos import db
+from pos.exceptions.custom_exceptions import IdempotencyConflictError
+from pos.services.idempotency import IdempotencyRegistry, get_idempotency_registry
+from pos.utils.cache import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+
+class FakeClock:
+    """Manually advanced clock for cache expiry tests"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+ORDER_DATA = json.dumps({
+    "order_items": [{"item_id": 1, "order_quantity": 2}],
+    "payment_amount": 31,
+    "order_note": "No pineapples"
+})
+
+
+def test_ttl_cache__evicts_least_recently_used():
+    """TTLCache drops the least recently used entry when full"""
+
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_cache__expires_entries():
+    """TTLCache entries are gone ttl seconds after they were set"""
+
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl=30, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 29
+    assert cache.get("a") == 1
+
+    clock.now = 30
+    assert cache.get("a") is None
+
+
+def test_idempotency_registry__fail_waiting_duplicate_times_out():
+    """IdempotencyRegistry duplicate of an in-flight request gives up after the timeout"""
+
+    registry = IdempotencyRegistry(max_size=10, ttl=60)
+    assert registry.begin("key-1", timeout=1) is None
+
+    with pytest.raises(IdempotencyConflictError):
+        registry.begin("key-1", timeout=0.01)
+
+    registry.finish("key-1", {"order_id": 1})
+    assert registry.begin("key-1", timeout=0.01) == {"order_id": 1}
+
+
+def test_add_order__retry_returns_original_order(test_client, add_test_item):
+    """add_order retry with the same Idempotency-Key is answered from the cache without any SQL"""
+
+    headers = {"Idempotency-Key": "mobile-retry-1"}
+    response = test_client.post("/api/v1/orders", data=ORDER_DATA, content_type="application/json", headers=headers)
+    assert response.get_json() == {"order_id": 1}
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+
+    try:
+        response = test_client.post("/api/v1/orders", data=ORDER_DATA, content_type="application/json",
+                                    headers=headers)
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    assert response.get_json() == {"order_id": 1}
+    assert statements == []
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":18' in response.data
+
+
+def test_add_order__retry_after_cache_expiry_returns_original_order(test_client, add_test_item):
+    """add_order retry with the same Idempotency-Key falls back to the stored key once the cache forgot it"""
+
+    headers = {"Idempotency-Key": "mobile-retry-2"}
+    test_client.post("/api/v1/orders", data=ORDER_DATA, content_type="application/json", headers=headers)
+
+    get_idempotency_registry().clear()
+
+    response = test_client.post("/api/v1/orders", data=ORDER_DATA, content_type="application/json", headers=headers)
+    assert response.get_json() == {"order_id": 1}
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":18' in response.data
+
+
+def test_add_order__concurrent_duplicates_place_one_order(app, test_client, add_test_item):
+    """add_order concurrent requests with the same Idempotency-Key all get the first request's order"""
+
+    headers = {"Idempotency-Key": "mobile-retry-3"}
+
+    def place_order():
+        with app.app_context():
+            response = app.test_client().post("/api/v1/orders", data=ORDER_DATA, content_type="application/json",
+                                               headers=headers)
+            db.session.remove()
+            return response.get_json()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: place_order(), range(8)))
+
+    assert responses == [{"order_id": 1}] * 8
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":18' in response.data
@@ -0,0 +1,80 @@
+import pytest
+from flask import g
+from pos import db
+
+
+@pytest.fixture
+def app_settings():
+    return {'METRICS_ENABLED': True, 'METRICS_SERVER_TIMING': True}
+
+
+def test_metrics__success(test_client, add_test_item):
+    """metrics success case. Request latency, SQL statements and serialization are exported per endpoint"""
+
+    test_client.get("/api/v1/items/1", content_type="application/json")
+    test_client.get("/api/v1/items/1", content_type="application/json")
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+    metrics = response.data.decode()
+    assert 'pos_requests_total{endpoint="items.get_item_by_id",method="GET",status="200"} 2' in metrics
+    assert 'pos_request_duration_seconds_count{endpoint="items.get_item_by_id",method="GET"} 2' in metrics
+    assert 'pos_request_serialization_seconds_count{endpoint="items.get_item_by_id",method="GET"} 2' in metrics
+
+    # The first read hits the database, the second one is served from the item cache
+    assert 'pos_request_sql_statements_bucket{endpoint="items.get_item_by_id",method="GET",le="0"} 1' in metrics
+    assert 'pos_request_sql_statements_bucket{endpoint="items.get_item_by_id",method="GET",le="1"} 2' in metrics
+    assert 'pos_sql_statement_duration_seconds_count{endpoint="items.get_item_by_id",method="GET"} 1' in metrics
+    assert 'pos_item_cache_hits_total 1' in metrics
+
+
+def test_metrics__server_timing_header(test_client, add_test_item):
+    """Responses carry a Server-Timing header with app, db and serialize durations"""
+
+    response = test_client.get("/api/v1/items", content_type="application/json")
+    server_timing = response.headers["Server-Timing"]
+
+    assert server_timing.startswith("app;dur=")
+    assert 'db;dur=' in server_timing and 'desc="2 statements"' in server_timing
+    assert 'serialize;dur=' in server_timing
+
+
+def test_metrics__slow_request_logged(app, test_client, add_test_item, caplog):
+    """Requests slower than METRICS_SLOW_REQUEST_MS are logged"""
+
+    app.config['METRICS_SLOW_REQUEST_MS'] = 0
+    test_client.get("/api/v1/items", content_type="application/json")
+
+    assert "Slow request GET /api/v1/items (items.get_all_items)" in caplog.text
+
+
+def test_metrics__failed_statement_not_timed(app):
+    """A statement that raises is not timed and leaves no state on its pooled connection"""
+
+    with app.test_request_context("/api/v1/items"):
+        app.preprocess_request()
+        connection_info = db.session.connection().info
+
+        with pytest.raises(Exception):
+            db.session.execute(db.text("SELECT * FROM missing_table"))
+
+        assert 'query_started_at' not in connection_info
+
+        db.session.rollback()
+        db.session.execute(db.text("SELECT 1"))
+
+        assert len(g.request_metrics.sql_durations) == 1
+
+
+def test_metrics__fail_disabled(app, test_client):
+    """metrics fail case. Nothing is recorded or exposed unless METRICS_ENABLED is set"""
+
+    app.config['METRICS_ENABLED'] = False
+
+    response = test_client.get("/api/v1/items", content_type="application/json")
+    assert "Server-Timing" not in response.headers
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 404
@@ -0,0 +1,99 @@
+import pytest
+from pos import db
+from pos.services.inventory import InventoryLedger, LedgerItem, get_inventory_ledger
+import json
+
+
+@pytest.fixture
+def app_settings():
+    return {'INVENTORY_LEDGER': True}
+
+
+@pytest.fixture
+def add_test_items(test_client):
+    """Method to add a small menu to the test client app"""
+
+    for description, price, quantity in [("Pizza", 15.5, 20), ("Salad", 9, 4), ("Soup", 4.25, 3)]:
+        post_data = json.dumps({"description": description, "price": price, "quantity": quantity})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+
+def place_order(test_client, item_id, quantity, payment_amount):
+    post_data = json.dumps({
+        "order_items": [{"item_id": item_id, "order_quantity": quantity}],
+        "payment_amount": payment_amount,
+        "order_note": "Ledger test"
+    })
+
+    return test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+
+def test_add_order__success_with_inventory_ledger(test_client, add_test_items):
+    """add_order with INVENTORY_LEDGER. Baskets are checked against the ledger with the usual errors"""
+
+    assert place_order(test_client, 1, 2, 31).get_json() == {"order_id": 1}
+    assert place_order(test_client, 2, 5, 45).get_json()["error"] == \
+        "400 Bad Request: Quantity: 5 not available for item: 2"
+    assert place_order(test_client, 99, 1, 1).status_code == 404
+    assert place_order(test_client, 3, 1, 4).get_json()["error"] == "400 Bad Request: Payment amount is too low"
+
+    assert get_inventory_ledger().items(db.session, [1, 2, 3, 99]) == {
+        1: LedgerItem(1, 18, 1550), 2: LedgerItem(2, 4, 900), 3: LedgerItem(3, 3, 425)
+    }
+
+
+def test_inventory_ledger__follows_item_writes(test_client, add_test_items):
+    """The ledger catches up with updated and deleted items from the stock event log before every check"""
+
+    assert place_order(test_client, 1, 1, 15.5).status_code == 200
+
+    put_data = json.dumps({"description": "Pizza", "price": 17, "quantity": 20})
+    test_client.put("/api/v1/items/1", data=put_data, content_type="application/json")
+    test_client.delete("/api/v1/items/3")
+
+    assert place_order(test_client, 1, 1, 15.5).get_json()["error"] == "400 Bad Request: Payment amount is too low"
+    assert place_order(test_client, 1, 1, 17).status_code == 200
+    assert place_order(test_client, 3, 1, 4.25).status_code == 404
+
+    response = test_client.get("/api/v1/items/1")
+    assert response.get_json()["quantity"] == 19
+
+
+def test_inventory_ledger__database_stays_authority(test_client, add_test_items):
+    """A basket the ledger accepts is still rejected when the database has less stock"""
+
+    get_inventory_ledger().load(db.session)
+
+    # A write that bypasses the API does not reach the ledger
+    db.session.execute(db.text("UPDATE item SET quantity = 1 WHERE id = 2"))
+    db.session.commit()
+
+    assert place_order(test_client, 2, 3, 27).get_json()["error"] == \
+        "400 Bad Request: Quantity: 3 not available for item: 2"
+
+    response = test_client.get("/api/v1/items/2")
+    assert response.get_json()["quantity"] == 1
+
+
+def test_inventory_ledger__sparse_ids(app, add_test_items):
+    """Ids above max_dense_id are kept outside the arrays"""
+
+    inventory = InventoryLedger(max_dense_id=2)
+
+    assert inventory.items(db.session, [3, 2]) == {3: LedgerItem(3, 3, 425), 2: LedgerItem(2, 4, 900)}
+    assert len(inventory) == 3
+    assert inventory.nbytes == 2 * 3 * 8
+
+
+def test_inventory_ledger__asgi_orders(app, add_test_items):
+    """The ASGI entry point checks baskets against the ledger too"""
+
+    asgi_requests = pytest.importorskip("tests.test_asgi").asgi_requests
+    inventory = get_inventory_ledger()
+
+    assert len(inventory) == 0
+    assert asgi_requests([("POST", "/api/v1/orders", json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 2}], "payment_amount": 31, "order_note": "Ledger test"
+    }))]) == [(200, b'{"order_id":1}\n')]
+    assert inventory.items(db.session, [1]) == {1: LedgerItem(1, 18, 1550)}
+    assert len(inventory) == 3
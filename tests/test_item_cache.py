@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from pos.services.item_cache import get_item_cache, create_item_cache, LocalItemCache, NullItemCache
+import json
+
+
+def get_item_statements(test_client, item_id):
+    """GET an item and return the SQL statements it issued"""
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+
+    try:
+        response = test_client.get(f"/api/v1/items/{item_id}", content_type="application/json")
+        assert response.status_code == 200
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_statement)
+
+    return statements
+
+
+def test_get_item_by_id__served_from_cache(test_client, add_test_item):
+    """get_item_by_id reads the database once and then answers from the cache"""
+
+    item_cache = get_item_cache()
+    hits, misses = item_cache.hits, item_cache.misses
+
+    assert len(get_item_statements(test_client, 1)) == 1
+    assert get_item_statements(test_client, 1) == []
+    assert item_cache.stats == {'hits': hits + 1, 'misses': misses + 1}
+
+
+def test_update_item_by_id__invalidates_cache(test_client, add_test_item):
+    """update_item_by_id drops the cached item"""
+
+    test_client.get("/api/v1/items/1", content_type="application/json")
+
+    put_data = json.dumps({"description": "Salad", "price": 10, "quantity": 25})
+    test_client.put("/api/v1/items/1", data=put_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"description":"Salad"' in response.data
+
+
+def test_add_order__invalidates_cache(test_client, add_test_item):
+    """add_order drops the cached items whose stock was decremented"""
+
+    test_client.get("/api/v1/items/1", content_type="application/json")
+
+    post_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 2}],
+        "payment_amount": 31,
+        "order_note": "No pineapples"
+    })
+    test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":18' in response.data
+
+
+def test_remove_item_by_id__invalidates_cache(test_client, add_test_item):
+    """remove_item_by_id drops the cached item"""
+
+    test_client.get("/api/v1/items/1", content_type="application/json")
+    test_client.delete("/api/v1/items/1", content_type="application/json")
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert response.status_code == 404
+
+
+def test_create_item_cache__backends():
+    """create_item_cache builds the configured backend. Local snapshots are immutable and LRU bounded"""
+
+    config = {'ITEM_CACHE_BACKEND': 'local', 'ITEM_CACHE_SIZE': 1, 'ITEM_CACHE_TTL': 60}
+    item_cache = create_item_cache(config)
+    assert isinstance(item_cache, LocalItemCache)
+
+    snapshot = item_cache.set(1, {'id': 1})
+    with pytest.raises(TypeError):
+        snapshot['id'] = 2
+
+    item_cache.set(2, {'id': 2})
+    assert item_cache.get(1) is None
+    assert item_cache.get(2) == {'id': 2}
+
+    assert isinstance(create_item_cache({'ITEM_CACHE_BACKEND': None}), NullItemCache)
+
+    with pytest.raises(ValueError):
+        create_item_cache({'ITEM_CACHE_BACKEND': 'memcached'})
@@ -1,37 +1,8 @@
 import pytest
-from pos import app as _app, db
+from pos.services.item_cache import get_item_cache
 import json
 
 
-@pytest.fixture
-def test_client(app):
-    """Get a test client for testing"""
-    return app.test_client()
-
-
-@pytest.fixture
-def app():
-    with _app.app_context():
-        db.create_all()
-        yield _app
-        db.drop_all()
-        db.create_all()
-
-
-@pytest.fixture
-def add_test_item(test_client):
-    """Method to add a test item to the test client app"""
-
-    post_data = json.dumps({
-        "description": "Pizza",
-        "price": 15.5,
-        "quantity": 20
-    })
-
-    response = test_client.post("/api/v1/items", data=post_data, content_type="application/json")
-    return response
-
-
 def test_add_item__success(test_client):
     """add_item success case"""
 
@@ -116,6 +87,20 @@ def test_update_item_by_id__success(test_client, add_test_item):
     assert b'"description":"Salad"' in response.data
 
 
+def test_update_item_by_id__fail_with_validation_error(test_client, add_test_item):
+    """update_item_by_id fail case. Missing fields are reported instead of failing with a server error"""
+
+    put_data = json.dumps({
+        "description": "Pizza",
+        "price": 22.5
+    })
+
+    response = test_client.put("/api/v1/items/1", data=put_data, content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.json["errors"] == [{"loc": ["quantity"], "msg": "field required", "type": "value_error.missing"}]
+
+
 def test_remove_item_by_id__success(test_client, add_test_item):
     """remove_item_by_id success case"""
 
@@ -123,3 +108,246 @@ def test_remove_item_by_id__success(test_client, add_test_item):
     assert response.status_code == 200
     assert response.content_type == 'application/json'
     assert b'"id":1' in response.data
+
+
+@pytest.fixture
+def add_test_items(test_client):
+    """Method to add a small menu to the test client app"""
+
+    menu = [("Pizza", 15.5, 20), ("Pasta", 11, 1), ("Salad", 9, 5), ("Pie", 4.5, 12), ("Burger", 12.5, 8)]
+
+    for description, price, quantity in menu:
+        post_data = json.dumps({"description": description, "price": price, "quantity": quantity})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    # Sell out the Pasta
+    post_data = json.dumps({
+        "order_items": [{"item_id": 2, "order_quantity": 1}],
+        "payment_amount": 11,
+        "order_note": "Last one"
+    })
+    test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+
+def test_get_all_items__success_paginated_with_cursor(test_client, add_test_items):
+    """get_all_items success case. Following X-Next-Cursor walks every item exactly once"""
+
+    response = test_client.get("/api/v1/items?limit=2", content_type="application/json")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.get_json()] == [1, 2]
+
+    seen_ids = [item["id"] for item in response.get_json()]
+
+    while "X-Next-Cursor" in response.headers:
+        cursor = response.headers["X-Next-Cursor"]
+        response = test_client.get(f"/api/v1/items?limit=2&cursor={cursor}", content_type="application/json")
+        assert response.status_code == 200
+        seen_ids += [item["id"] for item in response.get_json()]
+
+    assert seen_ids == [1, 2, 3, 4, 5]
+
+
+def test_get_all_items__success_with_fields_and_filters(test_client, add_test_items):
+    """get_all_items success case. Only requested fields of matching items are returned"""
+
+    response = test_client.get("/api/v1/items?fields=description&min_price=5&max_price=15.5&in_stock=true"
+                               "&description_prefix=P", content_type="application/json")
+    assert response.status_code == 200
+    assert response.get_json() == [{"description": "Pizza"}]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_all_items__success_with_price_bounds(test_client):
+    """get_all_items success case. Prices equal to min_price or max_price are inside the range"""
+
+    for description, price in [("Gum", 0.29), ("Mints", 0.57)]:
+        post_data = json.dumps({"description": description, "price": price, "quantity": 10})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items?fields=description&max_price=0.29", content_type="application/json")
+    assert response.get_json() == [{"description": "Gum"}]
+
+    response = test_client.get("/api/v1/items?fields=description&min_price=0.29&max_price=0.57",
+                               content_type="application/json")
+    assert response.get_json() == [{"description": "Gum"}, {"description": "Mints"}]
+
+    response = test_client.get("/api/v1/items?fields=description&min_price=0.57", content_type="application/json")
+    assert response.get_json() == [{"description": "Mints"}]
+
+
+def test_get_all_items__success_with_last_code_point_prefix(test_client, add_test_items):
+    """get_all_items success case. A description prefix ending in U+10FFFF is filtered without an upper bound"""
+
+    response = test_client.get("/api/v1/items?description_prefix=%F4%8F%BF%BF", content_type="application/json")
+    assert response.status_code == 404
+
+    post_data = json.dumps({"description": "Pizza\U0010ffff", "price": 1, "quantity": 1})
+    test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items?fields=description&description_prefix=Pizza%F4%8F%BF%BF",
+                               content_type="application/json")
+    assert response.get_json() == [{"description": "Pizza\U0010ffff"}]
+
+
+def test_get_all_items__fail_with_invalid_query(test_client, add_test_items):
+    """get_all_items fail case. Unknown fields and malformed cursors are rejected"""
+
+    response = test_client.get("/api/v1/items?fields=id,secret", content_type="application/json")
+    assert response.status_code == 400
+    assert b'fields must be a comma separated list' in response.data
+
+    response = test_client.get("/api/v1/items?cursor=not-a-cursor", content_type="application/json")
+    assert response.status_code == 400
+    assert b'Invalid cursor' in response.data
+
+
+def test_export_items__success(test_client, add_test_items):
+    """export_items success case. One JSON object per line, resumable with since_id"""
+
+    response = test_client.get("/api/v1/items/export")
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [item["id"] for item in lines] == [1, 2, 3, 4, 5]
+    assert lines[0]["description"] == "Pizza"
+
+    response = test_client.get("/api/v1/items/export?since_id=3")
+    assert [json.loads(line)["id"] for line in response.data.decode().splitlines()] == [4, 5]
+
+
+def test_export_items__fail_with_validation_error(test_client):
+    """export_items fail case. since_id cannot be negative"""
+
+    response = test_client.get("/api/v1/items/export?since_id=-1")
+    assert response.status_code == 400
+    assert b'1 validation error for ExportInputValidator' in response.data
+
+
+def test_bulk_upsert_items__success_with_row_errors(test_client, add_test_item):
+    """bulk_upsert_items success case. Valid rows are inserted or updated and invalid rows are reported"""
+
+    post_data = json.dumps([
+        {"description": "Salad", "price": 9, "quantity": 5},
+        {"description": "Burger", "price": -1, "quantity": 5},
+        {"id": 1, "description": "Large Pizza", "price": 18, "quantity": 30},
+        {"id": 99, "description": "Ghost", "price": 1, "quantity": 1},
+    ])
+
+    response = test_client.post("/api/v1/items/bulk", data=post_data, content_type="application/json")
+    assert response.status_code == 200
+
+    result = response.get_json()
+    assert result["inserted"] == 1
+    assert result["updated"] == 1
+    assert [error["row"] for error in result["errors"]] == [1, 3]
+    assert result["errors"][1]["error"] == "Item 99 not found"
+
+    response = test_client.get("/api/v1/items", content_type="application/json")
+    assert [item["description"] for item in response.get_json()] == ["Large Pizza", "Salad"]
+
+
+def test_bulk_upsert_items__success_records_new_item_ids(test_client, add_test_item):
+    """bulk_upsert_items success case. Every inserted row gets its own created stock event, also when it reuses the
+    id of a deleted item
+    """
+
+    test_client.get("/api/v1/items/1")
+    test_client.delete("/api/v1/items/1")
+
+    post_data = json.dumps([
+        {"description": "Salad", "price": 9, "quantity": 5},
+        {"description": "Soup", "price": 6, "quantity": 3},
+    ])
+    test_client.post("/api/v1/items/bulk", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items/changes?since=2")
+    assert [(change["item_id"], change["change"], change["item"]["description"])
+            for change in response.get_json()["changes"]] == [(1, "created", "Salad"), (2, "created", "Soup")]
+    assert test_client.get("/api/v1/items/1").get_json()["description"] == "Salad"
+
+
+def test_bulk_upsert_items__success_with_ndjson(test_client):
+    """bulk_upsert_items success case. Items can be sent as newline-delimited JSON"""
+
+    post_data = ('{"description": "Salad", "price": 9, "quantity": 5}\n\n'
+                 '{"description": "Soup", "price": 6, "quantity": 3}\n')
+
+    response = test_client.post("/api/v1/items/bulk", data=post_data, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    assert response.get_json()["inserted"] == 2
+
+
+def test_bulk_upsert_items__fail_atomic_with_invalid_row(test_client):
+    """bulk_upsert_items fail case. Nothing is written when an atomic upsert has an invalid row"""
+
+    post_data = '{"description": "Salad", "price": 9, "quantity": 5}\nnot json\n'
+
+    response = test_client.post("/api/v1/items/bulk?atomic=true", data=post_data,
+                                content_type="application/x-ndjson")
+    assert response.status_code == 400
+    assert response.get_json()["errors"][0]["row"] == 1
+
+    response = test_client.get("/api/v1/items", content_type="application/json")
+    assert response.status_code == 404
+
+
+def test_bulk_upsert_items__fail_with_non_utf8_row(test_client):
+    """bulk_upsert_items fail case. A line that is not UTF-8 is reported as a row error"""
+
+    post_data = b'{"description": "Salad", "price": 9, "quantity": 5}\n\xff\xfe\n'
+
+    response = test_client.post("/api/v1/items/bulk?atomic=true", data=post_data,
+                                content_type="application/x-ndjson")
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == [{"row": 1, "error": "Row must be UTF-8 encoded"}]
+
+
+def test_get_item_by_id__not_modified(test_client, add_test_item):
+    """get_item_by_id answers 304 for the current ETag, also when the item is not cached"""
+
+    response = test_client.get("/api/v1/items/1")
+    etag = response.headers["ETag"]
+
+    assert response.headers["Last-Modified"]
+
+    response = test_client.get("/api/v1/items/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    get_item_cache().clear()
+    response = test_client.get("/api/v1/items/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    post_data = json.dumps([{"id": 1, "description": "Pizza", "price": 16, "quantity": 30}])
+    test_client.post("/api/v1/items/bulk", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json["price"] == 16
+
+
+def test_get_all_items__not_modified(test_client, add_test_item):
+    """get_all_items answers 304 until any item changes"""
+
+    response = test_client.get("/api/v1/items")
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    response = test_client.get("/api/v1/items", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = test_client.get("/api/v1/items", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    post_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}],
+        "payment_amount": 15.5,
+        "order_note": "No pineapples"
+    })
+    test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json[0]["quantity"] == 19
@@ -0,0 +1,101 @@
+import pytest
+from pos import db
+from pos.services.item_search import create_search_index, PrefixItemSearch
+import json
+
+
+@pytest.fixture(params=['auto', 'prefix'])
+def app_settings(request):
+    return {'ITEM_SEARCH_BACKEND': request.param}
+
+
+@pytest.fixture
+def add_test_items(test_client):
+    """Method to add a small menu to the test client app"""
+
+    menu = ["Pizza Margherita", "Pizza Funghi", "Café crème", "Pasta al pomodoro", "Margherita Pizza slice"]
+
+    for description in menu:
+        post_data = json.dumps({"description": description, "price": 10, "quantity": 5})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+
+def search(test_client, query, limit=10):
+    response = test_client.get("/api/v1/items/search", query_string={"q": query, "limit": limit})
+    assert response.status_code == 200
+    return [item["description"] for item in response.json]
+
+
+def test_search_items_by_description__success(test_client, add_test_items):
+    """search_items_by_description success case. Every word is a case and accent insensitive prefix"""
+
+    assert search(test_client, "piz") == ["Pizza Margherita", "Pizza Funghi", "Margherita Pizza slice"]
+    assert search(test_client, "MARG piz") == ["Pizza Margherita", "Margherita Pizza slice"]
+    assert search(test_client, "cafe cre") == ["Café crème"]
+    assert search(test_client, "pizza", limit=1) == ["Pizza Margherita"]
+    assert search(test_client, "pizza burger") == []
+    assert search(test_client, "--") == []
+
+
+def test_search_items_by_description__follows_writes(test_client, add_test_items):
+    """Updated, deleted and bulk written items are searchable right after the write"""
+
+    put_data = json.dumps({"description": "Calzone", "price": 12, "quantity": 5})
+    test_client.put("/api/v1/items/2", data=put_data, content_type="application/json")
+    test_client.delete("/api/v1/items/1")
+
+    post_data = json.dumps([
+        {"id": 4, "description": "Pasta carbonara", "price": 11, "quantity": 5},
+        {"description": "Pizza bianca", "price": 9, "quantity": 5},
+    ])
+    test_client.post("/api/v1/items/bulk", data=post_data, content_type="application/json")
+
+    assert search(test_client, "pi") == ["Pizza bianca", "Margherita Pizza slice"]
+    assert search(test_client, "cal") == ["Calzone"]
+    assert search(test_client, "pasta") == ["Pasta carbonara"]
+    assert search(test_client, "pomodoro") == []
+
+
+def test_search_items_by_description__fail_with_validation_error(test_client):
+    """search_items_by_description fail case. q is required"""
+
+    response = test_client.get("/api/v1/items/search?limit=101")
+
+    assert response.status_code == 400
+    assert [error["loc"] for error in response.json["errors"]] == [["q"], ["limit"]]
+
+
+def test_create_search_index__indexes_existing_items(app, test_client, add_test_items):
+    """An index created on an existing database covers the items already in it"""
+
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE item_search")
+
+        assert create_search_index(connection)
+
+    app.extensions.pop('item_search', None)
+
+    assert search(test_client, "funghi") == ["Pizza Funghi"]
+
+
+def test_prefix_item_search__rebuilds_after_clear(app, add_test_items):
+    """The in-process index is rebuilt from the item table after clear()"""
+
+    item_search = PrefixItemSearch(1000)
+
+    assert [row.id for row in item_search.search(db.session, ["marg"], 10)] == [1, 5]
+
+    db.session.execute(db.text("UPDATE item SET description = 'Margherita' WHERE id = 3"))
+    db.session.commit()
+    item_search.clear()
+
+    assert [row.id for row in item_search.search(db.session, ["marg"], 10)] == [3, 1, 5]
+
+
+def test_prefix_item_search__success_with_last_code_point(app, add_test_items):
+    """A word ending in U+10FFFF has no upper bound to increment and matches nothing instead of failing"""
+
+    item_search = PrefixItemSearch(1000)
+
+    assert item_search.search(db.session, ["pizza\U0010ffff"], 10) == []
+    assert [row.id for row in item_search.search(db.session, ["pizza"], 10)] == [1, 2, 5]
@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime
+from flask.json import JSONEncoder, JSONDecoder
+import json
+
+orjson = pytest.importorskip("orjson")
+
+from pos.json_provider import OrjsonEncoder, OrjsonDecoder
+
+
+@pytest.fixture
+def add_test_items(test_client):
+    """Method to add a small menu to the test client app"""
+
+    menu = [("Pizza", 15.5, 20), ("Salad", 9, 30), ("Café crème", 4.25, 12)]
+
+    for description, price, quantity in menu:
+        post_data = json.dumps({"description": description, "price": price, "quantity": quantity})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+
+@pytest.mark.parametrize("document", [
+    {"b": 1, "a": [1.5, 0.1, -3, None, True], "c": {"z": "x", "y": ""}},
+    {"description": "Café crème"}, {10: "non-string key", 2: "sorted as numbers"},
+    {"created_at": datetime(2021, 9, 1, 12, 30), "big": 2 ** 70},
+])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_orjson_encoder__same_output_as_json_module(app, document, ensure_ascii):
+    """The orjson encoder writes the same compact documents as the json module"""
+
+    def encode(encoder):
+        return json.dumps(document, cls=encoder, separators=(',', ':'), sort_keys=True, ensure_ascii=ensure_ascii)
+
+    assert encode(OrjsonEncoder) == encode(JSONEncoder)
+
+
+def test_orjson_decoder__same_values_as_json_module():
+    """The orjson decoder parses the same values, also the NaN the json module accepts"""
+
+    for document in ('{"a": [1, 2.5, "é", null]}', '{"price": NaN}'):
+        assert repr(json.loads(document, cls=OrjsonDecoder)) == repr(json.loads(document, cls=JSONDecoder))
+
+
+def test_get_all_items__fragments_match_jsonify(app, test_client, add_test_items):
+    """Pages assembled from pre-encoded item fragments are byte for byte the jsonify output"""
+
+    fragment_response = test_client.get("/api/v1/items")
+    cached_response = test_client.get("/api/v1/items")
+
+    app.config['ITEM_FRAGMENT_CACHE_SIZE'] = 0
+
+    jsonify_response = test_client.get("/api/v1/items")
+
+    assert fragment_response.data == cached_response.data == jsonify_response.data
+    assert fragment_response.mimetype == jsonify_response.mimetype == "application/json"
+
+
+def test_get_all_items__fragment_replaced_after_write(test_client, add_test_items):
+    """A cached fragment is not reused once the item version changes"""
+
+    test_client.get("/api/v1/items")
+
+    put_data = json.dumps({"description": "Pizza", "price": 22.5, "quantity": 10})
+    test_client.put("/api/v1/items/1", data=put_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items")
+    assert response.json[0] == {"id": 1, "description": "Pizza", "price": 22.5, "quantity": 10}
@@ -0,0 +1,126 @@
+import pytest
+from decimal import Decimal
+from hypothesis import given, strategies as st
+from sqlalchemy import create_engine, inspect, text
+from pos.commands import migrate_money_to_cents
+from pos.exceptions.custom_exceptions import PaymentError
+from pos.models.item import Item
+from pos.utils.money import to_cents, from_cents
+from pos.validators.payment_validator import payment_validator
+import json
+
+
+# Baskets of (price in cents, order quantity) lines
+baskets = st.lists(st.tuples(st.integers(min_value=1, max_value=10 ** 6), st.integers(min_value=1, max_value=50)),
+                   min_size=1, max_size=50)
+
+
+def basket_items(basket):
+    items = {item_id: Item(f"Item {item_id}", from_cents(price_cents), 100)
+             for item_id, (price_cents, _) in enumerate(basket, start=1)}
+    order_quantities = {item_id: order_quantity for item_id, (_, order_quantity) in enumerate(basket, start=1)}
+    return items, order_quantities
+
+
+@given(st.integers(min_value=0, max_value=10 ** 13))
+def test_to_cents__round_trips_through_json_float(cents):
+    """Cents survive the float used in JSON output"""
+    assert to_cents(from_cents(cents)) == cents
+
+
+@given(st.integers(min_value=0, max_value=10 ** 12))
+def test_to_cents__rounds_half_up(thousandths):
+    """Amounts with a third decimal place are rounded half up to the nearest cent"""
+    assert to_cents(Decimal(thousandths).scaleb(-3)) == (thousandths + 5) // 10
+
+
+@given(baskets)
+def test_payment_validator__accepts_payment_summed_in_floats(basket):
+    """A payment a client summed in floats is accepted even when the float sum is not exact"""
+
+    items, order_quantities = basket_items(basket)
+    payment_amount = sum(items[item_id].price * order_quantity for item_id, order_quantity in order_quantities.items())
+
+    assert payment_validator(order_quantities, payment_amount, items) is items
+
+
+@given(baskets, st.sampled_from([-1, 1]))
+def test_payment_validator__rejects_payment_off_by_one_cent(basket, cents_off):
+    """A payment one cent too low or too high is rejected"""
+
+    items, order_quantities = basket_items(basket)
+    expected_cents = sum(items[item_id].price_cents * order_quantity
+                         for item_id, order_quantity in order_quantities.items())
+
+    with pytest.raises(PaymentError):
+        payment_validator(order_quantities, from_cents(expected_cents + cents_off), items)
+
+
+def test_add_order__success_with_inexact_float_payment(test_client):
+    """add_order success case. 0.1 + 0.2 is not 0.3 in floats but pays for items priced 0.1 and 0.2"""
+
+    for description, price in (("Mint", 0.1), ("Gum", 0.2)):
+        post_data = json.dumps({"description": description, "price": price, "quantity": 10})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    post_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}, {"item_id": 2, "order_quantity": 1}],
+        "payment_amount": 0.1 + 0.2,
+        "order_note": "Till change"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    assert response.status_code == 200
+    assert test_client.get("/api/v1/orders/1").json["amount"] == 0.3
+
+
+def test_get_all_items__success_price_field_stays_a_float(test_client, add_test_item):
+    """get_all_items success case. Prices are stored in cents but listed in currency units"""
+
+    response = test_client.get("/api/v1/items?fields=price")
+
+    assert response.status_code == 200
+    assert response.json == [{"price": 15.5}]
+
+
+def test_migrate_money_to_cents__converts_float_columns():
+    """Float prices and amounts of an existing database are converted to cents once"""
+
+    engine = create_engine("sqlite://")
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, description VARCHAR(50) NOT NULL, "
+                                "price FLOAT NOT NULL, quantity INTEGER NOT NULL)"))
+        connection.execute(text("CREATE INDEX ix_item_price ON item (price)"))
+        connection.execute(text('CREATE TABLE "order" (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, '
+                                'note VARCHAR(50) NOT NULL, idempotency_key VARCHAR(64))'))
+        connection.execute(text("INSERT INTO item VALUES (1, 'Pizza', 15.5, 20), (2, 'Mint', :price, 10)"),
+                           {'price': 0.1 + 0.2})
+        connection.execute(text("INSERT INTO \"order\" VALUES (1, 31.0, 'No pineapples', NULL)"))
+
+        assert migrate_money_to_cents(connection) == ['item', 'order']
+        assert migrate_money_to_cents(connection) == []
+
+        assert connection.execute(text("SELECT id, price_cents FROM item ORDER BY id")).fetchall() == [(1, 1550),
+                                                                                                        (2, 30)]
+        assert connection.execute(text('SELECT amount_cents FROM "order"')).scalar() == 3100
+        assert 'price' not in {column['name'] for column in inspect(connection).get_columns('item')}
+        assert 'ix_item_price_cents' in {index['name'] for index in inspect(connection).get_indexes('item')}
+
+
+def test_migrate_money_to_cents__rounds_like_to_cents():
+    """Half cent prices are converted like the same price sent to the API"""
+
+    prices = [0.285, 1.005, 0.145, 2.675, 19.99]
+    engine = create_engine("sqlite://")
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, description VARCHAR(50) NOT NULL, "
+                                "price FLOAT NOT NULL, quantity INTEGER NOT NULL)"))
+        connection.execute(text("INSERT INTO item VALUES (:id, 'Item', :price, 1)"),
+                           [{'id': item_id, 'price': price} for item_id, price in enumerate(prices, 1)])
+
+        assert migrate_money_to_cents(connection) == ['item']
+        assert [cents for cents, in connection.execute(text("SELECT price_cents FROM item ORDER BY id"))] == \
+            [to_cents(price) for price in prices]
@@ -0,0 +1,109 @@
+import pytest
+from datetime import datetime
+from pos import db
+from pos.models.item_sales import ItemSales
+from pos.models.order import Order
+from pos.models.order_archive_segment import OrderArchiveSegment
+from pos.services.order_archive import archive_cutoff, archive_orders, get_archive_directory
+import json
+
+
+@pytest.fixture
+def add_test_orders(test_client):
+    """Method to place five orders. The first three are backdated to two old months"""
+
+    post_data = json.dumps({"description": "Pizza", "price": 15.5, "quantity": 20})
+    test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}],
+        "payment_amount": 15.5,
+        "order_note": "No pineapples"
+    })
+
+    for _ in range(5):
+        test_client.post("/api/v1/orders", data=order_data, content_type="application/json")
+
+    for order_id, created_at in enumerate([datetime(2024, 1, 5), datetime(2024, 1, 20), datetime(2024, 2, 3)], 1):
+        db.session.query(Order).filter(Order.id == order_id).update({"created_at": created_at})
+
+    db.session.commit()
+
+
+def test_archive_orders__success(test_client, add_test_orders):
+    """archive_orders success case. Old orders move into segments per batch and month and stay readable by id"""
+
+    expanded_order = test_client.get("/api/v1/orders/2?expand=items").get_json()
+
+    assert archive_orders(db.session, get_archive_directory(), datetime(2025, 1, 1), batch_size=2) == (3, 2)
+    assert [order_id for order_id, in db.session.query(Order.id)] == [4, 5]
+
+    segments = OrderArchiveSegment.query.order_by(OrderArchiveSegment.id).all()
+    assert [(segment.first_order_id, segment.last_order_id, segment.order_count) for segment in segments] == [
+        (1, 2, 2), (3, 3, 1)
+    ]
+    assert segments[1].path == "2024-02/orders-0000000003-0000000003.ndjson.gz"
+
+    response = test_client.get("/api/v1/orders/2?expand=items")
+
+    assert response.status_code == 200
+    assert response.get_json() == expanded_order
+    assert test_client.get("/api/v1/orders/3").get_json() == {
+        "id": 3, "amount": 15.5, "note": "No pineapples", "items": [{"item_id": 1, "ordered_quantity": 1}]
+    }
+    assert test_client.get("/api/v1/orders/5").status_code == 200
+    assert test_client.get("/api/v1/orders/99").status_code == 404
+
+    put_data = json.dumps({"description": "Pizza", "price": 17, "quantity": 20})
+    test_client.put("/api/v1/items/1", data=put_data, content_type="application/json")
+
+    # The unit price of the archived order, not the current price
+    assert test_client.get("/api/v1/orders/2?expand=items").get_json() == expanded_order
+
+
+def test_archive_orders_command__keeps_sales_aggregates(app, add_test_orders):
+    """flask archive-orders archives by retention, and backfill-sales keeps the aggregates of archived orders"""
+
+    runner = app.test_cli_runner()
+
+    # Count the backdated orders in their own days
+    runner.invoke(args=["backfill-sales"])
+    sales = sorted((row.period, row.period_start, row.units_sold) for row in ItemSales.query)
+
+    result = runner.invoke(args=["archive-orders", "--older-than-days", "1"])
+
+    assert "Archived 3 orders" in result.output
+    assert archive_cutoff(1, now=datetime(2024, 3, 10, 15, 30)) == datetime(2024, 3, 9)
+
+    result = runner.invoke(args=["backfill-sales"])
+
+    assert result.exit_code == 0
+    assert sorted((row.period, row.period_start, row.units_sold) for row in ItemSales.query) == sales
+
+
+
+def test_archive_orders__ids_and_idempotency_keys_stay_used(test_client, add_test_item):
+    """Archived order ids are not handed out again, and retries with the key of an archived order return its id"""
+
+    def order(idempotency_key):
+        return {"order_items": [{"item_id": 1, "order_quantity": 1}], "payment_amount": 15.5,
+                "order_note": "Offline order", "idempotency_key": idempotency_key}
+
+    post_data = json.dumps({"orders": [order("till-4-0001"), order("till-4-0002")]})
+    test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+
+    assert archive_orders(db.session, get_archive_directory(), datetime(2100, 1, 1), batch_size=10) == (2, 1)
+
+    post_data = json.dumps({"order_items": [{"item_id": 1, "order_quantity": 1}], "payment_amount": 15.5,
+                            "order_note": "Offline order"})
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json",
+                                headers={"Idempotency-Key": "till-4-0002"})
+    assert response.get_json() == {"order_id": 2}
+
+    post_data = json.dumps({"orders": [order("till-4-0001"), order("till-4-0003")]})
+    response = test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+    assert response.get_json()["results"] == [
+        {"index": 0, "status": "duplicate", "order_id": 1}, {"index": 1, "status": "accepted", "order_id": 3}
+    ]
+
+    assert test_client.get("/api/v1/items/1").get_json()["quantity"] == 17
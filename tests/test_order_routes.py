@@ -1,35 +1,10 @@
 import pytest
-from pos import app as _app, db
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from pos import db
+from pos.validators.order_input_validator import MAX_BASKET_SIZE
 import json
-
-
-@pytest.fixture
-def test_client(app):
-    """Get a test client for testing"""
-    return app.test_client()
-
-
-@pytest.fixture
-def app():
-    with _app.app_context():
-        db.create_all()
-        yield _app
-        db.drop_all()
-        db.create_all()
-
-
-@pytest.fixture
-def add_test_item(test_client):
-    """Method to add a test item to the test client app"""
-
-    post_data = json.dumps({
-        "description": "Pizza",
-        "price": 15.5,
-        "quantity": 20
-    })
-
-    response = test_client.post("/api/v1/items", data=post_data, content_type="application/json")
-    return response
+from concurrent.futures import ThreadPoolExecutor
 
 
 @pytest.fixture
@@ -88,6 +63,69 @@ def test_add_order__fail_with_validation_error(test_client, add_test_item):
     assert b'400 Bad Request: 1 validation error for OrderInputValidator' in response.data
 
 
+def test_add_order__fail_with_invalid_order_lines(test_client, add_test_item):
+    """add_order fail case. Every invalid order line field is reported with its location"""
+
+    post_data = json.dumps({
+        "order_items": [
+            {
+                "item_id": 1,
+                "order_quantity": "two"
+            },
+            {
+                "item_id": -1,
+                "order_quantity": 1
+            }
+        ],
+        "payment_amount": 31,
+        "order_note": "No pineapples"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    assert response.status_code == 400
+    assert b'2 validation errors for OrderInputValidator' in response.data
+    assert [(error["loc"], error["type"]) for error in response.json["errors"]] == [
+        (["order_items", 0, "order_quantity"], "type_error.integer"),
+        (["order_items", 1, "item_id"], "value_error.number.not_gt"),
+    ]
+
+
+def test_add_order__fail_with_oversized_numbers(test_client, add_test_item):
+    """add_order fail case. Ids, quantities and amounts SQLite cannot store are a validation error, not a 500"""
+
+    post_data = json.dumps({
+        "order_items": [{"item_id": 2 ** 63, "order_quantity": 2 ** 64}],
+        "payment_amount": 1e300,
+        "order_note": "No pineapples"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    assert response.status_code == 400
+    assert [(error["loc"], error["type"]) for error in response.json["errors"]] == [
+        (["order_items", 0, "item_id"], "value_error.number.not_le"),
+        (["order_items", 0, "order_quantity"], "value_error.number.not_le"),
+        (["payment_amount"], "value_error.number.not_le"),
+    ]
+    assert test_client.get(f"/api/v1/orders/{2 ** 64}").status_code == 404
+
+
+def test_add_order__fail_basket_too_large(test_client, add_test_item):
+    """add_order fail case. An order has at most MAX_BASKET_SIZE order lines"""
+
+    post_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}] * (MAX_BASKET_SIZE + 1),
+        "payment_amount": 31,
+        "order_note": "No pineapples"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.json["errors"][0]["type"] == "value_error.list.max_items"
+
+
 def test_add_order__fail_item_not_available(test_client, add_test_item):
     """add_order fail case. item_id=100 does not exist in menu"""
 
@@ -168,3 +206,287 @@ def test_get_order_by_id__fail_order_not_found(test_client):
     assert response.status_code == 404
     assert response.content_type == 'application/json'
     assert b'Order 11 not found. Please place orders' in response.data
+
+
+def test_add_order__success_with_duplicate_item_ids(test_client, add_test_item):
+    """add_order success case. Order lines with the same item_id are merged into a single line"""
+
+    post_data = json.dumps({
+        "order_items": [
+            {
+                "item_id": 1,
+                "order_quantity": 1
+            },
+            {
+                "item_id": 1,
+                "order_quantity": 2
+            }
+        ],
+        "payment_amount": 46.5,
+        "order_note": "No pineapples"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+    assert response.status_code == 200
+
+    response = test_client.get("/api/v1/orders/1", content_type="application/json")
+    assert b'"ordered_quantity":3' in response.data
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":17' in response.data
+
+
+def test_add_order__query_count_independent_of_basket_size(test_client):
+    """add_order resolves all ordered items in a fixed number of SQL round-trips"""
+
+    for index in range(40):
+        post_data = json.dumps({"description": f"Item {index}", "price": 1, "quantity": 10})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+
+    try:
+        query_counts = []
+
+        for basket_size in (1, 10, 40):
+            statements.clear()
+
+            post_data = json.dumps({
+                "order_items": [{"item_id": item_id, "order_quantity": 1} for item_id in range(1, basket_size + 1)],
+                "payment_amount": basket_size,
+                "order_note": "Catering"
+            })
+
+            response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+            assert response.status_code == 200
+
+            query_counts.append(len(statements))
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_statement)
+
+    assert len(set(query_counts)) == 1
+
+
+def test_add_order__concurrent_checkouts_never_oversell(app, test_client):
+    """add_order under concurrent workers. Stock never goes below zero and only available units are sold"""
+
+    post_data = json.dumps({"description": "Last slices", "price": 2, "quantity": 10})
+    test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 3}],
+        "payment_amount": 6,
+        "order_note": "Rush"
+    })
+
+    def place_order():
+        with app.app_context():
+            response = app.test_client().post("/api/v1/orders", data=order_data, content_type="application/json")
+            db.session.remove()
+            return response.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        status_codes = list(executor.map(lambda _: place_order(), range(16)))
+
+    assert status_codes.count(200) == 3
+    assert status_codes.count(400) == 13
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":1' in response.data
+
+
+def test_export_orders__success_without_n_plus_one_queries(app, test_client, add_test_item):
+    """export_orders success case. Orders are streamed with their items and resumable with since_id"""
+
+    order_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": 1}],
+        "payment_amount": 15.5,
+        "order_note": "Nightly sync"
+    })
+
+    for _ in range(5):
+        test_client.post("/api/v1/orders", data=order_data, content_type="application/json")
+
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+
+    try:
+        response = test_client.get("/api/v1/orders/export?since_id=1", buffered=True)
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [order["id"] for order in lines] == [2, 3, 4, 5]
+    assert lines[0]["items"] == [{"item_id": 1, "ordered_quantity": 1}]
+
+    # One query for the orders plus one order item query per batch of 2 orders
+    assert len(statements) == 3
+
+
+def test_add_order_batch__success_with_per_order_results(test_client, add_test_item):
+    """add_order_batch success case. Orders are applied in sequence against shared stock"""
+
+    post_data = json.dumps({
+        "orders": [
+            {
+                "order_items": [{"item_id": 1, "order_quantity": 15}],
+                "payment_amount": 232.5,
+                "order_note": "Team lunch",
+                "idempotency_key": "till-1-0001"
+            },
+            {
+                "order_items": [{"item_id": 1, "order_quantity": 10}],
+                "payment_amount": 155,
+                "order_note": "Only 5 left"
+            },
+            {
+                "order_items": [{"item_id": 1, "order_quantity": 1}],
+                "payment_amount": 1,
+                "order_note": "Too cheap"
+            },
+            {
+                "order_items": [],
+                "payment_amount": 15.5,
+                "order_note": "Empty"
+            },
+            {
+                "order_items": [{"item_id": 1, "order_quantity": 5}],
+                "payment_amount": 77.5,
+                "order_note": "Last ones",
+                "idempotency_key": "till-1-0002"
+            }
+        ]
+    })
+
+    response = test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+    assert response.status_code == 200
+
+    results = response.get_json()["results"]
+    assert [result["status"] for result in results] == ["accepted", "rejected", "rejected", "rejected", "accepted"]
+    assert results[1]["error"] == "Quantity: 10 not available for item: 1"
+    assert results[2]["error"] == "Payment amount is too low"
+    assert [results[0]["order_id"], results[4]["order_id"]] == [1, 2]
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":0' in response.data
+
+
+def test_add_order_batch__success_replay_is_idempotent(test_client, add_test_item):
+    """add_order_batch success case. Replaying a batch does not create duplicate orders"""
+
+    post_data = json.dumps({
+        "orders": [
+            {
+                "order_items": [{"item_id": 1, "order_quantity": 2}],
+                "payment_amount": 31,
+                "order_note": "Offline order",
+                "idempotency_key": "till-2-0001"
+            }
+        ]
+    })
+
+    first_response = test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+    replay_response = test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+
+    assert first_response.get_json()["results"][0] == {"index": 0, "status": "accepted", "order_id": 1}
+    assert replay_response.get_json()["results"][0] == {"index": 0, "status": "duplicate", "order_id": 1}
+
+    response = test_client.get("/api/v1/items/1", content_type="application/json")
+    assert b'"quantity":18' in response.data
+
+
+def test_add_order_batch__fail_with_invalid_body(test_client):
+    """add_order_batch fail case. Body must contain a list of orders"""
+
+    response = test_client.post("/api/v1/orders/batch", data=json.dumps({"orders": []}),
+                                content_type="application/json")
+    assert response.status_code == 400
+    assert b'Body must contain a non-empty list of orders' in response.data
+
+
+def test_get_order_by_id__success_with_expanded_items(test_client, add_test_item, add_test_order):
+    """get_order_by_id success case. expand=items inlines item description and unit price"""
+
+    response = test_client.get("/api/v1/orders/1?expand=items", content_type="application/json")
+    assert response.status_code == 200
+    assert response.get_json()["items"] == [
+        {"item_id": 1, "ordered_quantity": 2, "description": "Pizza", "price": 15.5}
+    ]
+
+
+def test_get_order_by_id__expanded_items_keep_price_paid(test_client, add_test_item, add_test_order):
+    """get_order_by_id success case. Expanded items show the unit price of the order, not the current price.
+    Order items placed before unit prices were recorded show the current price
+    """
+
+    put_data = json.dumps({"description": "Pizza", "price": 17, "quantity": 20})
+    test_client.put("/api/v1/items/1", data=put_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/orders/1?expand=items", content_type="application/json")
+    assert response.get_json()["items"][0]["price"] == 15.5
+
+    db.session.execute(db.text("UPDATE order_item SET unit_price_cents = NULL"))
+    db.session.commit()
+
+    response = test_client.get("/api/v1/orders/1?expand=items", content_type="application/json")
+    assert response.get_json()["items"][0]["price"] == 17
+
+
+def test_get_all_orders__success_paginated_without_n_plus_one_queries(test_client):
+    """get_all_orders success case. Every page is loaded in a fixed number of queries"""
+
+    for index in range(6):
+        post_data = json.dumps({"description": f"Item {index}", "price": 1, "quantity": 10})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+        post_data = json.dumps({
+            "order_items": [{"item_id": item_id, "order_quantity": 1} for item_id in range(1, index + 2)],
+            "payment_amount": index + 1,
+            "order_note": f"Order {index}"
+        })
+        test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+
+    try:
+        response = test_client.get("/api/v1/orders?limit=4&expand=items", content_type="application/json")
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    assert [order["id"] for order in response.get_json()] == [1, 2, 3, 4]
+    assert response.get_json()[3]["items"][3]["description"] == "Item 3"
+
+    # Orders, order items and items
+    assert len(statements) == 3
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = test_client.get(f"/api/v1/orders?limit=4&cursor={cursor}", content_type="application/json")
+    assert [order["id"] for order in response.get_json()] == [5, 6]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_all_orders__fail_orders_not_found(test_client):
+    """get_all_orders fail case. No orders placed yet"""
+
+    response = test_client.get("/api/v1/orders", content_type="application/json")
+    assert response.status_code == 404
+    assert b'Orders not found. Please place orders' in response.data
@@ -0,0 +1,119 @@
+import pytest
+from flask import current_app
+from pos import db
+from pos.services.item_cache import get_item_cache
+from pos.services.order_writer import get_order_writer
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+@pytest.fixture
+def app_settings():
+    return {'ORDER_GROUP_COMMIT': True, 'ORDER_GROUP_COMMIT_MAX_WAIT': 0.05}
+
+
+@pytest.fixture
+def add_test_item(test_client):
+    """Method to add a test item to the test client app"""
+
+    post_data = json.dumps({"description": "Last slices", "price": 2, "quantity": 10})
+    response = test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+    return response
+
+
+def order_data(item_id=1, quantity=3, payment_amount=6):
+    return json.dumps({
+        "order_items": [{"item_id": item_id, "order_quantity": quantity}],
+        "payment_amount": payment_amount,
+        "order_note": "Lunch rush"
+    })
+
+
+def place_orders(bodies):
+    """Post every body from its own thread, so the writer can commit them together"""
+
+    app = current_app._get_current_object()
+
+    def place_order(body):
+        with app.app_context():
+            response = app.test_client().post("/api/v1/orders", data=body, content_type="application/json")
+            db.session.remove()
+            return response.status_code
+
+    with ThreadPoolExecutor(max_workers=len(bodies)) as executor:
+        return list(executor.map(place_order, bodies))
+
+
+def test_add_order__success_with_group_commit(test_client, add_test_item):
+    """add_order success case with ORDER_GROUP_COMMIT. The response and the stock match a commit per request"""
+
+    response = test_client.post("/api/v1/orders", data=order_data(), content_type="application/json")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"order_id": 1}
+
+    response = test_client.get("/api/v1/items/1")
+    assert response.get_json()["quantity"] == 7
+
+
+def test_add_order__group_commit_rejects_orders_on_their_own(test_client, add_test_item):
+    """Orders committed together still get their own errors, and never oversell"""
+
+    bodies = [order_data()] * 12 + [order_data(item_id=99), order_data(payment_amount=1)]
+    status_codes = place_orders(bodies)
+
+    assert status_codes[:12].count(200) == 3
+    assert status_codes[:12].count(400) == 9
+    assert status_codes[12:] == [404, 400]
+
+    writer = get_order_writer()
+    assert writer.order_count == 14
+    assert writer.batch_count < 14
+
+    response = test_client.get("/api/v1/items/1")
+    assert response.get_json()["quantity"] == 1
+
+    response = test_client.get("/api/v1/orders")
+    assert [order["id"] for order in response.get_json()] == [1, 2, 3]
+
+
+def test_add_order__fail_group_commit_queue_full(app, test_client, add_test_item):
+    """add_order fail case. Orders beyond ORDER_GROUP_COMMIT_QUEUE_SIZE are rejected with 503 and Retry-After"""
+
+    app.config['ORDER_GROUP_COMMIT_QUEUE_SIZE'] = 1
+    app.extensions.pop('order_writer', None)
+
+    # Fill the queue before the writer thread is started
+    get_order_writer()._orders.put_nowait(Future())
+
+    response = test_client.post("/api/v1/orders", data=order_data(), content_type="application/json")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert "Too many orders" in response.get_json()["error"]
+
+
+def test_add_order__group_commit_survives_item_cache_failure(test_client, add_test_item, monkeypatch, caplog):
+    """Committed orders are confirmed before the item cache is invalidated, and a cache failure is only logged"""
+
+    def invalidate(item_ids):
+        raise ConnectionError("cache down")
+
+    monkeypatch.setattr(get_item_cache(), 'invalidate', invalidate)
+
+    response = test_client.post("/api/v1/orders", data=order_data(), content_type="application/json")
+
+    assert response.get_json() == {"order_id": 1}
+
+    # The failure is logged after the order was confirmed
+    get_order_writer().close()
+    assert "Failed to invalidate the item cache" in caplog.text
+
+
+def test_asgi__orders_placed_with_group_commit(app, add_test_item):
+    """The ASGI entry point places orders through the group commit writer"""
+
+    asgi_requests = pytest.importorskip("tests.test_asgi").asgi_requests
+
+    assert asgi_requests([("POST", "/api/v1/orders", order_data())]) == [(200, b'{"order_id":1}\n')]
+    assert get_order_writer().order_count == 1
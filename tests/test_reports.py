@@ -0,0 +1,120 @@
+import pytest
+from datetime import datetime
+from pos import db
+from pos.models.item_sales import ItemSales
+from pos.services.sales import period_start, rebuild_sales
+import json
+
+
+@pytest.fixture
+def add_test_items(test_client):
+    """Method to add a small menu to the test client app"""
+
+    menu = [("Pizza", 15.5, 20), ("Salad", 9, 30), ("Soup", 4.25, 12)]
+
+    for description, price, quantity in menu:
+        post_data = json.dumps({"description": description, "price": price, "quantity": quantity})
+        test_client.post("/api/v1/items", data=post_data, content_type="application/json")
+
+
+@pytest.fixture
+def add_test_orders(test_client, add_test_items):
+    """Method to place orders for the test menu. Soup sells the most units, Pizza makes the most revenue"""
+
+    orders = [
+        ([(1, 2), (2, 1)], 40),
+        ([(1, 3)], 46.5),
+        ([(2, 4), (3, 10)], 78.5),
+    ]
+
+    for order_lines, payment_amount in orders:
+        post_data = json.dumps({
+            "order_items": [{"item_id": item_id, "order_quantity": quantity} for item_id, quantity in order_lines],
+            "payment_amount": payment_amount,
+            "order_note": "Report test"
+        })
+        response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+        assert response.status_code == 200
+
+
+def test_get_top_sellers__success(test_client, add_test_orders):
+    """get_top_sellers success case. Items are ranked by units sold or by revenue"""
+
+    response = test_client.get("/api/v1/reports/top-sellers")
+
+    assert response.status_code == 200
+    assert response.json == [
+        {"item_id": 3, "description": "Soup", "units_sold": 10, "revenue": 42.5},
+        {"item_id": 1, "description": "Pizza", "units_sold": 5, "revenue": 77.5},
+        {"item_id": 2, "description": "Salad", "units_sold": 5, "revenue": 45.0},
+    ]
+
+    response = test_client.get("/api/v1/reports/top-sellers?rank_by=revenue&limit=1&period=hour")
+    assert [item["item_id"] for item in response.json] == [1]
+
+
+def test_get_revenue__success(test_client, add_test_orders):
+    """get_revenue success case. Sales are summed per period"""
+
+    today = period_start(datetime.utcnow(), 'day')
+
+    response = test_client.get("/api/v1/reports/revenue?period=day")
+
+    assert response.status_code == 200
+    assert response.json == [{"period_start": today.isoformat(), "units_sold": 20, "revenue": 165.0}]
+
+    response = test_client.get(f"/api/v1/reports/revenue?end={today.date().isoformat()}")
+    assert response.json == []
+
+
+def test_get_revenue__fail_with_validation_error(test_client):
+    """get_revenue fail case. Only hourly and daily aggregates exist"""
+
+    response = test_client.get("/api/v1/reports/revenue?period=week")
+
+    assert response.status_code == 400
+    assert response.json["errors"][0]["loc"] == ["period"]
+
+
+def test_get_low_stock__success(test_client, add_test_orders):
+    """get_low_stock success case. Items at or below the threshold are listed with their recent sales"""
+
+    response = test_client.get("/api/v1/reports/low-stock?threshold=15")
+
+    assert response.status_code == 200
+    assert response.json == [
+        {"id": 3, "description": "Soup", "quantity": 2, "units_sold": 10},
+        {"id": 1, "description": "Pizza", "quantity": 15, "units_sold": 5},
+    ]
+
+
+def test_sales_aggregates__rejected_batch_orders_not_counted(test_client, add_test_items):
+    """Only accepted batch orders are counted in the sales aggregates"""
+
+    post_data = json.dumps({
+        "orders": [
+            {"order_items": [{"item_id": 1, "order_quantity": 1}], "payment_amount": 15.5, "order_note": "Paid"},
+            {"order_items": [{"item_id": 2, "order_quantity": 1}], "payment_amount": 1, "order_note": "Underpaid"},
+        ]
+    })
+
+    response = test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+    assert [result["status"] for result in response.json["results"]] == ["accepted", "rejected"]
+
+    response = test_client.get("/api/v1/reports/top-sellers")
+    assert [(item["item_id"], item["units_sold"]) for item in response.json] == [(1, 1)]
+
+
+def test_rebuild_sales__matches_incremental_aggregates(app, add_test_orders):
+    """The backfill rebuilds exactly the rows maintained while orders were placed"""
+
+    def sales_rows():
+        return sorted((row.period, row.period_start, row.item_id, row.units_sold, row.revenue_cents)
+                      for row in ItemSales.query.all())
+
+    incremental_rows = sales_rows()
+
+    assert rebuild_sales(db.session) == len(incremental_rows) == 6
+    db.session.commit()
+
+    assert sales_rows() == incremental_rows
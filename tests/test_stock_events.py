@@ -0,0 +1,153 @@
+import threading
+import time
+from pos.services.stock_events import StockSubscriber, OVERFLOWED, get_stock_broker
+import json
+
+
+def place_order(test_client, quantity=1):
+    post_data = json.dumps({
+        "order_items": [{"item_id": 1, "order_quantity": quantity}],
+        "payment_amount": 15.5 * quantity,
+        "order_note": "Feed test"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json")
+    assert response.status_code == 200
+
+
+def read_messages(response, count):
+    """Read count Server-Sent Events messages, skipping keep-alive comments"""
+
+    messages = []
+    buffer = ''
+
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+
+        while '\n\n' in buffer:
+            message, buffer = buffer.split('\n\n', 1)
+
+            if not message.startswith(':'):
+                messages.append(dict(line.split(': ', 1) for line in message.split('\n')))
+
+        if len(messages) >= count:
+            return messages
+
+    return messages
+
+
+def test_get_item_changes__success(test_client, add_test_item):
+    """get_item_changes success case. Every item write is logged and only the latest change per item is returned"""
+
+    place_order(test_client, 2)
+    test_client.post("/api/v1/items", data=json.dumps({"description": "Salad", "price": 9, "quantity": 5}),
+                     content_type="application/json")
+    test_client.delete("/api/v1/items/2")
+
+    response = test_client.get("/api/v1/items/changes")
+
+    assert response.status_code == 200
+    assert response.json["last_seq"] == 4
+    assert response.json["has_more"] is False
+    assert [(change["seq"], change["item_id"], change["change"], change["item"])
+            for change in response.json["changes"]] == [
+        (2, 1, "sold", {"id": 1, "description": "Pizza", "price": 15.5, "quantity": 18}),
+        (4, 2, "deleted", None),
+    ]
+
+    response = test_client.get("/api/v1/items/changes?since=2&limit=1")
+    assert response.json["last_seq"] == 3
+    assert response.json["has_more"] is True
+    assert response.json["changes"][0]["change"] == "created"
+
+    response = test_client.get("/api/v1/items/changes?since=4")
+    assert response.json == {"changes": [], "last_seq": 4, "has_more": False}
+
+
+def test_get_item_changes__bulk_and_batch_writes_logged(test_client, add_test_item):
+    """Bulk upserts log every inserted and updated item, rejected batch orders log nothing"""
+
+    post_data = json.dumps([
+        {"id": 1, "description": "Pizza", "price": 16, "quantity": 30},
+        {"description": "Salad", "price": 9, "quantity": 5},
+        {"description": "Soup", "price": 4.25, "quantity": 12},
+    ])
+    test_client.post("/api/v1/items/bulk", data=post_data, content_type="application/json")
+
+    post_data = json.dumps({
+        "orders": [
+            {"order_items": [{"item_id": 2, "order_quantity": 1}], "payment_amount": 9, "order_note": "Paid"},
+            {"order_items": [{"item_id": 3, "order_quantity": 1}], "payment_amount": 1, "order_note": "Underpaid"},
+        ]
+    })
+    test_client.post("/api/v1/orders/batch", data=post_data, content_type="application/json")
+
+    response = test_client.get("/api/v1/items/changes?since=1")
+
+    assert [(change["item_id"], change["change"], change["item"]["quantity"])
+            for change in response.json["changes"]] == [(3, "created", 12), (1, "updated", 30), (2, "sold", 4)]
+
+
+def test_get_item_changes__long_poll_returns_new_change(app, test_client, add_test_item):
+    """get_item_changes with wait returns as soon as a change commits"""
+
+    def place_order_later():
+        time.sleep(0.2)
+        with app.app_context():
+            place_order(app.test_client())
+
+    writer = threading.Thread(target=place_order_later)
+    writer.start()
+
+    started = time.monotonic()
+    response = test_client.get("/api/v1/items/changes?since=1&wait=10")
+    writer.join()
+
+    assert time.monotonic() - started < 5
+    assert [change["change"] for change in response.json["changes"]] == ["sold"]
+    assert get_stock_broker().subscriber_count == 0
+
+
+def test_get_item_changes__fail_with_validation_error(test_client):
+    """get_item_changes fail case. Long-polls wait at most 30 seconds"""
+
+    response = test_client.get("/api/v1/items/changes?wait=31")
+
+    assert response.status_code == 400
+    assert response.json["errors"][0]["loc"] == ["wait"]
+
+
+def test_stream_item_changes__replays_then_streams(app, test_client, add_test_item):
+    """stream_item_changes success case. Missed changes are replayed, then new changes are pushed"""
+
+    app.config['STOCK_FEED_HEARTBEAT'] = 0.1
+
+    response = test_client.get("/api/v1/items/changes/stream", headers={"Last-Event-ID": "0"}, buffered=False)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    replayed = read_messages(response, 1)[0]
+    assert (replayed["id"], replayed["event"]) == ("1", "change")
+    assert json.loads(replayed["data"])["change"] == "created"
+
+    with app.app_context():
+        place_order(app.test_client())
+
+    pushed = read_messages(response, 1)[0]
+    assert pushed["id"] == "2"
+    assert json.loads(pushed["data"])["item"]["quantity"] == 19
+
+    response.close()
+    assert get_stock_broker().subscriber_count == 0
+
+
+def test_stock_subscriber__overflow():
+    """A subscriber that falls behind is cut off instead of buffering without bound"""
+
+    subscriber = StockSubscriber(2)
+
+    for seq in range(1, 4):
+        subscriber.offer((seq, "{}"))
+
+    assert subscriber.get(0) is OVERFLOWED
@@ -0,0 +1,99 @@
+import pytest
+import sqlite3
+from pos import db
+import json
+
+STORE_IDS = ("store-a", "store-b")
+
+
+@pytest.fixture
+def app_settings(tmp_path):
+    return {'STORES': {store_id: f"sqlite:///{tmp_path / store_id}.db" for store_id in STORE_IDS}}
+
+
+@pytest.fixture
+def add_test_items(test_client):
+    """Method to add a different menu to each store"""
+
+    menus = {"store-a": [("Pizza", 15.5, 20), ("Salad", 9, 4)], "store-b": [("Soup", 4.25, 3)]}
+
+    for store_id, menu in menus.items():
+        for description, price, quantity in menu:
+            post_data = json.dumps({"description": description, "price": price, "quantity": quantity})
+            response = test_client.post("/api/v1/items", data=post_data, content_type="application/json",
+                                        headers={"X-Store-Id": store_id})
+            assert response.status_code == 200
+
+
+def place_order(test_client, store_id, item_id, quantity, price):
+    post_data = json.dumps({
+        "order_items": [{"item_id": item_id, "order_quantity": quantity}],
+        "payment_amount": price * quantity,
+        "order_note": "Store test"
+    })
+
+    response = test_client.post("/api/v1/orders", data=post_data, content_type="application/json",
+                                headers={"X-Store-Id": store_id})
+    assert response.status_code == 200
+    return response.json["order_id"]
+
+
+def test_stores__items_and_orders_routed_to_store(app, test_client, add_test_items, tmp_path):
+    """Every store reads and writes only its own database"""
+
+    assert place_order(test_client, "store-b", 1, 2, 4.25) == 1
+    assert place_order(test_client, "store-a", 1, 1, 15.5) == 1
+
+    response = test_client.get("/api/v1/items", headers={"X-Store-Id": "store-a"})
+    assert [(item["description"], item["quantity"]) for item in response.json] == [("Pizza", 19), ("Salad", 4)]
+
+    response = test_client.get("/api/v1/items/1", headers={"X-Store-Id": "store-b"})
+    assert (response.json["description"], response.json["quantity"]) == ("Soup", 1)
+
+    response = test_client.get("/api/v1/orders/1?expand=items", headers={"X-Store-Id": "store-b"})
+    assert response.json["items"][0]["description"] == "Soup"
+
+    with sqlite3.connect(tmp_path / "store-b.db") as connection:
+        assert connection.execute("SELECT description, quantity FROM item").fetchall() == [("Soup", 1)]
+
+    # The default database is not used once stores are configured
+    with app.app_context():
+        assert db.session.execute(db.text("SELECT count(*) FROM item")).scalar() == 0
+
+
+def test_stores__fail_without_valid_store(test_client):
+    """Item and order routes need a known store when stores are configured"""
+
+    response = test_client.get("/api/v1/items")
+    assert response.status_code == 400
+    assert "X-Store-Id" in response.json["error"]
+
+    response = test_client.get("/api/v1/orders", headers={"X-Store-Id": "store-z"})
+    assert response.status_code == 404
+    assert response.json["error"] == "404 Not Found: Store store-z not found"
+
+
+def test_reports__fan_out_over_all_stores(test_client, add_test_items):
+    """Reports without X-Store-Id merge every store, reports with it read one store"""
+
+    place_order(test_client, "store-a", 1, 1, 15.5)
+    place_order(test_client, "store-a", 2, 2, 9)
+    place_order(test_client, "store-b", 1, 2, 4.25)
+
+    response = test_client.get("/api/v1/reports/top-sellers")
+    assert response.status_code == 200
+    assert [(item["store_id"], item["item_id"], item["units_sold"]) for item in response.json] == [
+        ("store-a", 2, 2), ("store-b", 1, 2), ("store-a", 1, 1),
+    ]
+
+    response = test_client.get("/api/v1/reports/top-sellers?rank_by=revenue&limit=1",
+                               headers={"X-Store-Id": "store-b"})
+    assert response.json == [{"item_id": 1, "description": "Soup", "units_sold": 2, "revenue": 8.5}]
+
+    response = test_client.get("/api/v1/reports/revenue")
+    assert [(period["units_sold"], period["revenue"]) for period in response.json] == [(5, 42.0)]
+
+    response = test_client.get("/api/v1/reports/low-stock?threshold=2")
+    assert [(item["store_id"], item["description"], item["quantity"]) for item in response.json] == [
+        ("store-b", "Soup", 1), ("store-a", "Salad", 2),
+    ]
@@ -0,0 +1,77 @@
+from datetime import datetime
+from sqlalchemy import create_engine, insert, inspect, select, text
+from pos.commands import add_missing_columns, migrate_money_to_cents, rebuild_order_table
+from pos.models.item import Item
+from pos.models.order import Order
+from pos.models.order_archive_segment import OrderArchiveSegment
+from pos.models.order_item import OrderItem
+
+
+def create_old_database(connection):
+    """Tables as they were before prices were stored in cents"""
+
+    connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, description VARCHAR(50) NOT NULL, "
+                            "price FLOAT NOT NULL, quantity INTEGER NOT NULL)"))
+    connection.execute(text('CREATE TABLE "order" (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, '
+                            'note VARCHAR(50) NOT NULL)'))
+    connection.execute(text("CREATE TABLE order_item (order_id INTEGER NOT NULL REFERENCES \"order\" (id), "
+                            "item_id INTEGER NOT NULL REFERENCES item (id), ordered_quantity INTEGER NOT NULL, "
+                            "PRIMARY KEY (order_id, item_id))"))
+    connection.execute(text("INSERT INTO item VALUES (1, 'Pizza', 15.5, 20)"))
+    connection.execute(text("INSERT INTO \"order\" VALUES (1, 31.0, 'No pineapples')"))
+    connection.execute(text("INSERT INTO order_item VALUES (1, 1, 2)"))
+
+
+def test_add_missing_columns__upgrades_old_database():
+    """An older database gets the new tables and columns, and its rows are readable through the models"""
+
+    engine = create_engine("sqlite://")
+    upgraded_at = datetime(2026, 1, 2, 3, 4, 5)
+
+    with engine.begin() as connection:
+        create_old_database(connection)
+
+        assert migrate_money_to_cents(connection) == ['item', 'order']
+        assert add_missing_columns(connection, upgraded_at) == [
+            'order.idempotency_key', 'order.created_at', 'order_item.unit_price_cents', 'item.version',
+            'item.updated_at',
+        ]
+        assert add_missing_columns(connection) == []
+
+        order_columns = select(Order.id, Order.idempotency_key, Order.created_at, Order.amount_cents)
+        assert connection.execute(order_columns).all() == [(1, None, upgraded_at, 3100)]
+        assert connection.execute(select(OrderItem.unit_price_cents)).scalar() is None
+        assert connection.execute(select(Item.version, Item.updated_at, Item.price_cents)).all() == [(0, None, 1550)]
+
+        inspector = inspect(connection)
+        assert {'ix_order_created_at', 'uq_order_idempotency_key'} <= \
+            {index['name'] for index in inspector.get_indexes('order')}
+        assert 'ix_item_description' in {index['name'] for index in inspector.get_indexes('item')}
+        assert {'stock_event', 'item_sales', 'order_archive_segment'} <= set(inspector.get_table_names())
+
+
+def test_rebuild_order_table__never_reuses_archived_ids():
+    """The order table of an older database gets AUTOINCREMENT ids that start after the archived orders"""
+
+    engine = create_engine("sqlite://")
+
+    with engine.begin() as connection:
+        create_old_database(connection)
+        migrate_money_to_cents(connection)
+        add_missing_columns(connection)
+        connection.execute(insert(OrderArchiveSegment), [{
+            'first_order_id': 2, 'last_order_id': 7, 'order_count': 6, 'path': "2024-01/orders.ndjson.gz",
+            'created_at': datetime(2026, 1, 2),
+        }])
+
+        assert rebuild_order_table(connection) is True
+        assert rebuild_order_table(connection) is False
+
+        assert connection.execute(select(Order.id, Order.amount_cents)).all() == [(1, 3100)]
+        assert connection.execute(select(OrderItem.order_id)).scalars().all() == [1]
+        assert {'ix_order_created_at'} <= {index['name'] for index in inspect(connection).get_indexes('order')}
+
+        result = connection.execute(
+            insert(Order).values(amount_cents=1550, note="New", created_at=datetime(2026, 1, 3))
+        )
+        assert result.inserted_primary_key == (8,)